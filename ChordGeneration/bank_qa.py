@@ -0,0 +1,214 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from banks import BANKS
+from drumbars import has_bars
+from pack import PACK_NAME, bank_wavs
+from profiling import stage
+from wavio import read_wav, write_wav
+
+# 音色库质量检查：每个 wav 从文件开头到真正出声要多久（合成器的起音 / 前导静音）、峰值和削波、RMS、时长。
+# 播放器收到和弦就从文件第 0 帧开始 playSdWav，所以起奏偏移就是这件乐器每次都多出来的延迟；
+# 鼓的音色尤其明显。--trim 把每个文件的前导静音裁掉（或在前面补静音），让所有乐器都在同一个偏移处起奏。
+#
+#   python bank_qa.py                          # 检查全部音色库
+#   python bank_qa.py piano drums --csv qa.csv # 只查指定的，逐个文件写进 CSV
+#   python bank_qa.py --trim --align-ms 2      # 统一到 2 ms 起奏（改写 wav，之后重新运行 pack.py）
+#   python generate.py --trim --align-ms 2     # 推荐：每次渲染后自动裁剪（见下）
+#   python bank_qa.py --max-onset-ms 15        # 有文件起奏晚于 15 ms 时返回非零（放进生成流程里当检查用）
+#
+# 起奏 = 第一个绝对值超过 (文件峰值 - --onset-db) 的采样，与音量无关；整个文件都没声音的记为无声。
+# 渲染缓存里存的是没裁剪的 wav，单独运行 --trim 之后，下一次 generate.py 会把没裁剪的版本链接回来；
+# 所以裁剪应当作为 generate.py --trim 的后处理（与 --optimize 一样每次渲染后重做）。
+# 只裁剪 BankSpec.samples 里的单个音色：鼓的整小节 bar.wav / fill.wav 由裁剪后的单击重新混出，长度不变。
+
+DEFAULT_ONSET_DB = 30.0
+DEFAULT_ALIGN_MS = 2.0
+DEFAULT_MAX_ONSET_MS = 20.0
+CLIP_LEVEL = 32767 / 32768.0
+
+
+def analyze(audio, rate, onset_db=DEFAULT_ONSET_DB):
+    # (帧数, 声道数) float32 -> 一个文件的统计
+    level = np.abs(audio).max(axis=1) if audio.size else np.zeros(0, dtype=np.float32)
+    peak = float(level.max()) if len(level) else 0.0
+    if peak > 0:
+        onset = int(np.argmax(level >= peak * 10 ** (-onset_db / 20.0)))
+    else:
+        onset = None
+    rms = float(np.sqrt(np.mean(np.square(audio, dtype=np.float64)))) if audio.size else 0.0
+    return {
+        "frames": len(audio),
+        "rate": rate,
+        "channels": audio.shape[1] if audio.ndim > 1 else 1,
+        "duration_s": len(audio) / rate,
+        "onset_frame": onset,
+        "onset_ms": None if onset is None else onset * 1000.0 / rate,
+        "peak_dbfs": 20 * np.log10(peak) if peak > 0 else -np.inf,
+        "rms_dbfs": 20 * np.log10(rms) if rms > 0 else -np.inf,
+        "clipped": int(np.count_nonzero(np.abs(audio) >= CLIP_LEVEL)),
+    }
+
+
+def align_onset(audio, onset, target):
+    # 裁掉 / 补上前导部分，让起奏落在第 target 帧
+    if onset is None or onset == target:
+        return audio
+    if onset > target:
+        return audio[onset - target:]
+    pad = np.zeros((target - onset, audio.shape[1]), dtype=audio.dtype)
+    return np.concatenate([pad, audio])
+
+
+def trim_wav(path, audio, rate, onset, align_ms=DEFAULT_ALIGN_MS):
+    # 起奏不在 align_ms 时改写文件；返回 (新的音频, 是否改写)
+    target = int(round(align_ms * rate / 1000.0))
+    if onset is None or onset == target:
+        return audio, False
+    audio = align_onset(audio, onset, target)
+    write_wav(path, audio, rate)
+    return audio, True
+
+
+def trim_banks(specs, options):
+    # generate.py --trim：渲染（和弦叠加）之后、混整小节之前统一起奏
+    for spec in specs:
+        moved = 0
+        with stage("trim", bank=spec.name) as s:
+            for name, _ in spec.samples:
+                path = os.path.join(spec.output_dir, f"{name}.wav")
+                audio, rate = read_wav(path)
+                onset = analyze(audio, rate, options.onset_db)["onset_frame"]
+                moved += trim_wav(path, audio, rate, onset, options.align_ms)[1]
+            s.items = len(spec.samples)
+        print(f"✂️  {spec.name}: {moved} 个文件的起奏移到了 {options.align_ms:g} ms")
+
+
+def add_trim_options(parser):
+    parser.add_argument("--trim", action="store_true", help="裁掉前导静音，所有文件统一在 --align-ms 起奏（改写 wav）")
+    parser.add_argument("--align-ms", type=float, default=DEFAULT_ALIGN_MS, help="--trim 的目标起奏位置")
+    parser.add_argument("--onset-db", type=float, default=DEFAULT_ONSET_DB,
+                        help="起奏判定：比文件峰值低多少 dB 以内算出声")
+    return parser
+
+
+def bank_sources(names):
+    # 音色库名或 wav 目录 -> [(名字, 目录, BankSpec 或 None)]
+    sources = []
+    for name in names or BANKS:
+        if name in BANKS:
+            sources.append((name, BANKS[name].output_dir, BANKS[name]))
+        elif os.path.isdir(name):
+            sources.append((os.path.basename(os.path.normpath(name)), name, None))
+        else:
+            raise ValueError(f"未知的音色库或目录: {name}")
+    return sources
+
+
+def check_bank(name, src_dir, spec=None, onset_db=DEFAULT_ONSET_DB, trim=False, align_ms=DEFAULT_ALIGN_MS):
+    # 返回每个文件一行；trim 时改写 wav，行里是裁剪之后的结果（onset_before_ms 是原来的）
+    # 知道 BankSpec 时只裁剪 spec.samples 里的文件（整小节的鼓由单击重新混出）
+    rows = []
+    samples = {name for name, _ in spec.samples} if spec is not None else None
+    for key, path in sorted(bank_wavs(src_dir).items()):
+        audio, rate = read_wav(path)
+        row = analyze(audio, rate, onset_db)
+        row["onset_before_ms"] = row["onset_ms"]
+        if trim and (samples is None or key in samples):
+            audio, changed = trim_wav(path, audio, rate, row["onset_frame"], align_ms)
+            if changed:
+                row.update(analyze(audio, rate, onset_db))
+        if spec is not None:
+            # 播放器只播前 play_seconds 秒，起奏太晚会把有声部分挤出去
+            row["play_s"] = spec.play_seconds
+        rows.append({"bank": name, "file": key, **row})
+    return rows
+
+
+def print_bank(name, rows, max_onset_ms):
+    onsets = np.array([r["onset_ms"] for r in rows if r["onset_ms"] is not None])
+    silent = sum(r["onset_ms"] is None for r in rows)
+    clipped = sum(r["clipped"] > 0 for r in rows)
+    late = [r for r in rows if r["onset_ms"] is not None and r["onset_ms"] > max_onset_ms]
+    peak = max((r["peak_dbfs"] for r in rows), default=-np.inf)
+    rms = np.median([r["rms_dbfs"] for r in rows if np.isfinite(r["rms_dbfs"])] or [-np.inf])
+    duration = np.median([r["duration_s"] for r in rows])
+    icon = "❌" if late or silent else ("⚠️" if clipped else "✅")
+    onset_text = (f"起奏 中位数 {np.median(onsets):.1f} ms，最晚 {onsets.max():.1f} ms" if len(onsets)
+                  else "没有有声的文件")
+    print(f"{icon} {name}: {len(rows)} 个文件，{onset_text}，峰值 {peak:.1f} dBFS，"
+          f"RMS 中位数 {rms:.1f} dBFS，时长中位数 {duration:.2f} s")
+    for r in sorted(late, key=lambda r: -r["onset_ms"])[:5]:
+        print(f"    ⏱️  {r['file']}.wav: {r['onset_ms']:.1f} ms 才出声")
+    if len(late) > 5:
+        print(f"    ... 还有 {len(late) - 5} 个文件起奏晚于 {max_onset_ms:g} ms")
+    if clipped:
+        print(f"    🔊 {clipped} 个文件有削波")
+    if silent:
+        print(f"    🔇 {silent} 个文件没有声音")
+    # 削波只提示，起奏太晚或没有声音才算失败
+    return bool(late or silent)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查音色库：起奏偏移、峰值/削波、RMS、时长，可统一起奏位置")
+    parser.add_argument("banks", nargs="*", metavar="bank",
+                        help=f"音色库（{', '.join(BANKS)}）或 wav 目录，默认全部")
+    parser.add_argument("--max-onset-ms", type=float, default=DEFAULT_MAX_ONSET_MS,
+                        help="起奏晚于这个值就算失败")
+    add_trim_options(parser)
+    parser.add_argument("--csv", help="把每个文件的结果写进 CSV")
+    args = parser.parse_args(argv)
+
+    try:
+        sources = bank_sources(args.banks)
+    except ValueError as e:
+        parser.error(str(e))
+
+    rows = []
+    failed = False
+    checked = 0
+    for name, src_dir, spec in sources:
+        if not os.path.isdir(src_dir):
+            print(f"⏭️ {name}: {src_dir} 还没生成，跳过")
+            continue
+        bank_rows = check_bank(name, src_dir, spec, args.onset_db, args.trim, args.align_ms)
+        if not bank_rows:
+            print(f"⏭️ {name}: {src_dir} 里没有 wav，跳过")
+            continue
+        checked += 1
+        failed |= print_bank(name, bank_rows, args.max_onset_ms)
+        if args.trim:
+            moved = sum(r["onset_before_ms"] is not None and r["onset_before_ms"] != r["onset_ms"] for r in bank_rows)
+            print(f"    ✂️  {moved} 个文件的起奏移到了 {args.align_ms:g} ms")
+            if os.path.exists(os.path.join(src_dir, PACK_NAME)):
+                print(f"    ⚠️  {PACK_NAME} 已过期，重新运行 python pack.py {name}")
+            if moved and spec is not None:
+                print(f"    ⚠️  渲染缓存里仍是没裁剪的版本，下次 generate.py 会把它们换回来；"
+                      f"请改用 python generate.py {name} --trim --align-ms {args.align_ms:g}")
+                if has_bars(spec):
+                    print("    ⚠️  整小节的 bar.wav / fill.wav 还是用没裁剪的单击混的，重新运行 python drumbars.py")
+        rows += bank_rows
+
+    onsets = [r["onset_ms"] for r in rows if r["onset_ms"] is not None]
+    if len({r["bank"] for r in rows}) > 1 and onsets:
+        print(f"📏 所有音色库的起奏范围 {min(onsets):.1f} - {max(onsets):.1f} ms"
+              f"（乐器之间最多相差 {max(onsets) - min(onsets):.1f} ms）")
+
+    if args.csv and rows:
+        import csv
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=list(dict.fromkeys(k for r in rows for k in r)))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"📄 已写入 {args.csv}")
+    if not checked:
+        print("没有可检查的音色库")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+from dataclasses import dataclass, field
+
+from harmony import NOTE_NAMES, QUALITIES, chord_name
+
+# 所有音色库的声明式配置：每个 BankSpec 描述一个乐器要生成的全部 wav
+
+# 和弦类型与半音间隔、音名都来自 harmony.py（与板子上的和弦表同一份）
+CHORD_TYPES = dict(QUALITIES)
+
+# 播放器按 fluidsynth 默认的 44.1 kHz 计算播放长度（见 band_members/*.ino）
+PLAYER_RATE = 44100
+
+
+def chord_samples(base_midi, chord_types=CHORD_TYPES):
+    # 12 个根音 × 每种和弦类型
+    samples = []
+    for i in range(len(NOTE_NAMES)):
+        for intervals in chord_types.values():
+            samples.append((chord_name(i, intervals), [base_midi + i + interval for interval in intervals]))
+    return samples
+
+
+def note_samples(first_midi, count):
+    # 从低到高的单音，文件名 0,1,2,...
+    return [(str(i), [first_midi + i]) for i in range(count)]
+
+
+@dataclass
+class BankSpec:
+    name: str
+    soundfont: str
+    output_dir: str
+    samples: list                 # [(文件名, [midi 音符])]
+    program: int = None           # None 表示不发 Program Change（鼓）
+    channel: int = 0
+    velocity: int = 100
+    duration: int = 96            # 音符时值 (tick, 96 tick = 一拍)
+    staggered_release: bool = False
+    volume: int = None            # CC7 音量，None 表示不设置
+    gain: float = 2.0
+    play_seconds: float = 2.0     # 播放器最多播放多久，优化阶段按这个长度截断
+    icon: str = "🎵"
+    done_message: str = "✅ 生成完毕！"
+    extra: dict = field(default_factory=dict)
+
+
+BANKS = {
+    "piano": BankSpec(
+        name="piano",
+        soundfont="Piano.sf2",
+        output_dir="output_chords_piano",
+        samples=chord_samples(60),   # C4
+        program=0,
+        staggered_release=True,
+        gain=3.0,
+        play_seconds=2.0,            # playSdWav(filepath, 2.0)
+        icon="🎼",
+        done_message="✅ 所有和弦文件生成完毕！",
+    ),
+    "guitar": BankSpec(
+        name="guitar",
+        soundfont="Electric_guitar.SF2",
+        output_dir="output_chords_guitar",
+        samples=chord_samples(48),   # C3，比钢琴低一组八度
+        program=27,                  # Overdriven Guitar
+        staggered_release=True,
+        gain=3.0,
+        play_seconds=2.0,            # playSdWav(filepath, 2.0)
+        icon="🎸",
+        done_message="✅ 所有和弦文件生成完毕！",
+    ),
+    "bass": BankSpec(
+        name="bass",
+        soundfont="Bass Guitars.sf2",
+        output_dir="output_bass_notes",
+        samples=note_samples(36, 12),   # 12 * 3 + idx，与原脚本一致（MIDI 36-47）
+        program=50,
+        play_seconds=16000 / PLAYER_RATE,   # playSdWavForceShort 最多 16000 帧
+        done_message="✅ 所有 bass 单音文件生成完毕！",
+    ),
+    "sax": BankSpec(
+        name="sax",
+        soundfont="Saxophone.sf2",
+        output_dir="output_saxophone_notes",
+        samples=note_samples(48, 24),   # 24 个音，严格从低到高
+        program=65,                     # Alto Sax
+        velocity=127,
+        duration=192,
+        play_seconds=8000 / PLAYER_RATE,    # playSdWavForceShort(..., 8000)
+        icon="🎷",
+        done_message="✅ 所有 sax 单音文件 (0~23) 已生成完毕，严格从低到高。",
+    ),
+    "drums": BankSpec(
+        name="drums",
+        soundfont="Drum.sf2",
+        output_dir="output_swing_drums",
+        samples=[("ride", [51]), ("snare", [38]), ("hihat", [44]), ("kick", [36])],
+        channel=9,
+        volume=100,
+        play_seconds=14000 / 2 / PLAYER_RATE,   # Drummer 按 int16 个数计数，立体声 14000 个 = 7000 帧
+        icon="🥁",
+        done_message="✅ 所有单击鼓 wav 已生成！（每个只打一下）",
+        extra={"bpm": 60, "swing": 2 / 3},   # 整小节 bar.wav / fill.wav 的速度与摇摆（见 drumbars.py）
+    ),
+}
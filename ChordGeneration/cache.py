@@ -0,0 +1,108 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+
+# 渲染结果的内容寻址缓存：
+# key = sha256(SoundFont 字节, MIDI 字节, fluidsynth 参数, fluidsynth 版本)，
+# 命中时把缓存文件硬链接（跨盘则复制）到 output_* 目录，超过容量按 LRU 删除。
+# 注意：命中的输出文件可能是缓存的硬链接，后续写 wav 前必须先删除目标文件，
+# 不能原地截断重写，否则会把缓存一起改掉。
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".render_cache")
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+
+_soundfont_digests = {}
+_synth_version = None
+
+
+def soundfont_digest(path):
+    # 同一个进程里每个 SoundFont 只哈希一次（按路径、大小、修改时间记忆）
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    if memo_key not in _soundfont_digests:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        _soundfont_digests[memo_key] = h.hexdigest()
+    return _soundfont_digests[memo_key]
+
+
+def synth_version():
+    global _synth_version
+    if _synth_version is None:
+        try:
+            out = subprocess.run(["fluidsynth", "--version"], capture_output=True, text=True).stdout
+            _synth_version = out.strip().splitlines()[0] if out.strip() else "unknown"
+        except OSError:
+            _synth_version = "unknown"
+    return _synth_version
+
+
+def remove_output(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class RenderCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, job, mode="file"):
+        h = hashlib.sha256()
+        h.update(soundfont_digest(job.soundfont_path).encode())
+        h.update(job.midi_bytes)
+        h.update(f"|gain={job.gain:g}|mode={mode}|{synth_version()}".encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".wav")
+
+    def fetch(self, key, wav_path):
+        cached = self._path(key)
+        if not os.path.exists(cached):
+            return False
+        os.utime(cached)  # 更新访问时间，供 LRU 使用
+        os.makedirs(os.path.dirname(wav_path) or ".", exist_ok=True)
+        remove_output(wav_path)
+        try:
+            os.link(cached, wav_path)
+        except OSError:
+            shutil.copyfile(cached, wav_path)
+        return True
+
+    def store(self, key, wav_path):
+        cached = self._path(key)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        # 先复制到临时文件再改名，避免并行写入时留下半个文件
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached), suffix=".tmp")
+        os.close(fd)
+        shutil.copyfile(wav_path, tmp_path)
+        os.replace(tmp_path, cached)
+
+    def entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".wav"):
+                    path = os.path.join(root, name)
+                    st = os.stat(path)
+                    yield st.st_mtime, st.st_size, path
+
+    def evict(self):
+        # 按最近使用时间从旧到新删除，直到总大小不超过上限
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,108 @@
+import os
+
+import numpy as np
+
+from midi import sample_midi
+from render import RenderJob
+from wavio import read_wav, write_wav
+
+# 和弦库的另一种生成方式（--from-notes）：每个单音只用 fluidsynth 渲染一次，
+# 再用 numpy 把单音叠加成和弦。
+# 单音按 (音高, 抬起时间) 区分：staggered_release 时和弦第 i 个音在 duration*(i+1) 抬起，
+# 同一个音高在不同位置要分别渲染。钢琴/吉他全部 72 个和弦只需要 52 个单音，
+# 新增的和弦类型（例如 m7b5）只会复用已有的单音，几乎不增加渲染量。
+# fluidsynth 的混音本身就是线性叠加，区别只在最后一步：
+# 这里用软限幅代替 16 位输出的硬削波。
+
+LIMIT_THRESHOLD = 10 ** (-1 / 20.0)   # 超过 -1 dBFS 才开始压缩
+
+
+def is_chord_bank(spec):
+    return any(len(notes) > 1 for _, notes in spec.samples)
+
+
+def voice_duration(spec, position):
+    # 与 sample_midi 的抬起时间一致
+    return spec.duration * (position + 1) if spec.staggered_release else spec.duration
+
+
+def chord_voices(spec):
+    # 返回 ({单音名: (音符, 时值)}, [(和弦文件名, [单音名])])
+    voices = {}
+    chords = []
+    for name, notes in spec.samples:
+        names = []
+        for position, note in enumerate(notes):
+            duration = voice_duration(spec, position)
+            voice = f"{note}_{duration}"
+            voices[voice] = (note, duration)
+            names.append(voice)
+        chords.append((name, names))
+    return voices, chords
+
+
+def voice_jobs(spec, voice_dir):
+    voices, _ = chord_voices(spec)
+    jobs = []
+    for voice, (note, duration) in sorted(voices.items()):
+        midi_bytes = sample_midi([note], program=spec.program, channel=spec.channel,
+                                 velocity=spec.velocity, duration=duration, volume=spec.volume)
+        jobs.append(RenderJob(f"{spec.name}_{voice}", midi_bytes, os.path.join(voice_dir, f"{voice}.wav"),
+                              spec.soundfont, gain=spec.gain))
+    return jobs
+
+
+def soft_limit(audio, threshold=LIMIT_THRESHOLD):
+    # threshold 以下原样保留，以上用 tanh 平滑地压到 1.0 以内
+    magnitude = np.abs(audio)
+    if magnitude.max(initial=0.0) <= threshold:
+        return audio
+    knee = 1.0 - threshold
+    limited = threshold + knee * np.tanh((magnitude - threshold) / knee)
+    return np.where(magnitude > threshold, np.sign(audio) * limited, audio).astype(np.float32)
+
+
+def mix_chords(spec, voice_dir, voice_gains=None):
+    # voice_gains: 和弦第 i 个音的增益，默认取 spec.extra["voice_gains"]，再没有就全部为 1
+    voices, chords = chord_voices(spec)
+    order = sorted(voices)
+    index = {voice: i for i, voice in enumerate(order)}
+
+    clips = []
+    rate = None
+    for voice in order:
+        audio, voice_rate = read_wav(os.path.join(voice_dir, f"{voice}.wav"))
+        if rate is not None and voice_rate != rate:
+            raise ValueError(f"{voice}.wav 的采样率 {voice_rate} 与其他单音 ({rate}) 不一致")
+        rate = voice_rate
+        clips.append(audio)
+
+    # 所有单音放进一个 (单音数 + 1, 帧数, 声道) 数组，最后一行是给短和弦补位的静音
+    lengths = np.array([len(clip) for clip in clips] + [0])
+    channels = max(clip.shape[1] for clip in clips)
+    bank = np.zeros((len(clips) + 1, lengths.max(), channels), dtype=np.float32)
+    for i, clip in enumerate(clips):
+        bank[i, :len(clip)] = clip
+
+    width = max(len(names) for _, names in chords)
+    table = np.full((len(chords), width), len(clips))
+    for row, (_, names) in enumerate(chords):
+        table[row, :len(names)] = [index[voice] for voice in names]
+
+    if voice_gains is None:
+        voice_gains = spec.extra.get("voice_gains", [1.0] * width)
+    gains = np.asarray(voice_gains, dtype=np.float32)
+    if gains.shape != (width,):
+        raise ValueError(f"voice_gains 需要 {width} 个值")
+
+    # 按声部位置逐列累加：每次是 (和弦数, 帧数, 声道) 的一次向量运算
+    mixed = np.zeros((len(chords), bank.shape[1], channels), dtype=np.float32)
+    for position in range(width):
+        mixed += bank[table[:, position]] * gains[position]
+    mixed = soft_limit(mixed)
+
+    os.makedirs(spec.output_dir, exist_ok=True)
+    chord_lengths = lengths[table].max(axis=1)
+    for row, (name, _) in enumerate(chords):
+        write_wav(os.path.join(spec.output_dir, f"{name}.wav"), mixed[row, :chord_lengths[row]], rate)
+    return len(order), len(chords)
@@ -0,0 +1,201 @@
+import argparse
+import os
+import re
+import sys
+
+import numpy as np
+
+from banks import BANKS
+from chordmix import soft_limit
+from wavio import read_wav, write_wav
+
+# 整小节鼓谱：把 DrumGeneration 渲染的单击（ride / snare / hihat / kick）按摇摆节奏离线混成整小节的 wav，
+# 每一击都放在精确的采样位置。Drummer 每小节只播一个连续的 bar.wav（或加花 fill.wav），
+# 不用每拍 SD.open() 好几个文件、解析 WAV 头。
+#
+#   python drumbars.py                 # 用 output_swing_drums 里的单击混出 bar.wav / fill.wav
+#   python drumbars.py --swing 0.5     # 平均八分音符（不摇摆）
+#   python drumbars.py --check         # 只核对节拍网格：小节长度 vs CHORD_DURATION / Drummer.ino，和已生成的小节文件
+#
+# 一小节 = 4 拍 = 8 个八分音符，与 Drummer.ino 原来逐拍播放的 8 步一致（60 BPM 时每步 500 ms）。
+# 摇摆：每拍的第二个八分音符落在这一拍的 swing 处（2/3 为三连音摇摆，0.5 为平均）。
+# 单击的尾音会超出小节末尾，混音时绕回小节开头（小节是循环播放的），连续播放时接缝处没有断音。
+
+BEATS_PER_BAR = 4
+STEPS_PER_BAR = 8
+DEFAULT_BPM = 60
+DEFAULT_SWING = 2.0 / 3.0
+
+# {鼓件: [(步, 增益)]}，步 0..7
+GROOVE = {
+    "ride": [(step, 1.0) for step in range(STEPS_PER_BAR)],
+    "kick": [(0, 1.0), (4, 1.0)],
+    "snare": [(2, 1.0), (6, 1.0)],
+    "hihat": [(1, 1.0), (3, 1.0), (5, 1.0), (7, 1.0)],
+}
+# 加花：后半小节连续军鼓，渐强进入下一小节
+FILL = {
+    "ride": [(0, 1.0), (1, 1.0), (2, 1.0), (3, 1.0)],
+    "kick": [(0, 1.0), (7, 1.0)],
+    "snare": [(2, 1.0), (4, 0.6), (5, 0.7), (6, 0.85), (7, 1.0)],
+    "hihat": [(1, 1.0), (3, 1.0)],
+}
+BARS = {"bar": GROOVE, "fill": FILL}
+
+SKETCH_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "band_members")
+DRUMMER_SKETCH = os.path.join(SKETCH_DIR, "Drummer", "Drummer.ino")
+CHORD_SKETCHES = [
+    os.path.join(SKETCH_DIR, "improvisation_test", "improvisation_test.ino"),
+    os.path.join(SKETCH_DIR, "receivers_test", "receivers_test.ino"),
+    os.path.join(SKETCH_DIR, "receivers_Markov", "receivers_Markov.ino"),
+]
+
+
+def bar_ms(bpm=DEFAULT_BPM):
+    return BEATS_PER_BAR * 60000.0 / bpm
+
+
+def step_ms(step, bpm=DEFAULT_BPM, swing=DEFAULT_SWING):
+    beat_ms = 60000.0 / bpm
+    beat, offbeat = divmod(step, 2)
+    return beat * beat_ms + (swing * beat_ms if offbeat else 0.0)
+
+
+def step_frame(step, rate, bpm=DEFAULT_BPM, swing=DEFAULT_SWING):
+    return int(round(step_ms(step, bpm, swing) * rate / 1000.0))
+
+
+def bar_frames(rate, bpm=DEFAULT_BPM):
+    return int(round(bar_ms(bpm) * rate / 1000.0))
+
+
+def bar_settings(spec, bpm=None, swing=None):
+    # 命令行参数优先，其次是 BankSpec.extra，最后是默认值
+    bpm = bpm if bpm is not None else spec.extra.get("bpm", DEFAULT_BPM)
+    swing = swing if swing is not None else spec.extra.get("swing", DEFAULT_SWING)
+    return bpm, swing
+
+
+def has_bars(spec):
+    return all(name in dict(spec.samples) for pattern in BARS.values() for name in pattern)
+
+
+def mix_bar(hits, pattern, rate, bpm=DEFAULT_BPM, swing=DEFAULT_SWING):
+    # hits: {鼓件: (帧数, 声道) 数组}；返回正好一小节长的数组
+    n = bar_frames(rate, bpm)
+    channels = max(audio.shape[1] for audio in hits.values())
+    bar = np.zeros((n, channels), dtype=np.float32)
+    for name, steps in pattern.items():
+        audio = hits[name][:n]
+        for step, gain in steps:
+            start = step_frame(step, rate, bpm, swing)
+            head = min(len(audio), n - start)
+            bar[start:start + head] += audio[:head] * gain
+            # 超出小节的尾音绕回开头
+            bar[:len(audio) - head] += audio[head:] * gain
+    return soft_limit(bar)
+
+
+def mix_bars(spec, bpm=None, swing=None):
+    # 返回 [(小节名, 帧数, 击数)]
+    bpm, swing = bar_settings(spec, bpm, swing)
+    hits = {}
+    rate = None
+    for name in {name for pattern in BARS.values() for name in pattern}:
+        audio, hit_rate = read_wav(os.path.join(spec.output_dir, f"{name}.wav"))
+        if rate is not None and hit_rate != rate:
+            raise ValueError(f"{name}.wav 的采样率 {hit_rate} 与其他单击 ({rate}) 不一致")
+        rate = hit_rate
+        hits[name] = audio
+
+    written = []
+    for bar_name, pattern in BARS.items():
+        bar = mix_bar(hits, pattern, rate, bpm, swing)
+        write_wav(os.path.join(spec.output_dir, f"{bar_name}.wav"), bar, rate)
+        written.append((bar_name, len(bar), sum(len(steps) for steps in pattern.values())))
+    return written
+
+
+def read_define(path, name):
+    with open(path, encoding="utf-8") as f:
+        m = re.search(rf"^\s*#define\s+{name}\s+(\d+)", f.read(), re.M)
+    return int(m.group(1)) if m else None
+
+
+def check_grid(spec, bpm=None, swing=None):
+    # 返回问题列表，空列表表示小节网格与固件一致
+    bpm, swing = bar_settings(spec, bpm, swing)
+    problems = []
+    length = bar_ms(bpm)
+    if length != int(length):
+        problems.append(f"{bpm} BPM 的小节长 {length:.3f} ms，不是整数毫秒")
+
+    durations = {}
+    for path in CHORD_SKETCHES:
+        value = read_define(path, "CHORD_DURATION")
+        if value is None:
+            problems.append(f"{os.path.basename(path)} 里没有 CHORD_DURATION")
+        else:
+            durations[os.path.basename(path)] = value
+    if len(set(durations.values())) > 1:
+        problems.append(f"各个程序的 CHORD_DURATION 不一致: {durations}")
+    for sketch, duration in durations.items():
+        if duration % length:
+            problems.append(f"{sketch}: CHORD_DURATION {duration} ms 不是小节长 {length:g} ms 的整数倍")
+
+    drummer = read_define(DRUMMER_SKETCH, "DRUM_BAR_MS")
+    if drummer is None:
+        problems.append("Drummer.ino 里没有 DRUM_BAR_MS")
+    elif drummer != length:
+        problems.append(f"Drummer.ino 的 DRUM_BAR_MS {drummer} 与 {bpm} BPM 的小节长 {length:g} ms 不一致")
+
+    for bar_name in BARS:
+        path = os.path.join(spec.output_dir, f"{bar_name}.wav")
+        if not os.path.exists(path):
+            continue
+        audio, rate = read_wav(path)
+        expected = length * rate / 1000.0
+        if expected != int(expected):
+            problems.append(f"{bar_name}.wav: {rate} Hz 下一小节 {expected:.2f} 帧，不是整数，连续播放会漂移")
+        elif len(audio) != expected:
+            problems.append(f"{bar_name}.wav: {len(audio)} 帧，一小节应为 {int(expected)} 帧"
+                            f"（{len(audio) * 1000.0 / rate:.2f} ms vs {length:g} ms）")
+    return problems
+
+
+def print_grid(spec, bpm=None, swing=None, rate=44100):
+    bpm, swing = bar_settings(spec, bpm, swing)
+    steps = ", ".join(f"{step_ms(s, bpm, swing):.0f}" for s in range(STEPS_PER_BAR))
+    duration = read_define(CHORD_SKETCHES[0], "CHORD_DURATION")
+    per_chord = f"，每组和弦 {duration / bar_ms(bpm):g} 小节" if duration else ""
+    print(f"🥁 {bpm:g} BPM，摇摆 {swing:.2f}：一小节 {bar_ms(bpm):g} ms = {bar_frames(rate, bpm)} 帧 @ {rate} Hz"
+          f"{per_chord}；八分音符位置 {steps} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把单击鼓混成整小节的 wav，并核对小节网格与 CHORD_DURATION")
+    parser.add_argument("--bpm", type=float, default=None, help=f"速度（默认 {DEFAULT_BPM}，或 banks.py 里的 extra['bpm']）")
+    parser.add_argument("--swing", type=float, default=None,
+                        help="每拍第二个八分音符的位置（2/3 三连音摇摆，0.5 平均）")
+    parser.add_argument("--check", action="store_true", help="只核对网格，不重新混音")
+    args = parser.parse_args(argv)
+
+    spec = BANKS["drums"]
+    if not args.check:
+        missing = [name for name in GROOVE if not os.path.exists(os.path.join(spec.output_dir, f"{name}.wav"))]
+        if missing:
+            parser.error(f"{spec.output_dir} 里缺少单击 {', '.join(missing)}，先运行 python DrumGeneration.py")
+        for bar_name, frames, count in mix_bars(spec, args.bpm, args.swing):
+            print(f"🎛️  {bar_name}.wav: {count} 击，{frames} 帧")
+
+    print_grid(spec, args.bpm, args.swing)
+    problems = check_grid(spec, args.bpm, args.swing)
+    for problem in problems:
+        print(f"   ❌ {problem}")
+    if problems:
+        sys.exit(1)
+    print("✅ 小节网格与 CHORD_DURATION / Drummer.ino 一致")
+
+
+if __name__ == "__main__":
+    main()
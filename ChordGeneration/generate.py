@@ -0,0 +1,109 @@
+import argparse
+import os
+import sys
+import tempfile
+
+from bank_qa import add_trim_options, trim_banks
+from banks import BANKS
+from chordmix import is_chord_bank, mix_chords, voice_jobs
+from drumbars import has_bars, mix_bars
+from midi import sample_midi
+from optimize import add_optimize_options, optimize_banks
+from profiling import enable_from_args, stage
+from render import RenderJob, add_render_options, cli_options, make_cache, print_summary, render_bank
+
+# 音色库生成入口：
+#   python generate.py              生成全部音色库
+#   python generate.py piano sax    只生成指定的音色库
+# 鼓库渲染完后混出整小节的 bar.wav / fill.wav（见 drumbars.py）。
+# 可加 --jobs N / --session / --no-cache（见 render.py）、--from-notes（见 chordmix.py），
+# --trim [--align-ms 2] 在渲染后统一起奏位置（见 bank_qa.py），
+# 以及 --optimize [--mono --rate 22050 ...] 在渲染后裁剪音色库（见 optimize.py），
+# --profile trace.json 分阶段计时（见 profiling.py）
+
+
+def bank_jobs(spec):
+    os.makedirs(spec.output_dir, exist_ok=True)
+    jobs = []
+    for name, notes in spec.samples:
+        midi_bytes = sample_midi(notes, program=spec.program, channel=spec.channel,
+                                 velocity=spec.velocity, duration=spec.duration,
+                                 staggered_release=spec.staggered_release, volume=spec.volume)
+        jobs.append(RenderJob(name, midi_bytes, os.path.join(spec.output_dir, f"{name}.wav"),
+                              spec.soundfont, gain=spec.gain))
+    return jobs
+
+
+def build_banks(specs, options=None):
+    # 所有音色库的任务放进同一个渲染池，一次批量完成
+    # --from-notes 时和弦库只渲染单音（放在临时目录），渲染完再叠加成和弦
+    options = options or cli_options([])
+    from_notes = getattr(options, "from_notes", False)
+    with tempfile.TemporaryDirectory(prefix="voices_") as voice_root:
+        jobs = []
+        mixes = []
+        with stage("midi jobs") as s:
+            for spec in specs:
+                if from_notes and is_chord_bank(spec):
+                    voice_dir = os.path.join(voice_root, spec.name)
+                    os.makedirs(voice_dir)
+                    jobs += voice_jobs(spec, voice_dir)
+                    mixes.append((spec, voice_dir))
+                else:
+                    jobs += bank_jobs(spec)
+            s.items = len(jobs)
+        icon = specs[0].icon if len(specs) == 1 else "🎵"
+        report = render_bank(jobs, workers=options.jobs, icon=icon,
+                             session=options.session, cache=make_cache(options))
+        print_summary(report)
+        if not report.failed:
+            for spec, voice_dir in mixes:
+                with stage("mix chords", bank=spec.name) as s:
+                    voices, chords = mix_chords(spec, voice_dir)
+                    s.items = chords
+                print(f"🎛️  {spec.name}: {voices} 个单音叠加出 {chords} 个和弦")
+            # 缓存里是没裁剪的渲染结果，每次都要重新裁剪；整小节要用裁剪后的单击来混
+            if getattr(options, "trim", False):
+                trim_banks(specs, options)
+            for spec in specs:
+                if has_bars(spec):
+                    with stage("mix bars", bank=spec.name) as s:
+                        bars = mix_bars(spec)
+                        s.items = len(bars)
+                    for name, frames, count in bars:
+                        print(f"🎛️  {spec.name}: {name}.wav {count} 击，{frames} 帧")
+    return report
+
+
+def build_bank(spec, options=None):
+    report = build_banks([spec], options or cli_options())
+    if report.failed:
+        sys.exit(1)
+    print(spec.done_message)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成 M5 播放器使用的全部 wav 音色库")
+    parser.add_argument("banks", nargs="*", metavar="bank",
+                        help=f"要生成的音色库（{', '.join(BANKS)}），默认全部")
+    parser.add_argument("--optimize", action="store_true", help="渲染后按播放长度裁剪/下混/重采样")
+    add_render_options(parser)
+    add_optimize_options(parser)
+    add_trim_options(parser)
+    args = parser.parse_args(argv)
+    enable_from_args(args)
+    unknown = [name for name in args.banks if name not in BANKS]
+    if unknown:
+        parser.error(f"未知的音色库: {', '.join(unknown)}")
+    specs = [BANKS[name] for name in (args.banks or BANKS)]
+    report = build_banks(specs, args)
+    if report.failed:
+        sys.exit(1)
+    if args.optimize:
+        optimize_banks(specs, args)
+    print("✅ 所有音色库生成完毕！")
+
+
+if __name__ == "__main__":
+    main()
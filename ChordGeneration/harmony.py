@@ -0,0 +1,562 @@
+import argparse
+import os
+import re
+import sys
+from functools import lru_cache
+
+# 和声规则的唯一来源：级数 -> 和弦、reharm 插入的 ii - V、三全音替代，12 个大调 + 12 个小调。
+# 以前这些规则在 improvisation_test.ino（getChordFromDegree 的 switch + 字符串比较 + sprintf）、
+# receivers 的 tritone()（逐字符解析）、banks.py、Result_process/simulate.py 里各写一份；
+# 现在都从这里来：
+#   - 生成 harmony_tables.h 拷到用到它的 sketch 里，板子上只查表（数组下标），不再拼字符串
+#   - banks.py 用这里的和弦类型生成音色库，simulate.py 用这里的函数模拟 Sender / Receiver
+#   - 检查日志和音色库里的和弦名
+#
+#   python harmony.py                      # 重新生成各 sketch 里的 harmony_tables.h
+#   python harmony.py --check              # 只检查已有的头文件是否与这里的表一致
+#   python harmony.py --check-log ../Result_process/database/Sender.txt ../Result_process/database/Receiver1.txt
+#   python harmony.py --check-bank piano guitar output_chords_piano/bank.pak
+#   python harmony.py --key 9 --minor --check-log ...   # 日志不是 C 大调时
+#
+# 和弦对在 IR 上的紧凑编码（encode_pair / decode_pair，头文件里的 harmonyEncodePair / harmonyWireToText）
+# 也在这里，前后对比见 Result_process/chord_wire.py。
+
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F',
+              'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+# 和弦类型与半音间隔；顺序决定和弦编号（id = 根音 * 类型数 + 类型序号），改动后要重新生成头文件
+QUALITIES = {
+    "maj7": (0, 4, 7, 11),
+    "m7": (0, 3, 7, 10),
+    "7": (0, 4, 7, 10),
+    "mM7": (0, 3, 7, 11),
+    "dim7": (0, 3, 6, 9),
+    "m7b5": (0, 3, 6, 10),
+}
+QUALITY_NAMES = list(QUALITIES)
+
+MODES = ("major", "minor")
+SCALES = {
+    "major": (0, 2, 4, 5, 7, 9, 11),
+    "minor": (0, 2, 3, 5, 7, 8, 10),
+}
+# 与 getChordFromDegree 里的 switch 一致
+DEGREE_QUALITY = {
+    "major": {1: "maj7", 2: "m7", 3: "m7", 4: "maj7", 5: "7", 6: "m7", 7: "m7b5"},
+    "minor": {1: "m7", 2: "m7b5", 3: "maj7", 4: "m7", 5: "7", 6: "maj7", 7: "7"},
+}
+
+NO_CHORD = "0_0_0_0"       # 级数越界时固件返回的字符串
+NO_CHORD_ID = 0xFF
+NUM_KEYS = 12 * len(MODES)
+NUM_CHORDS = 12 * len(QUALITIES)
+NAME_LEN = 12               # "10_1_4_8" 最长 11 个字符 + '\0'
+
+HEADER_NAME = "harmony_tables.h"
+# 用到这些表的 sketch（相对本文件）
+SKETCH_DIRS = [
+    "../band_members/improvisation_test",
+    "../band_members/receivers_test",
+    "../band_members/receivers_Markov",
+]
+
+
+# ---------------- 和弦 ----------------
+
+def chord_name(root, intervals):
+    # 文件名 / 消息里的写法：相对于 C 的半音序列（0-11），例如 G7 -> "7_11_2_5"
+    return "_".join(str((root + interval) % 12) for interval in intervals)
+
+
+def chord_id(root, quality):
+    return (root % 12) * len(QUALITIES) + QUALITY_NAMES.index(quality)
+
+
+def chord_of_id(cid):
+    # -> (根音, 类型)
+    root, q = divmod(cid, len(QUALITIES))
+    return root, QUALITY_NAMES[q]
+
+
+@lru_cache(maxsize=None)
+def chord_names():
+    names = []
+    for cid in range(NUM_CHORDS):
+        root, quality = chord_of_id(cid)
+        names.append(chord_name(root, QUALITIES[quality]))
+    return names
+
+
+@lru_cache(maxsize=None)
+def name_to_id():
+    return {name: cid for cid, name in enumerate(chord_names())}
+
+
+def parse_chord(name):
+    # "7_11_2_5" -> (7, "7")；不是表里的和弦返回 None
+    cid = name_to_id().get(name.strip())
+    return None if cid is None else chord_of_id(cid)
+
+
+def key_index(key_root, mode="major"):
+    # 头文件里 HARMONY_KEY(root, minor) 的 Python 版
+    return MODES.index(mode) * 12 + key_root % 12
+
+
+def key_label(key_root, mode="major"):
+    return NOTE_NAMES[key_root % 12] + (" 大调" if mode == "major" else " 小调")
+
+
+# ---------------- 与固件一一对应的函数 ----------------
+
+def degree_chord_id(key_root, degree, mode="major"):
+    if not 1 <= degree <= 7:
+        return NO_CHORD_ID
+    root = key_root + SCALES[mode][degree - 1]
+    return chord_id(root, DEGREE_QUALITY[mode][degree])
+
+
+def chord_from_degree(key_root, degree, mode="major"):
+    # getChordFromDegree：返回 "0_4_7_11" 形式，级数越界返回 "0_0_0_0"
+    cid = degree_chord_id(key_root, degree, mode)
+    return NO_CHORD if cid == NO_CHORD_ID else chord_names()[cid]
+
+
+def reharm_degrees(reharm_deg):
+    # getReharmProgression 插入的两个级数
+    return (reharm_deg + 1) % 7 or 7, (reharm_deg + 4) % 7 or 7
+
+
+def reharm_progression(key_root, reharm_deg, mode="major"):
+    # getReharmProgression：插入的 ii - V，"a,b"
+    ii_deg, v_deg = reharm_degrees(reharm_deg)
+    return chord_from_degree(key_root, ii_deg, mode) + "," + chord_from_degree(key_root, v_deg, mode)
+
+
+def tritone(chord):
+    # 三全音替代：根音 +6，其余音保持与根音的音程（表外的和弦也按这个算，与固件的兜底一致）
+    notes = [int(n) for n in chord.split("_")[:4]]
+    root = (notes[0] + 6) % 12
+    return "_".join(str((root + (n - notes[0])) % 12) for n in notes)
+
+
+def tritone_id(cid):
+    root, quality = chord_of_id(cid)
+    return chord_id(root + 6, quality)
+
+
+# ---------------- 和弦对的紧凑编码 ----------------
+# IR 上原来发 "2_5_9_0,7_11_2_5T" 这样的文本（15-18 字节）；紧凑格式只有 3 字节：
+# 标记（# 基本和弦对，即原来的 T 结尾；% reharm）+ 两个和弦 id 各一个字符（'0' + id）。
+# 都是可打印字符，不含 ',' 和空白，老的 receiver 收到会直接忽略。
+
+WIRE_BASIC = "#"
+WIRE_REHARM = "%"
+WIRE_OFFSET = ord("0")      # id 0..71 -> '0'..'w'
+WIRE_LEN = 3
+
+
+def encode_pair(pair):
+    # "a,bT" / "a,b" -> 紧凑格式；和弦不在表里返回 None（固件这时照旧发文本）
+    decoded = decode_pair(pair)
+    if decoded is None:
+        return None
+    chord1, chord2, basic = decoded
+    ids = name_to_id()
+    if chord1 not in ids or chord2 not in ids:
+        return None
+    return (WIRE_BASIC if basic else WIRE_REHARM) + chr(WIRE_OFFSET + ids[chord1]) + chr(WIRE_OFFSET + ids[chord2])
+
+
+def decode_pair(msg):
+    # 两种格式都认 -> (和弦1, 和弦2, 是否基本和弦对)；不是和弦对返回 None
+    msg = msg.strip()
+    if len(msg) == WIRE_LEN and msg[0] in (WIRE_BASIC, WIRE_REHARM):
+        id1, id2 = ord(msg[1]) - WIRE_OFFSET, ord(msg[2]) - WIRE_OFFSET
+        if 0 <= id1 < NUM_CHORDS and 0 <= id2 < NUM_CHORDS:
+            names = chord_names()
+            return names[id1], names[id2], msg[0] == WIRE_BASIC
+        return None
+    if "," not in msg:
+        return None
+    chord1, chord2 = msg.split(",", 1)
+    chord2 = chord2.strip()
+    basic = chord2.endswith("T")
+    return chord1, chord2[:-1] if basic else chord2, basic
+
+
+def wire_to_text(msg):
+    # harmonyWireToText：紧凑格式换回原来的文本，其他消息原样返回
+    if len(msg) != WIRE_LEN or msg[0] not in (WIRE_BASIC, WIRE_REHARM):
+        return msg
+    decoded = decode_pair(msg)
+    if decoded is None:
+        return msg
+    chord1, chord2, basic = decoded
+    return f"{chord1},{chord2}" + ("T" if basic else "")
+
+
+# ---------------- 表 ----------------
+
+def tables():
+    # 头文件里的全部表，按 (键, 级数) 展开
+    degree = [[degree_chord_id(k % 12, d, MODES[k // 12]) for d in range(1, 8)] for k in range(NUM_KEYS)]
+    reharm = [[[degree_chord_id(k % 12, x, MODES[k // 12]) for x in reharm_degrees(d)]
+               for d in range(1, 8)] for k in range(NUM_KEYS)]
+    tri = [tritone_id(cid) for cid in range(NUM_CHORDS)]
+    # 名字 -> id：四个音打包成 16 位（与 telemetry.h 的 tlmPackChord 相同），排序后二分查找
+    packed = sorted((pack_notes(name), cid) for cid, name in enumerate(chord_names()))
+    return degree, reharm, tri, packed
+
+
+def pack_notes(name):
+    value = 0
+    for n in name.split("_"):
+        value = (value << 4) | int(n)
+    return value
+
+
+def _rows(values, per_line=12, fmt="{}"):
+    items = [fmt.format(v) for v in values]
+    return ",\n".join("  " + ", ".join(items[i:i + per_line]) for i in range(0, len(items), per_line))
+
+
+def render_header():
+    degree, reharm, tri, packed = tables()
+    keys = ", ".join(f"{NOTE_NAMES[k % 12]}{'' if k < 12 else 'm'}" for k in range(NUM_KEYS))
+    qualities = ", ".join(f"{i} {q}" for i, q in enumerate(QUALITY_NAMES))
+    lines = [
+        "/*",
+        " * Harmony lookup tables, generated by ChordGeneration/harmony.py.",
+        " * Do not edit: change harmony.py and run it again, it rewrites",
+        " * this file in every sketch that includes it.",
+        " *",
+        " * A chord is an id: root * HARMONY_QUALITIES + quality",
+        f" * (qualities: {qualities}).",
+        " * A key is HARMONY_KEY(root, minor): 0-11 major, 12-23 minor.",
+        " *",
+        " * The sender looks its chords up instead of building them",
+        " * with String compares and sprintf, the receivers look the",
+        " * tritone substitution up instead of parsing the notes.",
+        " * Names are the \"7_11_2_5\" strings used on the wire and",
+        " * as WAV file names, so messages and logs do not change.",
+        " */",
+        "",
+        "#ifndef HARMONY_TABLES_H",
+        "#define HARMONY_TABLES_H",
+        "",
+        "#include <Arduino.h>",
+        "",
+        f"#define HARMONY_KEYS        {NUM_KEYS}",
+        f"#define HARMONY_QUALITIES   {len(QUALITIES)}",
+        f"#define HARMONY_CHORDS      {NUM_CHORDS}",
+        f"#define HARMONY_NAME_LEN    {NAME_LEN}",
+        f"#define HARMONY_NO_CHORD    0x{NO_CHORD_ID:02X}",
+        "#define HARMONY_KEY(root, minor) ((minor) ? 12 + (root) % 12 : (root) % 12)",
+        "",
+        f"// [key][degree - 1] -> chord id  ({keys})",
+        f"static const uint8_t HARMONY_DEGREE_CHORD[HARMONY_KEYS][7] PROGMEM = {{",
+        ",\n".join("  {" + ", ".join(str(c) for c in row) + "}" for row in degree),
+        "};",
+        "",
+        "// [key][reharm degree - 1] -> inserted ii - V chord ids",
+        "static const uint8_t HARMONY_REHARM[HARMONY_KEYS][7][2] PROGMEM = {",
+        ",\n".join("  {" + ", ".join("{%d, %d}" % tuple(p) for p in row) + "}" for row in reharm),
+        "};",
+        "",
+        "// chord id -> tritone substitute",
+        "static const uint8_t HARMONY_TRITONE[HARMONY_CHORDS] PROGMEM = {",
+        _rows(tri),
+        "};",
+        "",
+        "static const char HARMONY_CHORD_NAMES[HARMONY_CHORDS][HARMONY_NAME_LEN] PROGMEM = {",
+        _rows(chord_names(), per_line=6, fmt='"{}"'),
+        "};",
+        "",
+        "// name -> id: the 4 notes packed into nibbles, sorted",
+        "static const uint16_t HARMONY_LOOKUP_KEY[HARMONY_CHORDS] PROGMEM = {",
+        _rows([p for p, _ in packed], per_line=8, fmt="0x{:04X}"),
+        "};",
+        "static const uint8_t HARMONY_LOOKUP_ID[HARMONY_CHORDS] PROGMEM = {",
+        _rows([cid for _, cid in packed]),
+        "};",
+        "",
+        "static inline uint8_t harmonyDegreeChord(uint8_t key, int degree) {",
+        "  if (key >= HARMONY_KEYS || degree < 1 || degree > 7) return HARMONY_NO_CHORD;",
+        "  return pgm_read_byte(&HARMONY_DEGREE_CHORD[key][degree - 1]);",
+        "}",
+        "",
+        "// which: 0 = ii, 1 = V",
+        "static inline uint8_t harmonyReharm(uint8_t key, int degree, int which) {",
+        "  if (key >= HARMONY_KEYS || degree < 1 || degree > 7) return HARMONY_NO_CHORD;",
+        "  return pgm_read_byte(&HARMONY_REHARM[key][degree - 1][which]);",
+        "}",
+        "",
+        "static inline uint8_t harmonyTritone(uint8_t id) {",
+        "  if (id >= HARMONY_CHORDS) return HARMONY_NO_CHORD;",
+        "  return pgm_read_byte(&HARMONY_TRITONE[id]);",
+        "}",
+        "",
+        "// id -> \"7_11_2_5\", HARMONY_NO_CHORD -> \"0_0_0_0\"",
+        "static String harmonyName(uint8_t id) {",
+        f"  if (id >= HARMONY_CHORDS) return \"{NO_CHORD}\";",
+        "  char buf[HARMONY_NAME_LEN];",
+        "  strcpy_P(buf, HARMONY_CHORD_NAMES[id]);",
+        "  return String(buf);",
+        "}",
+        "",
+        "// \"7_11_2_5\" -> id, HARMONY_NO_CHORD if it is not in the table",
+        "static uint8_t harmonyChordId(const char *name) {",
+        "  uint16_t packed = 0;",
+        "  int notes = 0;",
+        "  int value = -1;",
+        "  for (const char *p = name; ; p++) {",
+        "    char c = *p ? *p : '_';",
+        "    if (c >= '0' && c <= '9') {",
+        "      value = (value < 0 ? 0 : value * 10) + (c - '0');",
+        "    } else if (c == '_') {",
+        "      if (value < 0 || value > 11 || notes == 4) return HARMONY_NO_CHORD;",
+        "      packed = (packed << 4) | value;",
+        "      notes++;",
+        "      value = -1;",
+        "    } else {",
+        "      return HARMONY_NO_CHORD;",
+        "    }",
+        "    if (!*p) break;",
+        "  }",
+        "  if (notes != 4) return HARMONY_NO_CHORD;",
+        "  int lo = 0, hi = HARMONY_CHORDS - 1;",
+        "  while (lo <= hi) {",
+        "    int mid = (lo + hi) / 2;",
+        "    uint16_t k = pgm_read_word(&HARMONY_LOOKUP_KEY[mid]);",
+        "    if (k == packed) return pgm_read_byte(&HARMONY_LOOKUP_ID[mid]);",
+        "    if (k < packed) lo = mid + 1; else hi = mid - 1;",
+        "  }",
+        "  return HARMONY_NO_CHORD;",
+        "}",
+        "",
+        "// Compact chord pair on the wire: a marker and one character per",
+        "// chord id, 3 bytes instead of e.g. \"2_5_9_0,7_11_2_5T\" (17).",
+        "// All printable, no ',' or spaces, so msg.trim() and the String",
+        "// compares keep working and old receivers simply ignore it.",
+        f"#define HARMONY_WIRE_BASIC  '{WIRE_BASIC}'   // basic pair (the \"T\" suffix)",
+        f"#define HARMONY_WIRE_REHARM '{WIRE_REHARM}'   // reharm ii - V",
+        f"#define HARMONY_WIRE_OFFSET '{chr(WIRE_OFFSET)}'",
+        f"#define HARMONY_WIRE_LEN    {WIRE_LEN}",
+        "",
+        "// out needs HARMONY_WIRE_LEN + 1 bytes; false if a chord is not in the table",
+        "static bool harmonyEncodePair(uint8_t id1, uint8_t id2, bool basic, char *out) {",
+        "  if (id1 >= HARMONY_CHORDS || id2 >= HARMONY_CHORDS) return false;",
+        "  out[0] = basic ? HARMONY_WIRE_BASIC : HARMONY_WIRE_REHARM;",
+        "  out[1] = HARMONY_WIRE_OFFSET + id1;",
+        "  out[2] = HARMONY_WIRE_OFFSET + id2;",
+        "  out[3] = '\\0';",
+        "  return true;",
+        "}",
+        "",
+        "// compact pair -> \"a,bT\" / \"a,b\" as the sender used to send it,",
+        "// any other message is returned unchanged",
+        "static String harmonyWireToText(const String &msg) {",
+        "  if (msg.length() != HARMONY_WIRE_LEN) return msg;",
+        "  char marker = msg[0];",
+        "  if (marker != HARMONY_WIRE_BASIC && marker != HARMONY_WIRE_REHARM) return msg;",
+        "  int id1 = msg[1] - HARMONY_WIRE_OFFSET;",
+        "  int id2 = msg[2] - HARMONY_WIRE_OFFSET;",
+        "  if (id1 < 0 || id1 >= HARMONY_CHORDS || id2 < 0 || id2 >= HARMONY_CHORDS) return msg;",
+        "  String text = harmonyName(id1) + \",\" + harmonyName(id2);",
+        "  if (marker == HARMONY_WIRE_BASIC) text += \"T\";",
+        "  return text;",
+        "}",
+        "",
+        "#endif",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def header_paths():
+    here = os.path.dirname(os.path.abspath(__file__))
+    return [os.path.normpath(os.path.join(here, d, HEADER_NAME)) for d in SKETCH_DIRS]
+
+
+def write_headers(check_only=False):
+    # 返回过期 / 缺失的头文件
+    text = render_header()
+    stale = []
+    for path in header_paths():
+        current = None
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                current = f.read()
+        if current == text:
+            continue
+        stale.append(path)
+        if not check_only:
+            with open(path, "w", encoding="utf-8", newline="\n") as f:
+                f.write(text)
+    return stale
+
+
+# ---------------- 检查日志 ----------------
+
+def _key_sets(key_root, mode):
+    diatonic = {chord_from_degree(key_root, d, mode) for d in range(1, 8)}
+    reharm = {tuple(reharm_progression(key_root, d, mode).split(",")) for d in range(1, 8)}
+    return diatonic, reharm
+
+
+CHORD_RE = r"\d+_\d+_\d+_\d+"
+SENT_PAIR = re.compile(rf"Sent chord pair:\s*({CHORD_RE}),({CHORD_RE})(T?)")
+DEGREES = re.compile(r"^\s*(\d)\s*,\s*(\d)\s*$")
+RECEIVER_PAIR = re.compile(
+    rf"(Next basic chord pair|Playing reharm next|Got first chord pair):\s*({CHORD_RE})\s*&\s*({CHORD_RE})")
+
+
+def check_log(path, key_root=0, mode="major"):
+    # 返回 (检查过的和弦对数, [问题])
+    diatonic, reharm = _key_sets(key_root, mode)
+    label = key_label(key_root, mode)
+    problems = []
+    checked = 0
+    degrees = None
+
+    def unknown(lineno, names):
+        bad = [n for n in names if parse_chord(n) is None]
+        for n in bad:
+            problems.append(f"{path}:{lineno}: 未知和弦 {n}")
+        return bool(bad)
+
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for lineno, line in enumerate(f, 1):
+            m = DEGREES.match(line)
+            if m:
+                degrees = (int(m.group(1)), int(m.group(2)))
+                continue
+            m = SENT_PAIR.search(line)
+            if m:
+                a, b, basic = m.group(1), m.group(2), m.group(3) == "T"
+                checked += 1
+                if unknown(lineno, (a, b)):
+                    continue
+                if basic:
+                    if degrees is not None:
+                        expected = tuple(chord_from_degree(key_root, d, mode) for d in degrees)
+                        if (a, b) != expected:
+                            problems.append(f"{path}:{lineno}: 级数 {degrees} 应为 {expected[0]},{expected[1]}，"
+                                            f"实际 {a},{b}")
+                    elif not {a, b} <= diatonic:
+                        problems.append(f"{path}:{lineno}: {a},{b} 不在 {label}里")
+                elif (a, b) not in reharm:
+                    problems.append(f"{path}:{lineno}: {a},{b} 不是 {label}的 reharm ii - V")
+                degrees = None
+                continue
+            m = RECEIVER_PAIR.search(line)
+            if m:
+                kind, a, b = m.groups()
+                checked += 1
+                if unknown(lineno, (a, b)):
+                    continue
+                if kind == "Playing reharm next":
+                    # 成员 1、4 对第二个和弦做三全音替代
+                    if (a, b) not in reharm and (a, tritone(b)) not in reharm:
+                        problems.append(f"{path}:{lineno}: {a} & {b} 不是 {label}的 reharm ii - V（含三全音替代）")
+                elif not {a, b} <= diatonic:
+                    problems.append(f"{path}:{lineno}: {a} & {b} 不在 {label}里")
+    return checked, problems
+
+
+# ---------------- 检查音色库 ----------------
+
+def required_chords():
+    # 任一调里 Sender 会发、Receiver 会替代出来的和弦
+    names = set()
+    for k in range(NUM_KEYS):
+        root, mode = k % 12, MODES[k // 12]
+        for d in range(1, 8):
+            names.add(chord_from_degree(root, d, mode))
+    names |= {tritone(n) for n in names}
+    return names
+
+
+def _bank_names(source):
+    # 音色库名（banks.py 里的 BANKS）、wav 目录或 bank.pak -> (路径, 文件名集合)
+    if source.endswith(".pak"):
+        from pack import read_pack
+        entries, _ = read_pack(source)
+        return source, {e[0] for e in entries}
+    if not os.path.isdir(source):
+        from banks import BANKS
+        if source not in BANKS:
+            raise SystemExit(f"❌ 找不到音色库：{source}")
+        name, source = source, BANKS[source].output_dir
+        if not os.path.isdir(source):
+            raise SystemExit(f"❌ {source} 不存在，先运行 python generate.py {name}")
+    pak = os.path.join(source, "bank.pak")
+    if not any(f.lower().endswith(".wav") for f in os.listdir(source)) and os.path.exists(pak):
+        return _bank_names(pak)
+    return source, {os.path.splitext(f)[0] for f in os.listdir(source) if f.lower().endswith(".wav")}
+
+
+def check_bank(source):
+    # 返回 (路径, 和弦个数, [缺少的], [未知的])；单音库（文件名不含 "_"）返回 None
+    path, names = _bank_names(source)
+    chords = {n for n in names if "_" in n}
+    if not chords:
+        return None
+    missing = sorted(required_chords() - chords, key=pack_notes)
+    unknown = sorted(n for n in chords if parse_chord(n) is None)
+    return path, len(chords), missing, unknown
+
+
+def main():
+    parser = argparse.ArgumentParser(description="和声表：生成 harmony_tables.h，检查日志和音色库里的和弦")
+    parser.add_argument("--check", action="store_true", help="只检查头文件是否最新，不写入")
+    parser.add_argument("--check-log", nargs="+", metavar="LOG", help="检查日志里的和弦是否符合调内规则")
+    parser.add_argument("--check-bank", nargs="+", metavar="BANK", help="音色库名、wav 目录或 bank.pak")
+    parser.add_argument("--key", type=int, default=0, help="主调根音 0-11，默认 0 (C)")
+    parser.add_argument("--minor", action="store_true", help="小调")
+    args = parser.parse_args()
+
+    mode = "minor" if args.minor else "major"
+    failed = False
+    if args.check_log or args.check_bank:
+        for path in args.check_log or []:
+            checked, problems = check_log(path, args.key, mode)
+            for p in problems[:20]:
+                print("   ", p)
+            if len(problems) > 20:
+                print(f"    ... 还有 {len(problems) - 20} 条")
+            icon = "❌" if problems else "✅"
+            print(f"{icon} {path}: {checked} 对和弦，{len(problems)} 个问题（{key_label(args.key, mode)}）")
+            failed |= bool(problems)
+        for source in args.check_bank or []:
+            result = check_bank(source)
+            if result is None:
+                print(f"⏭️ {source}: 不是和弦音色库，跳过")
+                continue
+            path, count, missing, unknown = result
+            if missing:
+                print(f"    缺少：{', '.join(missing)}")
+            if unknown:
+                print(f"    未知：{', '.join(unknown)}")
+            icon = "❌" if missing or unknown else "✅"
+            print(f"{icon} {path}: {count} 个和弦，缺少 {len(missing)}，未知 {len(unknown)}")
+            failed |= bool(missing or unknown)
+        sys.exit(1 if failed else 0)
+
+    stale = write_headers(check_only=args.check)
+    if args.check:
+        for path in stale:
+            print(f"❌ 过期：{path}")
+        if stale:
+            print("   运行 python harmony.py 重新生成")
+            sys.exit(1)
+        print(f"✅ {HEADER_NAME} 已是最新（{len(header_paths())} 个 sketch）")
+    else:
+        for path in stale:
+            print(f"📝 已写入：{path}")
+        print(f"✅ {NUM_KEYS} 个调 × 7 级，{NUM_CHORDS} 个和弦")
+
+
+if __name__ == "__main__":
+    main()
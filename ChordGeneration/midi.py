@@ -0,0 +1,97 @@
+import struct
+
+# 最小的 MIDI 字节工具：VLQ 编解码、单轨 (format 0) 文件的读写
+
+
+def encode_vlq(value):
+    # MIDI 可变长度数值：每字节 7 位，除最后一个字节外最高位为 1
+    if value < 0:
+        raise ValueError("VLQ 不支持负数")
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def read_vlq(data, pos):
+    value = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        value = (value << 7) | (b & 0x7F)
+        if not b & 0x80:
+            return value, pos
+
+
+def build_midi(events, division=96):
+    # events: [(绝对 tick, 事件字节)]，按 tick 稳定排序后写成 format 0 单轨文件
+    track = bytearray()
+    last_tick = 0
+    for tick, data in sorted(events, key=lambda e: e[0]):
+        track += encode_vlq(tick - last_tick) + bytes(data)
+        last_tick = tick
+    track += b"\x00\xFF\x2F\x00"  # End of track
+
+    header = b"MThd" + struct.pack(">IHHH", 6, 0, 1, division)
+    return header + b"MTrk" + struct.pack(">I", len(track)) + bytes(track)
+
+
+def parse_midi(midi_bytes):
+    # 返回 (division, [(绝对 tick, 事件字节)], 结束 tick)，只读取第一条轨道
+    if midi_bytes[:4] != b"MThd":
+        raise ValueError("不是 MIDI 文件")
+    header_len, _, _, division = struct.unpack(">IHHH", midi_bytes[4:14])
+    pos = 8 + header_len
+    if midi_bytes[pos:pos + 4] != b"MTrk":
+        raise ValueError("找不到 MTrk")
+    (track_len,) = struct.unpack(">I", midi_bytes[pos + 4:pos + 8])
+    pos += 8
+    end = pos + track_len
+
+    events = []
+    tick = 0
+    status = None
+    while pos < end:
+        delta, pos = read_vlq(midi_bytes, pos)
+        tick += delta
+        if midi_bytes[pos] & 0x80:
+            status = midi_bytes[pos]
+            pos += 1
+        elif status is None:
+            raise ValueError("running status 前没有状态字节")
+
+        if status == 0xFF:
+            meta_type = midi_bytes[pos]
+            length, data_pos = read_vlq(midi_bytes, pos + 1)
+            if meta_type == 0x2F:
+                return division, events, tick
+            events.append((tick, bytes([0xFF, meta_type]) + midi_bytes[pos + 1:data_pos + length]))
+            pos = data_pos + length
+        elif status in (0xF0, 0xF7):
+            length, data_pos = read_vlq(midi_bytes, pos)
+            events.append((tick, bytes([status]) + midi_bytes[pos:data_pos + length]))
+            pos = data_pos + length
+        else:
+            n_data = 1 if status & 0xF0 in (0xC0, 0xD0) else 2
+            events.append((tick, bytes([status]) + midi_bytes[pos:pos + n_data]))
+            pos += n_data
+    return division, events, tick
+
+
+def sample_midi(notes, program=None, channel=0, velocity=100, duration=96,
+                staggered_release=False, volume=None, division=96):
+    # 一个采样（单音/和弦/单击鼓）的 MIDI：所有音符同时按下，
+    # staggered_release 时第 i 个音在 duration*(i+1) 抬起（和弦脚本原来的写法），否则同时抬起
+    events = []
+    if volume is not None:
+        events.append((0, bytes([0xB0 | channel, 0x07, volume])))
+    if program is not None:
+        events.append((0, bytes([0xC0 | channel, program])))
+    for n in notes:
+        events.append((0, bytes([0x90 | channel, n, velocity])))
+    for i, n in enumerate(notes):
+        off_tick = duration * (i + 1) if staggered_release else duration
+        events.append((off_tick, bytes([0x80 | channel, n, 0])))
+    return build_midi(events, division)
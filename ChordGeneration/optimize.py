@@ -0,0 +1,121 @@
+import argparse
+import os
+
+import numpy as np
+
+from banks import BANKS
+from profiling import add_profile_options, enable_from_args, stage
+from wavio import read_wav, write_wav
+
+# 渲染后的优化：只保留播放器真正会播放的部分。
+#   1. 按音色库的播放时长 (BankSpec.play_seconds) 截断，结尾加短淡出，去掉释音尾巴
+#   2. 可选下混为单声道
+#   3. 可选重采样到指定采样率
+#   4. 整个音色库统一增益，让最大峰值落在 headroom（dBFS），保持各文件之间的相对音量
+# SD 卡在播放器 file.read(wav_buf, ...) 循环里的读取量就是这里省下的字节数。
+
+DEFAULT_FADE_MS = 10.0
+DEFAULT_HEADROOM_DB = -1.0
+
+
+def truncate(audio, rate, seconds, fade_ms=DEFAULT_FADE_MS):
+    n = int(round(seconds * rate))
+    if len(audio) <= n:
+        return audio
+    audio = audio[:n].copy()
+    fade = min(n, int(rate * fade_ms / 1000.0))
+    if fade > 0:
+        audio[n - fade:] *= np.linspace(1.0, 0.0, fade, dtype=np.float32)[:, None]
+    return audio
+
+
+def downmix(audio):
+    return audio.mean(axis=1, keepdims=True)
+
+
+def resample(audio, rate, new_rate, taps=63):
+    if new_rate == rate:
+        return audio
+    if new_rate < rate:
+        # 降采样前先用加 Hann 窗的 sinc 低通滤波，避免混叠
+        cutoff = 0.5 * new_rate / rate * 0.9
+        n = np.arange(taps) - (taps - 1) / 2.0
+        h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hanning(taps)
+        h /= h.sum()
+        audio = np.stack([np.convolve(audio[:, c], h, mode="same") for c in range(audio.shape[1])], axis=1)
+    n_out = int(round(len(audio) * new_rate / rate))
+    t = np.arange(n_out) * (rate / new_rate)
+    src = np.arange(len(audio))
+    return np.stack([np.interp(t, src, audio[:, c]) for c in range(audio.shape[1])], axis=1).astype(np.float32)
+
+
+def optimize_bank(spec, mono=False, rate=None, headroom_db=DEFAULT_HEADROOM_DB, fade_ms=DEFAULT_FADE_MS):
+    # 返回 (文件数, 优化前字节数, 优化后字节数)
+    paths = sorted(os.path.join(spec.output_dir, f"{name}.wav") for name, _ in spec.samples)
+    paths = [p for p in paths if os.path.exists(p)]
+    before = sum(os.path.getsize(p) for p in paths)
+
+    processed = []
+    for path in paths:
+        audio, src_rate = read_wav(path)
+        audio = truncate(audio, src_rate, spec.play_seconds, fade_ms)
+        if mono and audio.shape[1] > 1:
+            audio = downmix(audio)
+        out_rate = rate or src_rate
+        audio = resample(audio, src_rate, out_rate)
+        processed.append((path, audio, out_rate))
+
+    if headroom_db is not None and processed:
+        peak = max(float(np.abs(audio).max()) if audio.size else 0.0 for _, audio, _ in processed)
+        if peak > 0:
+            gain = 10 ** (headroom_db / 20.0) / peak
+            processed = [(path, audio * gain, r) for path, audio, r in processed]
+
+    for path, audio, out_rate in processed:
+        write_wav(path, audio, out_rate)
+    after = sum(os.path.getsize(p) for p in paths)
+    return len(paths), before, after
+
+
+def add_optimize_options(parser):
+    parser.add_argument("--mono", action="store_true", help="下混为单声道")
+    parser.add_argument("--rate", type=int, default=None, help="重采样到指定采样率，例如 22050")
+    parser.add_argument("--headroom-db", type=float, default=DEFAULT_HEADROOM_DB,
+                        help="整库归一化后的峰值 (dBFS)")
+    parser.add_argument("--no-normalize", action="store_true", help="不做峰值归一化")
+    parser.add_argument("--fade-ms", type=float, default=DEFAULT_FADE_MS, help="截断处的淡出时长")
+    return parser
+
+
+def optimize_banks(specs, options):
+    headroom = None if options.no_normalize else options.headroom_db
+    total_before = total_after = 0
+    for spec in specs:
+        with stage("optimize", bank=spec.name) as s:
+            count, before, after = optimize_bank(spec, mono=options.mono, rate=options.rate,
+                                                 headroom_db=headroom, fade_ms=options.fade_ms)
+            s.items = count
+        total_before += before
+        total_after += after
+        saved = before - after
+        print(f"✂️  {spec.name}: {count} 个文件，{before / 1024:.1f} KB -> {after / 1024:.1f} KB，"
+              f"节省 {saved / 1024:.1f} KB（{100.0 * saved / before if before else 0:.0f}%）")
+    print(f"合计节省 {(total_before - total_after) / 1024:.1f} KB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把渲染好的音色库裁剪到播放器实际播放的长度")
+    parser.add_argument("banks", nargs="*", metavar="bank",
+                        help=f"要优化的音色库（{', '.join(BANKS)}），默认全部")
+    add_optimize_options(parser)
+    add_profile_options(parser)
+    args = parser.parse_args(argv)
+    enable_from_args(args)
+    unknown = [name for name in args.banks if name not in BANKS]
+    if unknown:
+        parser.error(f"未知的音色库: {', '.join(unknown)}")
+    optimize_banks([BANKS[name] for name in (args.banks or BANKS)], args)
+
+
+if __name__ == "__main__":
+    main()
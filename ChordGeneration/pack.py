@@ -0,0 +1,155 @@
+import argparse
+import os
+import struct
+import sys
+import wave
+
+from banks import BANKS
+from profiling import add_profile_options, enable_from_args, stage
+
+# 把一个音色库的所有 wav 打包成一个 bank.pak，M5 播放器启动时打开一次、读入索引表，
+# 之后每次播放只需一次 seek，不再 SD.open() + 解析 WavHeader + 查找 data chunk。
+#
+# 文件格式（小端，与 band_members/*/sample_bank.h 一致）：
+#   header  32 字节: magic "SBNK", version u16, count u16, table_offset u32, entry_size u32, 保留 16 字节
+#   table   count 个 32 字节条目，按 key 排序（播放器用二分查找）:
+#           key char[16], offset u32, length u32, sample_rate u32, channels u8, bits u8, 保留 u16
+#   data    每个采样的 PCM 数据，起始位置按 512 字节（SD 扇区）对齐
+
+MAGIC = b"SBNK"
+VERSION = 1
+ALIGN = 512
+KEY_LEN = 16
+PACK_NAME = "bank.pak"
+
+HEADER = struct.Struct("<4sHHII16x")
+ENTRY = struct.Struct("<16sIIIBBxx")
+
+
+def _align(n, align=ALIGN):
+    return (n + align - 1) // align * align
+
+
+def read_pcm(wav_path):
+    with wave.open(wav_path, "rb") as w:
+        return w.getframerate(), w.getnchannels(), w.getsampwidth() * 8, w.readframes(w.getnframes())
+
+
+def bank_wavs(src_dir):
+    # {key: wav 路径}，key 就是播放器原来拼 "/" + key + ".wav" 时用的字符串
+    wavs = {}
+    for name in os.listdir(src_dir):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() == ".wav":
+            wavs[stem] = os.path.join(src_dir, name)
+    return wavs
+
+
+def pack_bank(src_dir, pack_path=None):
+    pack_path = pack_path or os.path.join(src_dir, PACK_NAME)
+    wavs = bank_wavs(src_dir)
+    keys = sorted(wavs, key=lambda k: k.encode("ascii"))
+    for key in keys:
+        if len(key.encode("ascii")) >= KEY_LEN:
+            raise ValueError(f"key 太长（最多 {KEY_LEN - 1} 字节）: {key}")
+
+    table_offset = HEADER.size
+    offset = _align(table_offset + ENTRY.size * len(keys))
+    entries = []
+    blobs = []
+    for key in keys:
+        rate, channels, bits, pcm = read_pcm(wavs[key])
+        entries.append(ENTRY.pack(key.encode("ascii"), offset, len(pcm), rate, channels, bits))
+        blobs.append((offset, pcm))
+        offset = _align(offset + len(pcm))
+
+    # 先写临时文件再改名，避免留下写了一半的 pack
+    tmp_path = pack_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(keys), table_offset, ENTRY.size))
+        f.write(b"".join(entries))
+        for blob_offset, pcm in blobs:
+            f.write(b"\0" * (blob_offset - f.tell()))
+            f.write(pcm)
+    os.replace(tmp_path, pack_path)
+    return pack_path, len(keys), os.path.getsize(pack_path)
+
+
+def read_pack(pack_path):
+    with open(pack_path, "rb") as f:
+        data = f.read()
+    magic, version, count, table_offset, entry_size = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION or entry_size != ENTRY.size:
+        raise ValueError(f"{pack_path} 不是 v{VERSION} 的 sample bank")
+    entries = []
+    for i in range(count):
+        key, offset, length, rate, channels, bits = ENTRY.unpack_from(data, table_offset + i * entry_size)
+        entries.append((key.rstrip(b"\0").decode("ascii"), offset, length, rate, channels, bits))
+    return entries, data
+
+
+def verify_pack(pack_path, src_dir):
+    # 返回问题列表，空列表表示 pack 与源 wav 完全一致
+    problems = []
+    entries, data = read_pack(pack_path)
+    wavs = bank_wavs(src_dir)
+
+    keys = [e[0] for e in entries]
+    if keys != sorted(keys, key=lambda k: k.encode("ascii")):
+        problems.append("索引表没有按 key 排序")
+    for missing in sorted(set(wavs) - set(keys)):
+        problems.append(f"{missing}: 源目录有 wav，但 pack 里没有")
+
+    last_end = HEADER.size + ENTRY.size * len(entries)
+    for key, offset, length, rate, channels, bits in sorted(entries, key=lambda e: e[1]):
+        if key not in wavs:
+            problems.append(f"{key}: pack 里有，但源目录没有 wav")
+            continue
+        if offset % ALIGN:
+            problems.append(f"{key}: offset {offset} 没有按 {ALIGN} 字节对齐")
+        if offset < last_end or offset + length > len(data):
+            problems.append(f"{key}: 数据区间越界或与前一个采样重叠")
+        last_end = offset + length
+        src_rate, src_channels, src_bits, pcm = read_pcm(wavs[key])
+        if (rate, channels, bits) != (src_rate, src_channels, src_bits):
+            problems.append(f"{key}: 格式不一致 {(rate, channels, bits)} != {(src_rate, src_channels, src_bits)}")
+        if data[offset:offset + length] != pcm:
+            problems.append(f"{key}: PCM 数据与源 wav 不一致")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把音色库打包成 M5 播放器使用的 bank.pak")
+    parser.add_argument("banks", nargs="*", metavar="bank",
+                        help=f"要打包的音色库（{', '.join(BANKS)}）或 wav 目录，默认全部已生成的音色库")
+    parser.add_argument("--verify-only", action="store_true", help="只校验已有的 bank.pak")
+    add_profile_options(parser)
+    args = parser.parse_args(argv)
+    enable_from_args(args)
+
+    dirs = [BANKS[b].output_dir if b in BANKS else b for b in args.banks]
+    if not dirs:
+        dirs = [spec.output_dir for spec in BANKS.values() if os.path.isdir(spec.output_dir)]
+
+    failed = False
+    for src_dir in dirs:
+        pack_path = os.path.join(src_dir, PACK_NAME)
+        if not args.verify_only:
+            with stage("pack", bank=src_dir) as s:
+                _, count, size = pack_bank(src_dir, pack_path)
+                s.items = count
+            print(f"📦 {pack_path}: {count} 个采样，{size / 1024:.1f} KB")
+        with stage("verify pack", bank=src_dir):
+            problems = verify_pack(pack_path, src_dir)
+        for problem in problems:
+            print(f"   ❌ {problem}")
+        if problems:
+            failed = True
+        else:
+            print(f"✅ {pack_path} 校验通过")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# 流水线分阶段计时（可选开启）：生成音色库（ChordGeneration）和分析日志（Result_process）都用它，
+# 看时间到底花在 fluidsynth、正则解析、pandas 分位数、openpyxl 导出还是 dpi=300 的 savefig 上。
+#
+#   PROFILE=result/profile.json python generate.py piano      # 任何脚本都可以用环境变量开启
+#   python report.py --profile result/profile.json             # 或者带 --profile 的入口（见 add_profile_options）
+#
+#   with stage("parse", log=path) as s:                        # 没开启时什么都不做
+#       log = load_log(path)
+#       s.items = len(log.rounds)
+#
+# 每个阶段记录墙钟时间、CPU 时间（本进程 + 已结束的子进程，所以 fluidsynth 也算在内）、
+# tracemalloc 的峰值（阶段内比开始时多分配的 Python 内存，嵌套阶段各自统计）和处理的条目数。
+# 进程结束时写 Chrome trace（chrome://tracing 或 https://ui.perfetto.dev 打开），并打印按阶段汇总的表。
+# 在进程池 / 线程池里跑的任务没法直接包 stage，可以在主进程里用 add_event() 补记它们各自测好的时间。
+# 开启 tracemalloc 会让纯 Python 的阶段慢 1.5-3 倍，只看时间时用 PROFILE_MEMORY=0 关掉。
+
+ENV_PATH = "PROFILE"
+ENV_MEMORY = "PROFILE_MEMORY"
+
+
+class Stage:
+    __slots__ = ("name", "args", "items", "start", "wall", "cpu", "peak", "tid")
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.items = None
+        self.start = self.wall = self.cpu = 0.0
+        self.peak = 0
+        self.tid = threading.get_ident()
+
+
+class _Disabled:
+    # 没开启时 stage() 给出的对象：可以照常设置 items，不做任何记录
+    __slots__ = ("items",)
+
+
+class Profiler:
+
+    def __init__(self, path, memory=True):
+        self.path = path
+        self.memory = memory
+        self.events = []
+        self.origin = time.perf_counter()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def _fold_peak(self, stack):
+        # 把到现在为止的峰值记到最内层阶段上，再重新开始统计，嵌套阶段各自得到自己的峰值
+        if self.memory and stack:
+            stack[-1].peak = max(stack[-1].peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+
+    @contextmanager
+    def stage(self, name, **args):
+        stack = self._stack()
+        record = Stage(name, args)
+        self._fold_peak(stack)
+        base = tracemalloc.get_traced_memory()[0] if self.memory else 0
+        if self.memory:
+            tracemalloc.reset_peak()
+        stack.append(record)
+        t = os.times()
+        record.start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.wall = time.perf_counter() - record.start
+            u = os.times()
+            record.cpu = max(u.user + u.system + u.children_user + u.children_system
+                             - t.user - t.system - t.children_user - t.children_system, 0.0)
+            self._fold_peak(stack)
+            stack.pop()
+            record.peak = max(record.peak - base, 0)
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, record.peak + base)
+            with self.lock:
+                self.events.append(record)
+
+    def add_event(self, name, start, wall, cpu=None, items=None, tid=None, **args):
+        # 在别处测好的时间（进程池里的任务等）；start 是 time.perf_counter() 的值
+        record = Stage(name, args)
+        record.start, record.wall, record.cpu, record.items = start, wall, cpu, items
+        record.peak = None
+        if tid is not None:
+            record.tid = tid
+        with self.lock:
+            self.events.append(record)
+
+    def trace(self):
+        events = []
+        for e in sorted(self.events, key=lambda e: e.start):
+            args = dict(e.args)
+            if e.cpu is not None:
+                args["cpu_ms"] = round(e.cpu * 1000, 3)
+            if e.peak is not None and self.memory:
+                args["peak_kb"] = round(e.peak / 1024, 1)
+            if e.items is not None:
+                args["items"] = e.items
+            events.append({"name": e.name, "ph": "X", "pid": os.getpid(), "tid": e.tid,
+                           "ts": round((e.start - self.origin) * 1e6, 1), "dur": round(e.wall * 1e6, 1),
+                           "args": args})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self):
+        # 按阶段名汇总：[(名字, 次数, 墙钟, CPU, 峰值, 条目数)]，按墙钟时间从大到小
+        rows = {}
+        for e in self.events:
+            row = rows.setdefault(e.name, [e.name, 0, 0.0, None, None, None])
+            row[1] += 1
+            row[2] += e.wall
+            if e.cpu is not None:
+                row[3] = (row[3] or 0.0) + e.cpu
+            if e.peak is not None:
+                row[4] = max(row[4] or 0, e.peak)
+            if e.items is not None:
+                row[5] = (row[5] or 0) + e.items
+        return sorted((tuple(r) for r in rows.values()), key=lambda r: -r[2])
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        total = time.perf_counter() - self.origin
+        width = max(len(r[0]) for r in rows) + 2
+        print(f"⏱️  分阶段耗时（总计 {total:.2f}s）")
+        print(f"   {'stage':<{width}}{'calls':>6}{'wall s':>10}{'share':>7}{'cpu s':>10}{'peak MB':>10}"
+              f"{'items':>10}{'items/s':>12}")
+        for name, calls, wall, cpu, peak, items in rows:
+            cpu_text = f"{cpu:.3f}" if cpu is not None else "-"
+            peak_text = f"{peak / 2 ** 20:.1f}" if peak is not None and self.memory else "-"
+            items_text = f"{items}" if items is not None else "-"
+            rate_text = f"{items / wall:.0f}" if items is not None and wall > 0 else "-"
+            print(f"   {name:<{width}}{calls:>6}{wall:>10.3f}{wall / total:>7.0%}{cpu_text:>10}{peak_text:>10}"
+                  f"{items_text:>10}{rate_text:>12}")
+
+    def write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.trace(), f)
+        print(f"🧭 trace 已写入 {self.path}（chrome://tracing 或 https://ui.perfetto.dev 打开）")
+
+
+_profiler = None
+
+
+def enable(path, memory=None):
+    # 开启后进程退出时自动写 trace、打印汇总；重复调用只生效一次
+    global _profiler
+    if _profiler is None:
+        if memory is None:
+            memory = os.environ.get(ENV_MEMORY, "1") != "0"
+        _profiler = Profiler(path, memory)
+        atexit.register(_finish)
+    return _profiler
+
+
+def _after_fork():
+    # 进程池的子进程（fork）不继承计时和 tracemalloc，否则子进程里的绘图会被 tracemalloc 拖慢几倍；
+    # 子进程的时间由主进程用 add_event() 记录
+    global _profiler
+    if _profiler is not None:
+        _profiler = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _finish():
+    if _profiler is not None and _profiler.events:
+        _profiler.print_summary()
+        _profiler.write()
+
+
+def active():
+    return _profiler
+
+
+def stage(name, **args):
+    if _profiler is None:
+        return _disabled()
+    return _profiler.stage(name, **args)
+
+
+@contextmanager
+def _disabled():
+    yield _Disabled()
+
+
+def add_event(name, start, wall, **kwargs):
+    if _profiler is not None:
+        _profiler.add_event(name, start, wall, **kwargs)
+
+
+def add_profile_options(parser):
+    parser.add_argument("--profile", metavar="TRACE_JSON", default=None,
+                        help=f"分阶段计时，结束时写 Chrome trace 并打印汇总（也可以用环境变量 {ENV_PATH}=路径）")
+    return parser
+
+
+def enable_from_args(args=None):
+    path = getattr(args, "profile", None) or os.environ.get(ENV_PATH)
+    if path:
+        enable(path)
+
+
+def _in_worker():
+    # spawn 方式启动的进程池子进程也会读到环境变量，不能让它们覆盖主进程的 trace
+    mp = sys.modules.get("multiprocessing")
+    return mp is not None and mp.current_process().name != "MainProcess"
+
+
+# 只设了环境变量、脚本本身没有 --profile 选项时（例如 DrumGeneration.py）也能开启
+if os.environ.get(ENV_PATH) and not _in_worker():
+    enable(os.environ[ENV_PATH])
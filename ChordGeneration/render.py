@@ -0,0 +1,267 @@
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+from cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES, RenderCache, remove_output
+from midi import build_midi, parse_midi
+from profiling import add_event, add_profile_options, enable_from_args, stage
+
+# 所有 ChordGeneration 脚本共用的 fluidsynth 渲染驱动：
+# 每个任务在自己的临时目录里写 .mid，多个 fluidsynth 进程并行渲染，
+# 最后统一打印进度和失败汇总。
+#
+# session 模式下，同一个 SoundFont + 增益的所有任务拼成一条长 MIDI，
+# 每个任务占一个固定长度的时间槽，只启动一次 fluidsynth（SoundFont 只加载一次），
+# 再按时间槽把渲染结果切回每个文件原来的名字。
+
+DEFAULT_TEMPO = 500000        # 微秒/四分音符（120 BPM，fluidsynth 默认速度）
+SESSION_TAIL_SECONDS = 1.0    # 每个时间槽在音符结束后留给释音的时间
+
+
+@dataclass
+class RenderJob:
+    name: str              # 输出名（不含扩展名），例如 "7_11_2_5" 或 "0"
+    midi_bytes: bytes      # 完整的 .mid 文件内容
+    wav_path: str          # 输出 wav 路径
+    soundfont_path: str
+    gain: float = 2.0
+
+
+@dataclass
+class RenderReport:
+    total: int = 0
+    done: list = field(default_factory=list)
+    cached: list = field(default_factory=list)   # 缓存命中、没有重新渲染的文件
+    failed: list = field(default_factory=list)   # [(name, 错误信息)]
+    elapsed: float = 0.0
+    workers: int = 1
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def fluidsynth_cmd(soundfont_path, gain, midi_path, wav_path):
+    return [
+        "fluidsynth",
+        "-ni",
+        "-g", f"{gain:g}",   # 不四舍五入到一位小数，0.25 和 0.2 是不同的增益
+        soundfont_path,
+        midi_path,
+        "-F", wav_path,
+        "-T", "wav"
+    ]
+
+
+def render_one(job):
+    # 每个任务一个临时目录，避免并行时 {name}.mid 在当前目录互相覆盖
+    tmp_dir = tempfile.mkdtemp(prefix="render_")
+    try:
+        midi_path = os.path.join(tmp_dir, f"{job.name}.mid")
+        with open(midi_path, "wb") as f:
+            f.write(job.midi_bytes)
+        os.makedirs(os.path.dirname(job.wav_path) or ".", exist_ok=True)
+        remove_output(job.wav_path)  # 可能是缓存的硬链接，不能原地覆盖
+        subprocess.run(fluidsynth_cmd(job.soundfont_path, job.gain, midi_path, job.wav_path),
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return [job]
+
+
+def session_slot(jobs, tail_seconds=SESSION_TAIL_SECONDS):
+    # 整组共用的 (division, 时间槽 tick 数)
+    parsed = [parse_midi(job.midi_bytes) for job in jobs]
+    division = parsed[0][0]
+    if any(p[0] != division for p in parsed):
+        raise ValueError("同一个 session 里的 MIDI 必须使用相同的 division")
+    sec_per_tick = DEFAULT_TEMPO / 1e6 / division
+    return division, max(p[2] for p in parsed) + int(round(tail_seconds / sec_per_tick))
+
+
+def build_session_midi(jobs, slot_ticks=None):
+    # 返回 (拼接后的 MIDI 字节, 每个时间槽的秒数)
+    parsed = [parse_midi(job.midi_bytes) for job in jobs]
+    division = parsed[0][0]
+    if slot_ticks is None:
+        division, slot_ticks = session_slot(jobs)
+    sec_per_tick = DEFAULT_TEMPO / 1e6 / division
+
+    tempo = DEFAULT_TEMPO.to_bytes(3, "big")
+    events = [(0, b"\xFF\x51\x03" + tempo)]
+    for k, (_, job_events, _) in enumerate(parsed):
+        offset = k * slot_ticks
+        # 时间槽开始时切断上一个槽残留的声音 (CC 120 All Sound Off)
+        events += [(offset, bytes([0xB0 | ch, 120, 0])) for ch in range(16)]
+        events += [(offset + tick, data) for tick, data in job_events if data[:2] != b"\xFF\x51"]
+    # 最后一个槽也要完整渲染到结尾
+    events += [(len(jobs) * slot_ticks, bytes([0xB0 | ch, 120, 0])) for ch in range(16)]
+    return build_midi(events, division), slot_ticks * sec_per_tick
+
+
+def split_wav(session_wav, wav_paths, slot_seconds):
+    with wave.open(session_wav, "rb") as src:
+        n_channels, sampwidth, rate = src.getnchannels(), src.getsampwidth(), src.getframerate()
+        frames = src.readframes(src.getnframes())
+    frame_bytes = n_channels * sampwidth
+
+    for k, wav_path in enumerate(wav_paths):
+        start = round(k * slot_seconds * rate) * frame_bytes
+        stop = round((k + 1) * slot_seconds * rate) * frame_bytes
+        os.makedirs(os.path.dirname(wav_path) or ".", exist_ok=True)
+        remove_output(wav_path)
+        with wave.open(wav_path, "wb") as out:
+            out.setnchannels(n_channels)
+            out.setsampwidth(sampwidth)
+            out.setframerate(rate)
+            out.writeframes(frames[start:stop])
+
+
+def render_session(jobs, slot_ticks=None):
+    # 同一个 SoundFont/增益的一组任务：只调用一次 fluidsynth
+    tmp_dir = tempfile.mkdtemp(prefix="render_session_")
+    try:
+        midi_bytes, slot_seconds = build_session_midi(jobs, slot_ticks)
+        midi_path = os.path.join(tmp_dir, "session.mid")
+        session_wav = os.path.join(tmp_dir, "session.wav")
+        with open(midi_path, "wb") as f:
+            f.write(midi_bytes)
+        subprocess.run(fluidsynth_cmd(jobs[0].soundfont_path, jobs[0].gain, midi_path, session_wav),
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        split_wav(session_wav, [job.wav_path for job in jobs], slot_seconds)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return jobs
+
+
+def session_groups(jobs):
+    groups = {}
+    for job in jobs:
+        groups.setdefault((job.soundfont_path, job.gain), []).append(job)
+    return list(groups.values())
+
+
+def _error_text(exc):
+    if isinstance(exc, subprocess.CalledProcessError) and exc.stderr:
+        lines = exc.stderr.decode("utf-8", "replace").strip().splitlines()
+        return lines[-1] if lines else str(exc)
+    return str(exc)
+
+
+def _timed(func, todo, *args):
+    # 在线程池里运行，记下每次 fluidsynth 调用的时间（--profile 时进 trace）
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        add_event("fluidsynth", start, time.perf_counter() - start, items=len(todo),
+                  job=todo[0].name if len(todo) == 1 else f"{todo[0].name} .. {todo[-1].name}")
+
+
+def render_bank(jobs, workers=None, icon="🎵", session=False, cache=None):
+    jobs = list(jobs)
+    report = RenderReport(total=len(jobs))
+    start = time.perf_counter()
+
+    # 每组 = (需要一起渲染的任务, 渲染模式)；session 模式下时间槽按整组计算，
+    # 这样只重渲染部分文件时，输出和缓存 key 仍与整组渲染一致
+    if session:
+        groups = []
+        for group in session_groups(jobs):
+            division, slot_ticks = session_slot(group)
+            groups.append((group, f"session:{division}:{slot_ticks}", slot_ticks))
+    else:
+        groups = [([job], "file", None) for job in jobs]
+
+    keys = {}
+    units = []
+    with stage("cache lookup") as s:
+        for group, mode, slot_ticks in groups:
+            todo = []
+            for job in group:
+                if cache is not None:
+                    try:
+                        keys[job.wav_path] = cache.key(job, mode)
+                    except OSError as exc:
+                        # 例如 SoundFont 不存在：记为失败，不中断其他音色库
+                        report.failed.append((job.name, str(exc)))
+                        continue
+                    if cache.fetch(keys[job.wav_path], job.wav_path):
+                        report.cached.append(job.name)
+                        print(f"♻️  [{len(report.done) + len(report.cached)}/{report.total}] 缓存命中 {job.name}.wav")
+                        continue
+                todo.append(job)
+            if todo:
+                units.append((todo, slot_ticks))
+        s.items = len(jobs) - len(report.failed)
+
+    report.workers = max(1, min(workers or default_workers(), len(units) or 1))
+    with stage("render", workers=report.workers) as s, ThreadPoolExecutor(max_workers=report.workers) as pool:
+        s.items = sum(len(todo) for todo, _ in units)
+        futures = {}
+        for todo, slot_ticks in units:
+            if session:
+                future = pool.submit(_timed, render_session, todo, todo, slot_ticks)
+            else:
+                future = pool.submit(_timed, render_one, todo, todo[0])
+            futures[future] = todo
+        for future in as_completed(futures):
+            unit_jobs = futures[future]
+            try:
+                future.result()
+                for job in unit_jobs:
+                    if cache is not None:
+                        cache.store(keys[job.wav_path], job.wav_path)
+                    report.done.append(job.name)
+                    print(f"{icon} [{len(report.done) + len(report.cached) + len(report.failed)}/{report.total}] "
+                          f"渲染 {job.name}.wav")
+            except Exception as exc:
+                for job in unit_jobs:
+                    report.failed.append((job.name, _error_text(exc)))
+                    print(f"❌ [{len(report.done) + len(report.cached) + len(report.failed)}/{report.total}] "
+                          f"{job.name}.wav 渲染失败")
+
+    if cache is not None:
+        cache.evict()
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def print_summary(report):
+    print(f"共 {report.total} 个文件，渲染 {len(report.done)}，缓存命中 {len(report.cached)}，"
+          f"失败 {len(report.failed)}，用时 {report.elapsed:.1f}s（{report.workers} 个并行任务）")
+    for name, err in report.failed:
+        print(f"   ❌ {name}: {err}")
+
+
+def add_render_options(parser):
+    parser.add_argument("--jobs", type=int, default=None, help="并行 fluidsynth 任务数（默认 CPU 核数）")
+    parser.add_argument("--session", action="store_true", help="每个 SoundFont 只加载一次，整组一次渲染")
+    parser.add_argument("--no-cache", action="store_true", help="不使用渲染缓存，全部重新渲染")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="缓存容量上限 (MB)，超过后按最近使用时间淘汰")
+    parser.add_argument("--from-notes", action="store_true",
+                        help="和弦库只渲染单音，再用 numpy 叠加成和弦（见 chordmix.py）")
+    add_profile_options(parser)
+    return parser
+
+
+def cli_options(argv=None):
+    parser = add_render_options(argparse.ArgumentParser(add_help=False))
+    options, _ = parser.parse_known_args(argv)
+    enable_from_args(options)
+    return options
+
+
+def make_cache(options):
+    if options.no_cache:
+        return None
+    return RenderCache(options.cache_dir, options.cache_size * 1024 * 1024)
+
@@ -0,0 +1,34 @@
+import os
+import wave
+
+import numpy as np
+
+# wav <-> numpy：float32 数组，形状 (帧数, 声道数)，取值范围 [-1, 1)
+# 只支持 16 位 PCM（fluidsynth -T wav 的默认输出，也是 M5 播放器要求的格式）
+
+
+def read_wav(path):
+    with wave.open(path, "rb") as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f"{path}: 只支持 16 位 PCM")
+        rate, channels = w.getframerate(), w.getnchannels()
+        frames = w.readframes(w.getnframes())
+    samples = np.frombuffer(frames, dtype="<i2").reshape(-1, channels)
+    return samples.astype(np.float32) / 32768.0, rate
+
+
+def to_pcm16(audio):
+    return np.clip(np.round(audio * 32768.0), -32768, 32767).astype("<i2")
+
+
+def write_wav(path, audio, rate):
+    # 先写临时文件再改名：输出可能是渲染缓存的硬链接，不能原地截断
+    if audio.ndim == 1:
+        audio = audio[:, None]
+    tmp_path = path + ".tmp"
+    with wave.open(tmp_path, "wb") as w:
+        w.setnchannels(audio.shape[1])
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(to_pcm16(audio).tobytes())
+    os.replace(tmp_path, path)
@@ -1,27 +1,18 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 
-# 读取 Excel 文件
-df = pd.read_excel("result/receiver_drift_analysis.xlsx")
+from intermediate import export_excel, iqr_bounds, receiver_outlier_frame
 
-# 计算 IQR
-Q1 = df['drift_ms'].quantile(0.25)
-Q3 = df['drift_ms'].quantile(0.75)
-IQR = Q3 - Q1
+# 读取带 is_outlier 标记的中间表（见 intermediate.py）
+df = receiver_outlier_frame()
 
-# 计算下界和上界
-lower_bound = Q1 - 1.5 * IQR
-upper_bound = Q3 + 1.5 * IQR
+# 计算 IQR 和上下界
+Q1, Q3, lower_bound, upper_bound = iqr_bounds(df['drift_ms'])
 
-# 标记是否为异常值
-df['is_outlier'] = (df['drift_ms'] < lower_bound) | (df['drift_ms'] > upper_bound)
-
-# 保存标记后的结果为新文件
-df.to_excel("result/receiver_drift_with_outliers.xlsx", index=False)
+# 保存标记后的结果为新文件（加 --excel 时）
+export_excel(df, "result/receiver_drift_with_outliers.xlsx", index=False)
 
 # 打印统计信息
 print("异常值数量:", df['is_outlier'].sum())
-print("保存为 receiver_drift_with_outliers.xlsx")
 
 # ----------- 绘图部分 ------------
 plt.figure(figsize=(10, 6))
@@ -1,22 +1,11 @@
-import re
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from log_parser import load_log
+
 def parse_sync_only(file_path, label):
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    sync_times = []
-    round_number = 1
-    for line in lines:
-        line = line.strip()
-        if line.startswith("Chord Sync time:"):
-            m = re.search(r"Chord Sync time:\s*(\d+)", line)
-            if m:
-                sync_times.append({"Round": round_number, f"{label}_SyncTime": int(m.group(1))})
-                round_number += 1
-
-    return pd.DataFrame(sync_times)
+    sync_times = [ms for ms in load_log(file_path).sync["sync_ms"] if ms is not None]
+    return pd.DataFrame({"Round": range(1, len(sync_times) + 1), f"{label}_SyncTime": sync_times})
 
 # 解析两个日志
 df_def  = parse_sync_only("database/Sender.txt",        "Default")
@@ -1,40 +1,17 @@
-import re
 import matplotlib.pyplot as plt
 import pandas as pd
 
+from log_parser import load_log
+
 # 路径根据实际调整
 filepath = "database/Receiver_Markov.txt"
 
-# 读取文件
-with open(filepath, "r", encoding="utf-8") as f:
-    lines = f.readlines()
-
-# 解析 drift、vote、failed
-drifts = []
-round_nums = []
-votes = []
-failed_rounds = []
-
-current_round = None
-for line in lines:
-    line = line.strip()
-    # Drift 行
-    m = re.match(r"\[Drift\] Round (\d+): Drift = (\d+) ms", line)
-    if m:
-        current_round = int(m.group(1))
-        drift_val = int(m.group(2))
-        round_nums.append(current_round)
-        drifts.append(drift_val)
-        continue
-    # 标记 vote
-    if "Sent vote (Markov):" in line:
-        m2 = re.search(r"Sent vote \(Markov\):\s*(VOTE_YES2|VOTE_NO2)", line)
-        if m2 and current_round is not None:
-            vote = m2.group(1)
-            votes.append((current_round, vote))
-    # failed
-    if "vote failed" in line.lower() and current_round is not None:
-        failed_rounds.append(current_round)
+# 解析 drift、vote、failed（见 log_parser.py）
+rounds = load_log(filepath).rounds
+round_nums = rounds["round"]
+drifts = rounds["drift_ms"]
+votes = [(r, v) for r, v, p in zip(rounds["round"], rounds["vote"], rounds["policy"]) if p == "markov"]
+failed_rounds = [r for r, failed in zip(rounds["round"], rounds["failed"]) if failed]
 
 # 统计
 vote_yes = sum(1 for _, v in votes if "YES" in v)
@@ -0,0 +1,326 @@
+import argparse
+import csv
+import math
+import os
+import statistics
+import sys
+
+import chordgen  # noqa: F401
+from log_parser import load_log
+from profiling import add_profile_options, enable_from_args, stage
+from streaming_iqr import DriftOutlierDetector
+
+# 所有分析的统一入口，日志路径都从命令行传入，不再写死 database/...、result/...。
+# 顶层只导入 log_parser / streaming_iqr（纯 Python），pandas、numpy、matplotlib 只在需要的子命令里导入，
+# 所以只看文字汇总时（parse / stats / outliers / votes / compare）启动很快，演出现场的笔记本上也能随手跑。
+#
+#   python analyze.py stats database/Sender_Markov.txt database/Receiver_Markov.txt
+#   python analyze.py parse capture/*.txt --csv result/parsed          # 每个表一个 CSV
+#   python analyze.py outliers database/receiver_drift.txt --list
+#   python analyze.py votes database/Sender.txt --theory default        # 与理论通过率对比（导入 numpy）
+#   python analyze.py compare database/Sender.txt database/Sender_Markov.txt
+#   python analyze.py plot drift database/receiver_drift.txt --out result/drift.png   # 导入 matplotlib
+#   python analyze.py report --default-sender capture/Sender.txt ...    # 参数与 report.py 相同
+#   python analyze.py --profile result/profile.json stats ...           # 分阶段计时（见 ChordGeneration/profiling.py）
+#
+# 日志类型（Sender / Receiver）按内容判断；接收器的二进制遥测日志（.bin）也可以直接传。
+
+TABLES = ("system_sync", "sync", "votes", "rounds")
+
+
+def _load(path):
+    if not os.path.exists(path):
+        sys.exit(f"❌ 找不到日志: {path}")
+    with stage("parse", log=path) as s:
+        log = load_log(path)
+        s.items = len(log.rounds) + len(log.sync) + len(log.votes)
+    return log
+
+
+def _quantile(values, q):
+    # 与 numpy / pandas 默认的线性插值一致
+    values = sorted(values)
+    if not values:
+        return math.nan
+    pos = (len(values) - 1) * q
+    lo = math.floor(pos)
+    return values[lo] if pos == lo else values[lo] + (values[lo + 1] - values[lo]) * (pos - lo)
+
+
+def drift_bounds(drifts, method="exact", k=1.5):
+    detector = DriftOutlierDetector(method=method, k=k)
+    for d in drifts:
+        detector.add(d)
+    return detector.bounds()
+
+
+def sender_stats(log):
+    results = log.votes["result"]
+    sync = [ms for ms in log.sync["sync_ms"] if ms is not None]
+    return {
+        "votes": len(results),
+        "reharm": results.count("reharm"),
+        "basic": results.count("basic"),
+        "failed": results.count("failed"),
+        "pass_rate": log.votes["pass_rate"][-1] if results else math.nan,
+        "sync_rounds": len(sync),
+        "sync_mean": statistics.fmean(sync) if sync else math.nan,
+        "sync_median": _quantile(sync, 0.5),
+        "sync_p90": _quantile(sync, 0.9),
+        "sync_max": max(sync, default=math.nan),
+        "system_sync": log.system_sync["sync_ms"][-1] if len(log.system_sync) else math.nan,
+    }
+
+
+def receiver_stats(log, method="exact"):
+    rounds = log.rounds
+    drift = rounds["drift_ms"]
+    q1, q3, lower, upper = drift_bounds(drift, method)
+    votes = [v for v in rounds["vote"] if v]
+    return {
+        "rounds": len(drift),
+        "drift_mean": statistics.fmean(drift) if drift else math.nan,
+        "drift_median": _quantile(drift, 0.5),
+        "q1": q1,
+        "q3": q3,
+        "outliers": sum(not lower <= d <= upper for d in drift),
+        "yes": sum(v.startswith("VOTE_YES") for v in votes),
+        "no": sum(v.startswith("VOTE_NO") for v in votes),
+        "failed": sum(rounds["failed"]),
+    }
+
+
+def log_stats(log):
+    return sender_stats(log) if log.kind == "sender" else receiver_stats(log)
+
+
+def _label(log):
+    policy = f"，{log.policy}" if log.kind == "receiver" and log.policy else ""
+    return f"{log.path}（{log.kind or '空日志'}{policy}）"
+
+
+# ---------------- 子命令 ----------------
+
+def cmd_parse(args):
+    for path in args.logs:
+        log = _load(path)
+        counts = "，".join(f"{name} {len(getattr(log, name))}" for name in TABLES)
+        print(f"📄 {_label(log)}: {counts}")
+        if args.csv:
+            os.makedirs(args.csv, exist_ok=True)
+            stem = os.path.splitext(os.path.basename(path))[0]
+            for name in TABLES:
+                table = getattr(log, name)
+                if not len(table):
+                    continue
+                out = os.path.join(args.csv, f"{stem}_{name}.csv")
+                with open(out, "w", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(table.columns)
+                    writer.writerows(zip(*table.columns.values()))
+                print(f"   ✅ {out}")
+
+
+def print_stats(log):
+    s = log_stats(log)
+    print(f"📊 {_label(log)}")
+    if log.kind == "sender":
+        print(f"   投票 {s['votes']} 次：reharm {s['reharm']}，basic {s['basic']}，failed {s['failed']}，"
+              f"最终 pass rate {s['pass_rate']:.2f}")
+        print(f"   Chord Sync time {s['sync_rounds']} 轮：平均 {s['sync_mean']:.1f} ms，中位数 {s['sync_median']:g} ms，"
+              f"90% 分位 {s['sync_p90']:g} ms，最大 {s['sync_max']:g} ms"
+              + ("" if math.isnan(s["system_sync"]) else f"；System Sync time {s['system_sync']:g} ms"))
+    elif log.kind == "receiver":
+        print(f"   Drift {s['rounds']} 轮：平均 {s['drift_mean']:.1f} ms，中位数 {s['drift_median']:g} ms，"
+              f"Q1 / Q3 {s['q1']:g} / {s['q3']:g} ms，异常值 {s['outliers']} 轮（1.5×IQR）")
+        print(f"   投票 YES {s['yes']} / NO {s['no']} / failed {s['failed']}")
+    else:
+        print("   没有可识别的记录")
+
+
+def cmd_stats(args):
+    for path in args.logs:
+        print_stats(_load(path))
+
+
+def cmd_outliers(args):
+    for path in args.logs:
+        log = _load(path)
+        rounds = log.rounds
+        if not len(rounds):
+            print(f"⏭️ {path}: 不是接收器日志，跳过")
+            continue
+        drift = rounds["drift_ms"]
+        q1, q3, lower, upper = drift_bounds(drift, args.method, args.k)
+        outliers = [(r, d) for r, d in zip(rounds["round"], drift) if not lower <= d <= upper]
+        print(f"🔍 {_label(log)}: {len(drift)} 轮，Q1 {q1:g} ms，Q3 {q3:g} ms，"
+              f"范围 [{lower:g}, {upper:g}] ms，异常值 {len(outliers)} 轮（{len(outliers) / len(drift):.1%}）")
+        if args.list:
+            for r, d in outliers:
+                print(f"   Round {r}: {d} ms")
+
+
+def vote_counts(rounds):
+    # 与 receiver_vote_rate.py 相同：每个 basic 轮次记一次最近的投票，没有记为 Blank
+    counts = {}
+    current = None
+    for vote, nxt in zip(rounds["vote"], rounds["next"]):
+        if vote:
+            current = vote
+        if nxt == "basic":
+            key = current or "Blank"
+            counts[key] = counts.get(key, 0) + 1
+            current = None
+    return dict(sorted(counts.items(), key=lambda kv: -kv[1]))
+
+
+def cmd_votes(args):
+    for path in args.logs:
+        log = _load(path)
+        if log.kind == "sender":
+            results = log.votes["result"]
+            n = len(results)
+            parts = "，".join(f"{k} {results.count(k)}（{results.count(k) / n:.1%}）"
+                             for k in ("reharm", "basic", "failed")) if n else "没有投票"
+            print(f"🗳️  {_label(log)}: {n} 次投票，{parts}")
+        elif log.kind == "receiver":
+            counts = vote_counts(log.rounds)
+            total = sum(counts.values())
+            parts = "，".join(f"{k} {v}（{v / total:.1%}）" for k, v in counts.items())
+            print(f"🗳️  {_label(log)}: {total} 个 basic 轮次，{parts}，failed {sum(log.rounds['failed'])}")
+        else:
+            print(f"⏭️ {path}: 没有投票记录，跳过")
+            continue
+        if args.theory:
+            from vote_theory import FIRMWARE_POLICIES, check_receiver, check_sender
+
+            policy = FIRMWARE_POLICIES[args.theory if log.kind == "sender" else (log.policy or args.theory)]
+            if log.kind == "sender":
+                row = check_sender(path, policy)
+                if row["votes"]:
+                    print(f"   理论通过率 {row['theory']:.3f}（计入 failed {row['theory_with_failures']:.3f}），"
+                          f"95% 区间 [{row['band_low']:.3f}, {row['band_high']:.3f}]，p = {row['p_value']:.3f}")
+            else:
+                for row in check_receiver(path, policy):
+                    mark = "✅" if row["consistent"] else "❌"
+                    print(f"   {mark} History {row['history']}: YES {row['yes']}/{row['votes']} = {row['yes_rate']:.3f}，"
+                          f"写明概率 {row['stated_probability']:g}，95% 区间 [{row['low']:.3f}, {row['high']:.3f}]")
+
+
+COMPARE_ROWS = {
+    "sender": [("投票次数", "votes", "{:.0f}"), ("最终 pass rate", "pass_rate", "{:.3f}"),
+               ("failed", "failed", "{:.0f}"), ("Chord Sync 平均 (ms)", "sync_mean", "{:.2f}"),
+               ("Chord Sync 中位数 (ms)", "sync_median", "{:.1f}"), ("Chord Sync 90% (ms)", "sync_p90", "{:.1f}"),
+               ("Chord Sync 最大 (ms)", "sync_max", "{:.0f}")],
+    "receiver": [("轮数", "rounds", "{:.0f}"), ("Drift 平均 (ms)", "drift_mean", "{:.2f}"),
+                 ("Drift 中位数 (ms)", "drift_median", "{:.1f}"), ("Drift Q1 (ms)", "q1", "{:.1f}"),
+                 ("Drift Q3 (ms)", "q3", "{:.1f}"), ("异常值", "outliers", "{:.0f}"),
+                 ("YES", "yes", "{:.0f}"), ("NO", "no", "{:.0f}"), ("failed", "failed", "{:.0f}")],
+}
+
+
+def cmd_compare(args):
+    a, b = _load(args.a), _load(args.b)
+    if a.kind != b.kind or a.kind is None:
+        sys.exit(f"❌ 只能比较同一种日志：{args.a} 是 {a.kind}，{args.b} 是 {b.kind}")
+    sa, sb = log_stats(a), log_stats(b)
+    names = [os.path.basename(args.a), os.path.basename(args.b)]
+    width = max(len(title) for title, _, _ in COMPARE_ROWS[a.kind]) + 2
+    col = max(12, *(len(name) + 2 for name in names))
+    print(f"{'':<{width}}{names[0]:>{col}}{names[1]:>{col}}{'差值':>12}")
+    for title, key, fmt in COMPARE_ROWS[a.kind]:
+        diff = sb[key] - sa[key]
+        print(f"{title:<{width}}{fmt.format(sa[key]):>{col}}{fmt.format(sb[key]):>{col}}{'%+g' % round(diff, 3):>12}")
+
+
+def cmd_plot(args):
+    # 图的样式与 report.py 相同（Agg 后端，不弹窗）
+    import report
+
+    logs = [_load(path) for path in args.logs]
+    out = args.out or os.path.join("result", f"{args.kind}.png")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    if args.kind in ("drift", "drift-clean"):
+        rounds = logs[0].rounds
+        drift = rounds["drift_ms"]
+        bounds = drift_bounds(drift)
+        if args.kind == "drift":
+            x, y, title = rounds["round"], drift, "Chord Synchronisation Drift with IQR Bounds"
+        else:
+            keep = [i for i, d in enumerate(drift) if bounds[2] <= d <= bounds[3]]
+            x, y = [rounds["round"][i] for i in keep], [drift[i] for i in keep]
+            title = "Chord Sync Drift Without Outliers (With IQR Bounds)"
+        report.plot_drift_iqr(out, x=x, drift=y, bounds=bounds, title=title)
+    elif args.kind == "votes":
+        counts = vote_counts(logs[0].rounds)
+        report.plot_pie(out, labels=list(counts), sizes=list(counts.values()),
+                        title="Vote Result Distribution", figsize=(6, 6))
+    elif args.kind == "passrate":
+        series = [(os.path.basename(log.path), list(range(1, len(log.votes) + 1)), log.votes["pass_rate"])
+                  for log in logs]
+        report.plot_lines(out, series=series, title="Pass Rate Comparison", xlabel="Round", ylabel="Pass Rate",
+                          markers=True)
+    else:
+        series = []
+        for log in logs:
+            sync = [ms for ms in log.sync["sync_ms"] if ms is not None]
+            series.append((os.path.basename(log.path), list(range(1, len(sync) + 1)), sync))
+        report.plot_lines(out, series=series, title="Chord Sync Time Comparison", xlabel="Round",
+                          ylabel="Chord Sync Time (ms)")
+    print(f"图片保存完成：{out}")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["report"]:
+        # 参数原样交给 report.py（--default-sender / --batch / --out / --profile ...）
+        import report
+        return report.main(argv[1:])
+
+    parser = argparse.ArgumentParser(description="Sender / Receiver 日志分析的统一入口")
+    add_profile_options(parser)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("parse", help="解析日志，打印每个表的记录数，可导出 CSV")
+    p.add_argument("logs", nargs="+")
+    p.add_argument("--csv", metavar="DIR", help="每个日志的每个表写一个 CSV")
+    p.set_defaults(func=cmd_parse)
+
+    p = sub.add_parser("stats", help="pass rate、Chord Sync time、Drift 的文字汇总")
+    p.add_argument("logs", nargs="+")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("outliers", help="接收器 Drift 的 IQR 异常值")
+    p.add_argument("logs", nargs="+")
+    p.add_argument("--method", choices=("exact", "p2"), default="exact", help="分位数估计（见 streaming_iqr.py）")
+    p.add_argument("--k", type=float, default=1.5, help="上下界 = Q1 - k×IQR / Q3 + k×IQR")
+    p.add_argument("--list", action="store_true", help="逐轮列出异常值")
+    p.set_defaults(func=cmd_outliers)
+
+    p = sub.add_parser("votes", help="投票结果分布，可与理论通过率对比")
+    p.add_argument("logs", nargs="+")
+    p.add_argument("--theory", choices=("default", "markov"),
+                   help="按这种固件策略检验（Sender 日志看不出策略；接收器日志优先用日志里的）")
+    p.set_defaults(func=cmd_votes)
+
+    p = sub.add_parser("compare", help="并排比较两个同类日志")
+    p.add_argument("a")
+    p.add_argument("b")
+    p.set_defaults(func=cmd_compare)
+
+    p = sub.add_parser("plot", help="画单张图（导入 matplotlib）")
+    p.add_argument("kind", choices=("drift", "drift-clean", "votes", "passrate", "sync"))
+    p.add_argument("logs", nargs="+", help="drift / votes 用第一个接收器日志，passrate / sync 可以传多个 Sender 日志")
+    p.add_argument("--out", help="输出 PNG，默认 result/<kind>.png")
+    p.set_defaults(func=cmd_plot)
+
+    sub.add_parser("report", help="生成全部图表和 report.md（参数与 report.py 相同）")
+
+    args = parser.parse_args(argv)
+    enable_from_args(args)
+    with stage(args.command):
+        args.func(args)
+
+
+if __name__ == "__main__":
+    main()
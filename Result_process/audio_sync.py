@@ -0,0 +1,413 @@
+import argparse
+import os
+import struct
+import sys
+import warnings
+
+import numpy as np
+
+from timeline import CHORD_DURATION, align_rounds, receiver_onsets, sender_onsets, sender_schedule
+
+# 用录音测真正出声的同步：日志里的 Drift 是接收器把和弦交给 M5 的时刻（I2C），SD 卡寻址、WAV 解析、
+# 喇叭缓冲都看不到。这里读整场演出的录音（一个多声道 WAV，或每件乐器一个 WAV），逐轨检测起奏，
+# 按日志对到轮次，给出每一轮各乐器实际出声的时间差。
+#
+#   python audio_sync.py --track drums=rec/drums.wav --track piano=rec/piano.wav --track sax=rec/sax.wav \
+#                        --receiver piano=database/Receiver1.txt
+#   python audio_sync.py --multi rec/session.wav --channels drums,piano,guitar,bass,sax --plot
+#   python audio_sync.py --check         # 用已知起奏时间的合成录音核对起奏检测
+#
+# WAV 用 numpy.memmap 映射、按块读，一小时的录音也不会整个读进内存：每块只算每 --hop-ms 一格的能量，
+# 之后所有计算都在这条包络上（一小时、2 ms 一格约 180 万个点）。
+# 起奏 = 对数能量在 --rise-ms 内上升超过 --threshold dB，且电平比这一轨的底噪高 --min-level dB。
+# 对轮次：Sender 日志给出每一轮在鼓手时钟上的起奏时间（见 timeline.py），第 0 轮（start 之后第一组）
+# 在录音里的位置默认取第一个"一半以上乐器同时起奏"的时刻（--start-ms 手动指定）；之后每一轨按自己上一轮的
+# 起奏时间往后推一轮，在 ±--search-ms 内取最近的起奏，所以接收器越走越慢也跟得上。
+# 输出与 receiver_drift 表同样的列（round, drift_ms, vote, chord_pair, sent_time），再加 track、
+# onset_ms（录音时间）、lag_ms（相对 Sender 节拍的滞后）和 log_drift_ms（同一轮日志里的 Drift）。
+# drift_ms 与固件的定义相同：这一轮比上一轮多晚了多少（相邻两次起奏的间隔 - 节拍）。
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+# ---------------- 按块读 WAV ----------------
+
+class WavFile:
+    # 只解析 RIFF 头，数据部分用 memmap；支持 16 / 24 / 32 位整数和 32 位浮点
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+            if riff not in (b"RIFF", b"RF64") or wave_id != b"WAVE":
+                raise ValueError(f"{path}: 不是 WAV 文件")
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError(f"{path}: 没有 data 块")
+                chunk_id, size = struct.unpack("<4sI", header)
+                if chunk_id == b"fmt ":
+                    fmt = f.read(size)
+                    f.seek(size & 1, 1)
+                elif chunk_id == b"data":
+                    self.offset = f.tell()
+                    data_size = size
+                    break
+                else:
+                    f.seek(size + (size & 1), 1)
+        if fmt is None:
+            raise ValueError(f"{path}: 没有 fmt 块")
+        tag, self.channels, self.rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+        if tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            tag = struct.unpack("<H", fmt[24:26])[0]
+        self.bits = bits
+        self.float = tag == WAVE_FORMAT_FLOAT
+        if (tag, bits) not in ((WAVE_FORMAT_PCM, 16), (WAVE_FORMAT_PCM, 24), (WAVE_FORMAT_PCM, 32),
+                               (WAVE_FORMAT_FLOAT, 32)):
+            raise ValueError(f"{path}: 不支持的格式（tag {tag}，{bits} 位）")
+        file_size = os.path.getsize(path)
+        # 录音中断或 RF64 时 data 块的长度不可信，以文件实际大小为准
+        if data_size in (0, 0xFFFFFFFF) or self.offset + data_size > file_size:
+            data_size = file_size - self.offset
+        self.frames = data_size // block_align
+        width = bits // 8
+        if width == 3:
+            self._map = np.memmap(path, np.uint8, "r", self.offset, (self.frames, self.channels, 3))
+        else:
+            dtype = "<f4" if self.float else f"<i{width}"
+            self._map = np.memmap(path, dtype, "r", self.offset, (self.frames, self.channels))
+
+    @property
+    def seconds(self):
+        return self.frames / self.rate
+
+    def read(self, start, stop):
+        # [start, stop) 帧 -> float32 (帧数, 声道数)，范围 [-1, 1)
+        block = np.asarray(self._map[start:stop])
+        if self.bits == 24:
+            b = block.astype(np.int32)
+            value = b[..., 0] | (b[..., 1] << 8) | (b[..., 2] << 16)
+            return (np.where(value >= 1 << 23, value - (1 << 24), value) / float(1 << 23)).astype(np.float32)
+        if self.float:
+            return block.astype(np.float32)
+        return (block / float(1 << (self.bits - 1))).astype(np.float32)
+
+    def blocks(self, frames_per_block):
+        for start in range(0, self.frames, frames_per_block):
+            yield self.read(start, min(start + frames_per_block, self.frames))
+
+
+def energy_envelope(wav, hop, columns, chunk_frames):
+    # 每 hop 帧一格的平均能量，(格数, 轨数)。columns: 每一轨用哪些声道（多个声道取平均）
+    # chunk_frames 取 hop 的整数倍，块与块之间不用拼接
+    chunk_frames = max(hop, chunk_frames // hop * hop)
+    parts = []
+    for block in wav.blocks(chunk_frames):
+        n = len(block) // hop * hop
+        if n == 0:
+            continue
+        tracks = np.stack([block[:n, cols].mean(axis=1) for cols in columns], axis=1)
+        parts.append((tracks.reshape(n // hop, hop, len(columns)) ** 2).mean(axis=1))
+    if not parts:
+        return np.zeros((0, len(columns)))
+    return np.concatenate(parts)
+
+
+# ---------------- 起奏检测 ----------------
+
+def detect_onsets(energy, hop_ms, rise_ms=20.0, threshold_db=9.0, min_level_db=15.0, min_gap_ms=250.0):
+    # 一条能量包络 -> (起奏时间 ms, 强度 dB)
+    db = 10 * np.log10(energy + 1e-12)
+    lag = max(1, int(round(rise_ms / hop_ms)))
+    floor = np.percentile(db, 20)
+    rise = np.zeros_like(db)
+    rise[lag:] = db[lag:] - db[:-lag]
+    hit = np.flatnonzero((rise >= threshold_db) & (db >= floor + min_level_db))
+    if len(hit) == 0:
+        return np.zeros(0), np.zeros(0)
+    gap = max(1, int(round(min_gap_ms / hop_ms)))
+    first = hit[np.r_[True, np.diff(hit) > gap]]
+    # 精确到上升开始的那一格：起点电平取上升窗口之前 lag 格的中位数（单独一格的噪声可能偏低很多，
+    # 会让判定提前最多 rise_ms），起奏是窗口里最后一次从这个电平 + 一半阈值以下升上去的位置
+    offsets = np.arange(lag + 1)
+    window = np.clip(first[:, None] - lag + offsets[None, :], 0, len(db) - 1)
+    before = np.clip(first[:, None] - 2 * lag + offsets[None, :-1], 0, len(db) - 1)
+    base = np.median(db[before], axis=1)
+    below = db[window] < base[:, None] + threshold_db / 2
+    last_below = lag - below[:, ::-1].argmax(axis=1)
+    step = np.where(below.any(axis=1), np.minimum(last_below + 1, lag), 0)
+    start = window[np.arange(len(first)), step]
+    strength = np.array([rise[i:i + gap].max() for i in first])
+    return start * hop_ms, strength
+
+
+def synthetic_track(onsets_ms, rate=8000, seconds=12.0, seed=0, noise=0.01, decay_s=0.6):
+    # 已知起奏时间的合成录音：白噪声底噪 + 5 ms 起音、指数衰减的 220 Hz 音，上一个音还在响时下一个音进来
+    rng = np.random.default_rng(seed)
+    n = int(rate * seconds)
+    audio = rng.normal(0.0, noise, n)
+    for onset in onsets_ms:
+        s = int(round(onset * rate / 1000))
+        t = np.arange(n - s) / rate
+        audio[s:] += 0.5 * np.minimum(t / 0.005, 1.0) * np.exp(-t / decay_s) * np.sin(2 * np.pi * 220 * t)
+    return audio
+
+
+def check_detection(hop_ms=2.0, rate=8000, seeds=20, offset_ms=37.0):
+    # 用合成录音核对起奏检测：第二轨比第一轨晚已知的 offset_ms，检测到的起奏与真实时间最多差一格，
+    # 两轨之差与 offset_ms 最多差一格。返回问题列表，空列表表示通过
+    truth = np.array([1040.0, 3040.0, 5041.0, 7013.0, 9500.0])
+    hop = int(round(rate * hop_ms / 1000))
+    problems = []
+    for seed in range(seeds):
+        found = []
+        for k, onsets in enumerate((truth, truth + offset_ms)):
+            audio = synthetic_track(onsets, rate, seed=seed * 2 + k)
+            n = len(audio) // hop * hop
+            energy = (audio[:n].reshape(-1, hop) ** 2).mean(axis=1)
+            times, _ = detect_onsets(energy, hop * 1000.0 / rate)
+            if len(times) != len(onsets):
+                problems.append(f"种子 {seed} 第 {k + 1} 轨: 检测到 {len(times)} 次起奏，应为 {len(onsets)} 次")
+                break
+            error = np.abs(times - onsets).max()
+            if error > hop_ms:
+                problems.append(f"种子 {seed} 第 {k + 1} 轨: 起奏时间最多偏了 {error:.0f} ms（一格 {hop_ms:g} ms）")
+            found.append(times)
+        if len(found) == 2:
+            error = np.abs(found[1] - found[0] - offset_ms).max()
+            if error > hop_ms:
+                problems.append(f"种子 {seed}: 两轨时间差与已知的 {offset_ms:g} ms 最多差 {error:.0f} ms")
+    return problems
+
+
+# ---------------- 对轮次 ----------------
+
+def ensemble_start(onsets, window_ms=500.0, quorum=None):
+    # 第一个"一半以上的轨在 window_ms 内都有起奏"的时刻
+    quorum = quorum or (len(onsets) + 1) // 2
+    merged = sorted((t, i) for i, times in enumerate(onsets) for t in times)
+    for k, (t, _) in enumerate(merged):
+        tracks = {i for u, i in merged[k:] if u - t <= window_ms}
+        if len(tracks) >= quorum:
+            return t
+    raise ValueError("找不到多个乐器同时起奏的时刻，用 --start-ms 指定第 0 轮在录音里的位置")
+
+
+def match_rounds(onsets, strength, start_ms, beats, search_ms=500.0, first_search_ms=1000.0, weaker_db=6.0):
+    # 一轨的起奏 -> 每一轮的起奏时间（NaN 表示没找到）。beats: 每一轮相对第 0 轮的 Sender 节拍时间。
+    # 窗口里比最强的起奏弱 weaker_db 以上的（咳嗽、碰到麦克风）不算，剩下的取离预测最近的
+    matched = np.full(len(beats), np.nan)
+    last_k, last_t = None, start_ms
+    for k, beat in enumerate(beats):
+        predict = last_t + beat - (beats[last_k] if last_k is not None else 0.0)
+        search = search_ms if last_k is not None else first_search_ms
+        lo, hi = np.searchsorted(onsets, [predict - search, predict + search])
+        if hi > lo:
+            times = onsets[lo:hi]
+            strong = strength[lo:hi] >= strength[lo:hi].max() - weaker_db
+            t = times[strong][np.argmin(np.abs(times[strong] - predict))]
+            matched[k] = t
+            last_k, last_t = k, t
+    return matched
+
+
+def round_grid(sender_path, rounds, chord_duration):
+    # 每一轮相对第 0 轮的节拍时间，以及每一轮 Sender 发的第一个和弦
+    if sender_path:
+        onsets = sender_onsets(sender_path)
+        schedule, _ = sender_schedule(onsets, rounds)
+        content = {k: (chord, is_reharm) for k, chord, is_reharm, _ in onsets}
+        return schedule - schedule[0], content
+    return np.arange(rounds) * float(chord_duration), {}
+
+
+def receiver_columns(path, content, n, chord_duration):
+    # 接收器日志按和弦内容对到 Sender 的轮次（同 timeline.py），取出与 drift 表相同的几列
+    from log_parser import load_log
+
+    table = load_log(path).rounds
+    play, drift, chords, reharm = receiver_onsets(path)
+    if content:
+        m = max(max(content) + 1, len(play)) + 64
+        slots = align_rounds([content.get(j, (None, None)) for j in range(m)], play, chords, reharm, chord_duration)
+    else:
+        slots = np.arange(len(play))
+    columns = {name: [None] * n for name in ("vote", "chord_pair", "sent_time", "log_drift_ms")}
+    for i, slot in enumerate(slots):
+        # 重复演奏的轮次（见 timeline.repeated_plays）只保留第一次
+        if slot < n and (i == 0 or slot != slots[i - 1]):
+            columns["vote"][slot] = table["vote"][i]
+            columns["chord_pair"][slot] = table["chord_pair"][i]
+            columns["sent_time"][slot] = table["sent_time"][i]
+            columns["log_drift_ms"][slot] = table["drift_ms"][i]
+    return columns
+
+
+def parse_pairs(items, what):
+    pairs = {}
+    for item in items:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"{what} 参数格式应为 NAME=PATH: {item}")
+        pairs[name] = value
+    return pairs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从演出录音检测各乐器的起奏，按轮次给出实际出声的时间差")
+    parser.add_argument("--track", action="append", default=[], metavar="NAME=WAV", help="每件乐器一个 WAV")
+    parser.add_argument("--multi", metavar="WAV", help="多声道录音，每个声道一件乐器")
+    parser.add_argument("--channels", help="多声道录音各声道的乐器名，逗号分隔")
+    parser.add_argument("--sender", default="database/Sender.txt", help="Sender 日志，用来排轮次（'' 则按固定节拍）")
+    parser.add_argument("--receiver", action="append", default=[], metavar="NAME=LOG",
+                        help="某一轨对应的接收器日志，用来填 vote / chord_pair / sent_time 和日志里的 Drift")
+    parser.add_argument("--start-ms", type=float, help="第 0 轮在录音里的时间，默认自动检测")
+    parser.add_argument("--chord-duration", type=int, default=CHORD_DURATION)
+    parser.add_argument("--hop-ms", type=float, default=2.0, help="能量包络的时间分辨率")
+    parser.add_argument("--chunk-seconds", type=float, default=30.0, help="每次从磁盘读多少秒")
+    parser.add_argument("--rise-ms", type=float, default=20.0)
+    parser.add_argument("--threshold", type=float, default=9.0, help="起奏判定：--rise-ms 内上升多少 dB")
+    parser.add_argument("--min-level", type=float, default=15.0, help="起奏判定：比底噪高多少 dB")
+    parser.add_argument("--min-gap-ms", type=float, default=250.0, help="同一轨两次起奏的最小间隔")
+    parser.add_argument("--search-ms", type=float, default=500.0, help="在预测时间前后多远找这一轮的起奏")
+    parser.add_argument("--out", default="result/audio_drift.csv")
+    parser.add_argument("--plot", action="store_true", help="同时保存每轮实际出声时间差的折线图")
+    parser.add_argument("--check", action="store_true", help="只用已知起奏时间的合成录音核对起奏检测，不读录音")
+    args = parser.parse_args(argv)
+
+    if args.check:
+        problems = check_detection(args.hop_ms)
+        for problem in problems:
+            print(f"   ❌ {problem}")
+        if problems:
+            sys.exit(1)
+        print("✅ 合成录音的起奏检测误差不超过一格，两轨的已知时间差测得准确")
+        return
+
+    try:
+        tracks = parse_pairs(args.track, "--track")
+        receivers = parse_pairs(args.receiver, "--receiver")
+    except ValueError as e:
+        parser.error(str(e))
+    if bool(tracks) == bool(args.multi):
+        parser.error("用 --track NAME=WAV（可重复）或 --multi WAV --channels ...，二选一")
+
+    # (名字, WavFile, 声道列表)，同一个文件的轨一起读
+    sources = []
+    if args.multi:
+        wav = WavFile(args.multi)
+        names = args.channels.split(",") if args.channels else [f"ch{i + 1}" for i in range(wav.channels)]
+        if len(names) != wav.channels:
+            parser.error(f"{args.multi} 有 {wav.channels} 个声道，--channels 给了 {len(names)} 个名字")
+        sources.append((names, wav, [[i] for i in range(wav.channels)]))
+    else:
+        for name, path in tracks.items():
+            wav = WavFile(path)
+            sources.append(([name], wav, [list(range(wav.channels))]))
+    unknown = set(receivers) - {n for names, _, _ in sources for n in names}
+    if unknown:
+        parser.error(f"--receiver 里的 {', '.join(sorted(unknown))} 不是录音里的轨")
+
+    names, onsets, strengths = [], [], []
+    seconds = 0.0
+    for track_names, wav, columns in sources:
+        hop = max(1, int(round(wav.rate * args.hop_ms / 1000)))
+        hop_ms = hop * 1000.0 / wav.rate
+        energy = energy_envelope(wav, hop, columns, int(wav.rate * args.chunk_seconds))
+        seconds = max(seconds, wav.seconds)
+        for i, name in enumerate(track_names):
+            times, strength = detect_onsets(energy[:, i], hop_ms, args.rise_ms, args.threshold, args.min_level,
+                                     args.min_gap_ms)
+            names.append(name)
+            onsets.append(times)
+            strengths.append(strength)
+            print(f"🎧 {name}: {wav.path}，{wav.seconds / 60:.1f} 分钟，{len(times)} 次起奏")
+
+    try:
+        start = args.start_ms if args.start_ms is not None else ensemble_start(onsets)
+        n = int((seconds * 1000 - start) // args.chord_duration) + 1
+        beats, content = round_grid(args.sender, n, args.chord_duration)
+    except ValueError as e:
+        parser.error(str(e))
+    beats = beats[:n]
+    print(f"⏱️  第 0 轮在录音的 {start / 1000:.3f} s，录音里最多 {n} 轮")
+
+    import pandas as pd
+
+    matched = {name: match_rounds(times, strength, start, beats, args.search_ms)
+               for name, times, strength in zip(names, onsets, strengths)}
+    frames = []
+    for name in names:
+        t = matched[name]
+        extra = (receiver_columns(receivers[name], content, n, args.chord_duration) if name in receivers else
+                 {"vote": [None] * n, "chord_pair": [None] * n, "sent_time": [None] * n, "log_drift_ms": [None] * n})
+        if name not in receivers and content:
+            extra["chord_pair"] = [content.get(k, (None, None))[0] for k in range(n)]
+        drift = np.r_[np.nan, np.diff(t) - np.diff(beats)]
+        frames.append(pd.DataFrame({
+            "round": np.arange(n),
+            "drift_ms": drift,
+            "vote": extra["vote"],
+            "chord_pair": extra["chord_pair"],
+            "sent_time": extra["sent_time"],
+            "track": name,
+            "onset_ms": t,
+            "lag_ms": t - start - beats,
+            "log_drift_ms": extra["log_drift_ms"],
+        }))
+    df = pd.concat(frames, ignore_index=True)
+
+    matrix = np.vstack([matched[name] for name in names])
+    present = (~np.isnan(matrix)).sum(axis=0)
+    with warnings.catch_warnings():
+        # 某一轮全是 NaN 时 nanmax 会警告，这些位置反正会被 where 换成 NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        spread = np.where(present >= 2, np.nanmax(matrix, axis=0) - np.nanmin(matrix, axis=0), np.nan)
+    spread_df = pd.DataFrame({"round": np.arange(n), "beat_ms": beats,
+                              **{f"{name}_ms": matched[name] for name in names},
+                              "tracks": present, "spread_ms": spread})
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    df.to_csv(args.out, index=False)
+    spread_path = os.path.splitext(args.out)[0] + "_spread.csv"
+    spread_df.to_csv(spread_path, index=False)
+
+    for name in names:
+        d = df[df["track"] == name]
+        found = d["onset_ms"].notna().sum()
+        drift = d["drift_ms"].dropna()
+        text = f"，drift 中位数 {drift.median():+.0f} ms，|drift| 90% 分位 {drift.abs().quantile(0.9):.0f} ms" \
+            if len(drift) else ""
+        log = d[["drift_ms", "log_drift_ms"]].dropna().astype(float)
+        if len(log):
+            text += f"，与日志 Drift 之差中位数 {(log['drift_ms'] - log['log_drift_ms']).median():+.0f} ms"
+        print(f"🎵 {name}: 找到 {found}/{n} 轮{text}")
+    valid = spread_df["spread_ms"].dropna()
+    if len(valid):
+        print(f"📏 实际出声时间差: 中位数 {valid.median():.0f} ms，90% 分位 {valid.quantile(0.9):.0f} ms，"
+              f"最大 {valid.max():.0f} ms（{len(valid)} 轮）")
+    print(f"✅ 每轨每轮的起奏已保存到 {args.out}，每轮时间差保存到 {spread_path}")
+
+    if args.plot:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=(10, 5))
+        ax.plot(spread_df["round"], spread_df["spread_ms"], marker="o", markersize=3, label="acoustic spread")
+        ax.set_xlabel("Round")
+        ax.set_ylabel("Onset spread (ms)")
+        ax.set_title("Acoustic onset spread per round")
+        ax.legend()
+        ax.grid(True)
+        fig.tight_layout()
+        png = os.path.splitext(args.out)[0] + "_spread.png"
+        fig.savefig(png, dpi=300)
+        print(f"图片保存完成：{png}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import argparse
+import os
+import statistics
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import chordgen  # noqa: F401
+from log_parser import parse_log
+from profiling import add_profile_options, enable_from_args, stage
+from streaming_iqr import DriftOutlierDetector
+
+# 多次实验的批量分析：目录第一层是实验条件，下面任意层级的 .txt 都是一次运行的日志
+#
+#   runs/
+#     Default/2025-06-01/Sender.txt
+#     Default/2025-06-01/Receiver1.txt
+#     Markov/session3/Sender.txt
+#     ...
+#
+#   python batch_analysis.py runs            # 结果写到 result/batch_runs.csv 和 result/batch_summary.csv
+#
+# 日志类型（Sender / Receiver）按内容判断，不依赖文件名；各个文件在进程池里并行解析。
+# 接收器的二进制遥测日志（.bin，见 telemetry.py）和文本日志一样处理。
+# 轮数按日志实际内容统计，不再补齐到固定的 101 轮。
+
+
+def find_logs(root):
+    # [(条件, 运行, 路径)]；运行 = 日志所在目录相对条件目录的路径（直接放在条件目录下时为文件名）
+    logs = []
+    for condition in sorted(os.listdir(root)):
+        condition_dir = os.path.join(root, condition)
+        if not os.path.isdir(condition_dir):
+            continue
+        for dirpath, dirnames, filenames in os.walk(condition_dir):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if not name.lower().endswith((".txt", ".bin")):
+                    continue
+                rel = os.path.relpath(dirpath, condition_dir)
+                run = os.path.splitext(name)[0] if rel == "." else rel
+                logs.append((condition, run, os.path.join(dirpath, name)))
+    return logs
+
+
+def _mean(values):
+    return statistics.fmean(values) if values else None
+
+
+def _std(values):
+    return statistics.stdev(values) if len(values) > 1 else None
+
+
+def summarize_log(path):
+    # 在子进程里运行：解析一个日志，只返回汇总数值（避免把整张表传回主进程）
+    log = parse_log(path)
+    row = {"path": path, "kind": log.kind}
+    if log.kind == "sender":
+        votes = log.votes
+        sync = [ms for ms in log.sync["sync_ms"] if ms is not None]
+        results = votes["result"]
+        row.update({
+            "votes": len(votes),
+            "pass_rate": votes["pass_rate"][-1] if len(votes) else None,
+            "reharm": results.count("reharm"),
+            "basic": results.count("basic"),
+            "failed_votes": results.count("failed"),
+            "sync_rounds": len(sync),
+            "sync_mean_ms": _mean(sync),
+            "sync_std_ms": _std(sync),
+            "system_sync_ms": log.system_sync["sync_ms"][0] if len(log.system_sync) else None,
+        })
+    elif log.kind == "receiver":
+        drifts = log.rounds["drift_ms"]
+        detector = DriftOutlierDetector()
+        for drift in drifts:
+            detector.add(drift)
+        q1, q3, lower, upper = detector.bounds()
+        inliers = [d for d in drifts if lower <= d <= upper]
+        votes = [v for v in log.rounds["vote"] if v]
+        row.update({
+            "policy": log.policy,
+            "rounds": len(drifts),
+            "drift_median_ms": statistics.median(drifts) if drifts else None,
+            "drift_q1_ms": q1,
+            "drift_q3_ms": q3,
+            "drift_outliers": len(drifts) - len(inliers),
+            "drift_mean_ms": _mean(drifts),
+            "drift_mean_inlier_ms": _mean(inliers),
+            "drift_std_inlier_ms": _std(inliers),
+            "yes_votes": sum(v.startswith("VOTE_YES") for v in votes),
+            "no_votes": sum(v.startswith("VOTE_NO") for v in votes),
+            "failed_rounds": sum(log.rounds["failed"]),
+        })
+    return row
+
+
+def analyze(root, workers=None):
+    logs = find_logs(root)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(summarize_log, [path for _, _, path in logs], chunksize=4))
+    for (condition, run, _), row in zip(logs, rows):
+        row["condition"] = condition
+        row["run"] = run
+    runs = pd.DataFrame(rows)
+    front = ["condition", "run", "kind"]
+    return runs[front + [c for c in runs.columns if c not in front]] if len(runs) else runs
+
+
+def summarize_conditions(runs):
+    # 每个条件一行：Sender 的 pass rate / sync time，Receiver 的 drift（跨运行汇总）
+    summary = []
+    for condition, group in runs.groupby("condition", sort=True):
+        senders = group[group["kind"] == "sender"]
+        receivers = group[group["kind"] == "receiver"]
+        row = {"condition": condition,
+               "sender_runs": len(senders),
+               "receiver_logs": len(receivers)}
+        if len(senders):
+            votes = senders["votes"].sum()
+            sync_rounds = senders["sync_rounds"].sum()
+            row.update({
+                "votes": votes,
+                "pass_rate_mean": senders["pass_rate"].mean(),
+                "pass_rate_std": senders["pass_rate"].std(),
+                # 整体通过率：所有运行的 reharm 次数 / 投票次数
+                "pass_rate_pooled": senders["reharm"].sum() / votes if votes else None,
+                "failed_vote_rate": senders["failed_votes"].sum() / votes if votes else None,
+                "sync_mean_ms": (senders["sync_mean_ms"] * senders["sync_rounds"]).sum() / sync_rounds
+                                if sync_rounds else None,
+                "sync_run_std_ms": senders["sync_mean_ms"].std(),
+            })
+        if len(receivers):
+            rounds = receivers["rounds"].sum()
+            votes = receivers["yes_votes"].sum() + receivers["no_votes"].sum()
+            row.update({
+                "drift_rounds": rounds,
+                "drift_median_ms": receivers["drift_median_ms"].median(),
+                "drift_mean_inlier_ms": receivers["drift_mean_inlier_ms"].mean(),
+                "drift_outlier_rate": receivers["drift_outliers"].sum() / rounds if rounds else None,
+                "yes_vote_rate": receivers["yes_votes"].sum() / votes if votes else None,
+                "failed_round_rate": receivers["failed_rounds"].sum() / rounds if rounds else None,
+            })
+        summary.append(row)
+    return pd.DataFrame(summary)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按实验条件批量分析多次运行的 Sender / Receiver 日志")
+    parser.add_argument("root", help="第一层子目录为实验条件（Default、Markov ...）")
+    parser.add_argument("--jobs", type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    parser.add_argument("--out", default="result", help="输出目录")
+    parser.add_argument("--excel", action="store_true", help="同时导出 batch_analysis.xlsx")
+    add_profile_options(parser)
+    args = parser.parse_args(argv)
+    enable_from_args(args)
+
+    with stage("parse logs", root=args.root) as s:
+        runs = analyze(args.root, args.jobs)
+        s.items = len(runs)
+    if not len(runs):
+        print(f"❌ {args.root} 下没有找到日志")
+        sys.exit(1)
+    unknown = runs[runs["kind"].isna()]
+    for path in unknown["path"]:
+        print(f"⚠️  无法识别的日志，已跳过: {path}")
+    runs = runs[runs["kind"].notna()]
+    with stage("summarize") as s:
+        summary = summarize_conditions(runs)
+        s.items = len(runs)
+
+    os.makedirs(args.out, exist_ok=True)
+    with stage("csv export"):
+        runs.to_csv(os.path.join(args.out, "batch_runs.csv"), index=False)
+        summary.to_csv(os.path.join(args.out, "batch_summary.csv"), index=False)
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(summary)
+    print(f"✅ {len(runs)} 个日志，{summary.shape[0]} 个条件，结果保存到 {args.out}/batch_runs.csv、batch_summary.csv")
+    if args.excel:
+        path = os.path.join(args.out, "batch_analysis.xlsx")
+        with stage("excel export", path=path) as s, pd.ExcelWriter(path) as writer:
+            summary.to_excel(writer, sheet_name="summary", index=False)
+            runs.to_excel(writer, sheet_name="runs", index=False)
+            s.items = len(runs) + len(summary)
+        print(f"📄 已导出 {path}")
+
+
+if __name__ == "__main__":
+    main()
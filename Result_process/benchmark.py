@@ -0,0 +1,404 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+from simulate import DEGREE_SEQUENCE, chord_from_degree, reharm_progression, tritone
+
+# 分析流程的基准测试：先生成大规模的合成日志（10^3 - 10^7 轮），再分别计时
+# 解析、异常值检测、汇总、导出、绘图，把耗时和峰值内存写进 JSON，改动前后对比就能发现性能退化。
+#
+#   python benchmark.py                                   # 10^3、10^4、10^5 轮，default + Markov
+#   python benchmark.py --rounds 1000000 10000000 --stages parse outliers
+#   python benchmark.py --compare result/benchmark_old.json   # 比基线慢超过 --tolerance 时退出码为 1
+#   python benchmark.py --generate-only --rounds 100000   # 只生成日志（result/bench_logs/<policy>_<轮数>/）
+#
+# 合成日志的格式与串口抓下来的一样（CRLF，Sender.txt + Receiver2.txt），覆盖：
+#   reharm 轮、投票失败（Sender 的 "vote failed, send basic chord"、Receiver 的 "vote failed"）、
+#   Markov 投票行（History / YES probability）、负的 drift（固件按 unsigned long 打印成接近 2^32 的数）、
+#   大的 drift 离群值、多余的空行。
+# 不模拟协议时序（那是 simulate.py 的事，它每秒只能跑几千轮），这里只要数量和形状像真的就行。
+#
+# 每个 (阶段, 规模, 投票方式) 在一个新的子进程里跑：准备工作（比如绘图前先解析）不计时，
+# 先不计时地跑一遍预热（第一次调用里有 pandas / matplotlib 的导入、字体缓存等一次性开销，
+# 1000 轮的 aggregate 首次 0.21 s、之后 0.007 s），再计时跑 --repeat 次取最快的一次，
+# 最后在 tracemalloc 下跑一次取 Python 分配的峰值；max_rss_mb 是整个子进程的峰值 RSS。
+
+STAGES = ["generate", "parse", "outliers", "aggregate", "export_csv", "export_excel", "plot"]
+EXCEL_MAX_ROWS = 100_000   # xlsx 最多 1,048,576 行，而且 openpyxl 很慢；超过就跳过 export_excel
+MIN_WALL_S = 0.05          # 比这更短的耗时抖动太大，--compare 时不判定退化
+REPEAT = 3                 # 计时的次数，取最快的一次
+MAX_REPEAT_S = 30.0        # 计时累计超过这么久就不再重复（大规模时一次就够了）
+
+CHUNK = 100_000
+MEMBER = 2
+FAIL_RATE = 0.06           # 投票失败（有成员的票没收到）的比例，真实日志里约 6%
+YES_DEFAULT = 0.35
+YES_MARKOV = {True: 0.35, False: 0.50}    # 上一次投票通过 / 没通过
+
+
+# ---------------- 合成日志 ----------------
+
+def _drifts(rng, n):
+    # 混合分布：绝大多数 38/39 ms（轮询格点），少量 12-17 ms，约 5% 的秒级离群值，约 2% 为负
+    kind = rng.random(n)
+    drift = np.where(rng.random(n) < 0.5, 38, 39)
+    drift = np.where(kind < 0.03, rng.integers(12, 18, n), drift)
+    drift = np.where((kind >= 0.03) & (kind < 0.08), rng.integers(3000, 24000, n), drift)
+    drift = np.where((kind >= 0.08) & (kind < 0.10), -rng.integers(1, 60, n), drift)
+    return drift
+
+
+def _pairs():
+    # current_index（0 / 2 / 4）-> (度数行, 基本和弦对, reharm 和弦对)
+    n = len(DEGREE_SEQUENCE)
+    pairs = {}
+    for index in range(0, n, 2):
+        d1, d2 = DEGREE_SEQUENCE[index], DEGREE_SEQUENCE[(index + 1) % n]
+        basic = chord_from_degree(0, d1) + "," + chord_from_degree(0, d2)
+        reharm = reharm_progression(0, DEGREE_SEQUENCE[(index + 2) % n])
+        pairs[index] = (f"{d1}, {d2}", basic, reharm)
+    return pairs
+
+
+def generate_logs(out_dir, rounds, policy="default", seed=0, blank_rate=0.02):
+    # 写 out_dir/Sender.txt 和 out_dir/Receiver2.txt，返回两个路径
+    os.makedirs(out_dir, exist_ok=True)
+    sender_path = os.path.join(out_dir, "Sender.txt")
+    receiver_path = os.path.join(out_dir, f"Receiver{MEMBER}.txt")
+    rng = np.random.default_rng(seed)
+    pairs = _pairs()
+    markov = policy == "markov"
+
+    index = 0
+    reharm = False              # 这一轮演奏的是不是 reharm 和弦对
+    prev_pass = False
+    total_pass = votes = 0
+    start = 35286
+    sent = start + 51_000       # 接收器自己的时钟
+    with open(sender_path, "w", encoding="utf-8", newline="") as fs, \
+            open(receiver_path, "w", encoding="utf-8", newline="") as fr:
+        fs.write(f"System Sync time: {int(rng.integers(150, 2000))}\r\n"
+                 ">> SENDER: Initial start broadcast complete\r\n")
+        fr.write("=== RECEIVER START ===\r\n[Receiver] Got prepare_sync. Sending ACK.\r\n"
+                 "[Receiver] Got start. Playing in 5s.\r\n")
+        for begin in range(0, rounds, CHUNK):
+            n = min(CHUNK, rounds - begin)
+            drift = _drifts(rng, n).tolist()
+            sync_ms = rng.integers(50, 56, n).tolist()
+            mine = rng.random(n).tolist()
+            others = rng.random((n, 3)).tolist()
+            failed = (rng.random(n) < FAIL_RATE).tolist()
+            missed = (rng.random(n) < 0.5).tolist()     # 失败的那次是不是本接收器没投上
+            blank_s = (rng.random(n) < blank_rate).tolist()
+            blank_r = (rng.random(n) < blank_rate).tolist()
+            s_lines = []
+            r_lines = []
+            for i in range(n):
+                k = begin + i
+                degrees, basic, harm = pairs[index]
+                # ---- Sender：发这一轮的和弦对，basic 轮接着投票 ----
+                if reharm:
+                    s_lines += [f"Sent chord pair: {harm}", f"Chord Sync time: {sync_ms[i]}",
+                                f"Start reharm at: {start + 8000 * k}"]
+                else:
+                    s_lines += [degrees, f"Sent chord pair: {basic}T", f"Chord Sync time: {sync_ms[i]}"]
+                d = drift[i]
+                r_lines.append(f"[Drift] Round {k}: Drift = {d % 2 ** 32} ms")
+                played = harm if reharm else basic
+                if reharm:
+                    voted = None
+                    reharm = False
+                else:
+                    votes += 1
+                    p = YES_MARKOV[prev_pass] if markov else YES_DEFAULT
+                    yes = mine[i] < p
+                    if failed[i]:
+                        s_lines += [f"pass rate: {total_pass / votes:.2f}", "vote failed, send basic chord"]
+                        voted = not missed[i]
+                        passed = False
+                    else:
+                        passed = yes + sum(x < p for x in others[i]) >= 2
+                        total_pass += passed
+                        s_lines += [f"vote result: {'reharm' if passed else 'basic'}",
+                                    f"pass rate: {total_pass / votes:.2f}"]
+                        voted = True
+                    # ---- Receiver：投票行或 "vote failed" ----
+                    vote = f"VOTE_{'YES' if yes else 'NO'}{MEMBER}"
+                    if not voted:
+                        r_lines += ["vote failed", played.replace(",", " & ")]
+                    elif markov:
+                        r_lines.append(f"[Receiver] Sent vote (Markov): {vote} | History: "
+                                       f"{'yn' if prev_pass else 'nn'} | YES probability: {round(p * 100)}%")
+                    else:
+                        r_lines.append(f"[Receiver] Sent vote: {vote}")
+                    prev_pass = passed
+                    reharm = passed
+                    index = (index + 2) % len(DEGREE_SEQUENCE)
+                # ---- Receiver：下一轮的和弦对，然后开始演奏 ----
+                degrees, basic, harm = pairs[index]
+                if reharm:
+                    first, second = harm.split(",")
+                    if MEMBER in (1, 4) and not markov:
+                        second = tritone(second)
+                        r_lines.append("perform tritone substitution")
+                    r_lines.append(f"[Receiver] Playing reharm next: {first} & {second}")
+                else:
+                    r_lines.append(f"[Receiver] Next basic chord pair: {basic.replace(',', ' & ')}")
+                sent += 8000 + d
+                r_lines += [f"🎵 Sent to M5 at: {sent}", ""]
+                if blank_s[i]:
+                    s_lines.append("")
+                if blank_r[i]:
+                    r_lines.append("")
+            fs.write("\r\n".join(s_lines) + "\r\n")
+            fr.write("\r\n".join(r_lines) + "\r\n")
+    return sender_path, receiver_path
+
+
+def data_dir(root, policy, rounds, seed):
+    return os.path.join(root, f"{policy}_{rounds}" + (f"_seed{seed}" if seed else ""))
+
+
+def ensure_logs(root, policy, rounds, seed=0):
+    # 已经生成过（两个文件都在）就直接用
+    out = data_dir(root, policy, rounds, seed)
+    paths = (os.path.join(out, "Sender.txt"), os.path.join(out, f"Receiver{MEMBER}.txt"))
+    if not all(os.path.exists(p) for p in paths):
+        paths = generate_logs(out, rounds, policy, seed)
+    return paths
+
+
+# ---------------- 各阶段（在子进程里准备，返回要计时的函数） ----------------
+
+def _setup_generate(sender, receiver, out_dir, rounds, policy):
+    return lambda: generate_logs(os.path.join(out_dir, "generated"), rounds, policy, seed=1)
+
+
+def _setup_parse(sender, receiver, out_dir, rounds, policy):
+    from log_parser import parse_log
+    return lambda: (parse_log(sender), parse_log(receiver))
+
+
+def _setup_outliers(sender, receiver, out_dir, rounds, policy):
+    import pandas as pd
+    from intermediate import iqr_bounds
+    from log_parser import parse_log
+    from streaming_iqr import DriftOutlierDetector
+    drifts = parse_log(receiver).rounds["drift_ms"]
+
+    def run():
+        # 在线检测（live.py / batch_analysis 用的）和整批 pandas（intermediate.py 用的）各一遍
+        detector = DriftOutlierDetector()
+        for d in drifts:
+            detector.update(d)
+        series = pd.Series(drifts)
+        _, _, lower, upper = iqr_bounds(series)
+        return detector.outliers, int(((series < lower) | (series > upper)).sum())
+    return run
+
+
+def _setup_aggregate(sender, receiver, out_dir, rounds, policy):
+    from log_parser import parse_log
+    sender_log, receiver_log = parse_log(sender), parse_log(receiver)
+
+    def run():
+        votes = sender_log.votes.to_frame()
+        sync = sender_log.sync.to_frame()
+        df = receiver_log.rounds.to_frame()
+        voted = df[df["vote"].notna()]
+        yes = voted["vote"].str.startswith("VOTE_YES")
+        return {
+            "pass_rate": votes["pass_rate"].iloc[-1],
+            "results": votes["result"].value_counts().to_dict(),
+            "sync_mean_ms": sync["sync_ms"].mean(),
+            "drift": df["drift_ms"].describe().to_dict(),
+            "yes_rate_by_history": yes.groupby(voted["history"].fillna("-")).mean().to_dict(),
+            "failed_rate": df["failed"].mean(),
+            "next": df["next"].value_counts().to_dict(),
+        }
+    return run
+
+
+def _setup_export_csv(sender, receiver, out_dir, rounds, policy):
+    from log_parser import parse_log
+    votes = parse_log(sender).votes.to_frame()
+    df = parse_log(receiver).rounds.to_frame()
+
+    def run():
+        df.to_csv(os.path.join(out_dir, "rounds.csv"), index=False)
+        votes.to_csv(os.path.join(out_dir, "votes.csv"), index=False)
+    return run
+
+
+def _setup_export_excel(sender, receiver, out_dir, rounds, policy):
+    from log_parser import parse_log
+    votes = parse_log(sender).votes.to_frame()
+    df = parse_log(receiver).rounds.to_frame()
+
+    def run():
+        import pandas as pd
+        with pd.ExcelWriter(os.path.join(out_dir, "bench.xlsx")) as writer:
+            df.to_excel(writer, sheet_name="rounds", index=False)
+            votes.to_excel(writer, sheet_name="votes", index=False)
+    return run
+
+
+def _setup_plot(sender, receiver, out_dir, rounds, policy):
+    from log_parser import parse_log
+    from report import _bounds, plot_drift_iqr, plot_lines
+    drifts = parse_log(receiver).rounds["drift_ms"]
+    votes = parse_log(sender).votes
+    bounds = _bounds(drifts)
+
+    def run():
+        plot_drift_iqr(os.path.join(out_dir, "drift.png"), range(len(drifts)), drifts, bounds,
+                       "Benchmark drift", dpi=100)
+        plot_lines(os.path.join(out_dir, "pass_rate.png"), [(policy, votes["round"], votes["pass_rate"])],
+                   "Benchmark pass rate", "Round", "Pass rate", dpi=100)
+    return run
+
+
+SETUPS = {"generate": _setup_generate, "parse": _setup_parse, "outliers": _setup_outliers,
+          "aggregate": _setup_aggregate, "export_csv": _setup_export_csv,
+          "export_excel": _setup_export_excel, "plot": _setup_plot}
+
+
+def run_stage(stage, sender, receiver, out_dir, rounds, policy, trace=True, repeat=REPEAT):
+    # 子进程入口：准备 -> 预热 -> 计时 repeat 次取最快 -> tracemalloc 下再跑一次
+    os.makedirs(out_dir, exist_ok=True)
+    func = SETUPS[stage](sender, receiver, out_dir, rounds, policy)
+    func()
+    times = []
+    while len(times) < max(repeat, 1) and sum(times) < MAX_REPEAT_S:
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    wall = min(times)
+    peak = None
+    if trace:
+        gc.collect()
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"wall_s": wall,
+            "runs": len(times),
+            "peak_traced_mb": peak / 2 ** 20 if peak is not None else None,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+def run_case(stage, rounds, policy, root, seed=0, trace=True, repeat=REPEAT):
+    sender, receiver = ensure_logs(root, policy, rounds, seed)
+    out_dir = os.path.join(data_dir(root, policy, rounds, seed), "out")
+    # spawn：子进程从干净的解释器开始，RSS 不含主进程的内存
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        result = pool.submit(run_stage, stage, sender, receiver, out_dir, rounds, policy, trace,
+                             repeat).result()
+    size = os.path.getsize(sender) + os.path.getsize(receiver)
+    result.update({"stage": stage, "policy": policy, "rounds": rounds,
+                   "rounds_per_s": rounds / result["wall_s"] if result["wall_s"] else None,
+                   "log_mb": size / 2 ** 20})
+    return result
+
+
+# ---------------- 结果 ----------------
+
+def environment():
+    import matplotlib
+    import pandas as pd
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "matplotlib": matplotlib.__version__, "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def compare(results, baseline, tolerance):
+    # 与基线逐项对比；返回退化的项
+    old = {(r["stage"], r["policy"], r["rounds"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = old.get((r["stage"], r["policy"], r["rounds"]))
+        if b is None:
+            continue
+        for key in ("wall_s", "peak_traced_mb"):
+            if r.get(key) is None or not b.get(key):
+                continue
+            if key == "wall_s" and max(r[key], b[key]) < MIN_WALL_S:
+                continue
+            ratio = r[key] / b[key]
+            flag = ratio > 1 + tolerance
+            print(f"   {r['stage']:<13}{r['policy']:<9}{r['rounds']:>10}  {key:<15}"
+                  f"{b[key]:>10.3f} -> {r[key]:<10.3f} x{ratio:.2f}{'  ⚠️' if flag else ''}")
+            if flag:
+                regressions.append((r["stage"], r["policy"], r["rounds"], key, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="分析流程的基准测试（合成日志，10^3 - 10^7 轮）")
+    parser.add_argument("--rounds", nargs="+", type=lambda s: int(float(s)), default=[1000, 10_000, 100_000],
+                        help="日志规模（轮数），可写 1e6")
+    parser.add_argument("--policy", nargs="+", choices=["default", "markov"], default=["default", "markov"])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data", default="result/bench_logs", help="合成日志的目录（生成过的会复用）")
+    parser.add_argument("--out", default="result/benchmark.json")
+    parser.add_argument("--no-trace", action="store_true", help="不测 tracemalloc 峰值（大规模时省一半时间）")
+    parser.add_argument("--repeat", type=int, default=REPEAT,
+                        help=f"预热之后计时几次取最快（累计超过 {MAX_REPEAT_S:g} 秒就停）")
+    parser.add_argument("--excel-max", type=int, default=EXCEL_MAX_ROWS, help="超过这么多轮就跳过 export_excel")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="与之前的结果对比")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="比基线慢 / 大多少算退化（0.25 = 25%%）")
+    parser.add_argument("--generate-only", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.generate_only:
+        for rounds in args.rounds:
+            for policy in args.policy:
+                start = time.perf_counter()
+                paths = generate_logs(data_dir(args.data, policy, rounds, args.seed), rounds, policy, args.seed)
+                print(f"✅ {policy} {rounds} 轮: {', '.join(paths)}（{time.perf_counter() - start:.1f} 秒）")
+        return
+
+    results = []
+    print(f"   {'阶段':<11}{'投票':<9}{'轮数':>8}{'耗时 (s)':>12}{'轮/秒':>14}{'峰值 (MB)':>12}{'RSS (MB)':>10}")
+    for rounds in args.rounds:
+        for policy in args.policy:
+            for stage in args.stages:
+                if stage == "export_excel" and rounds > args.excel_max:
+                    continue
+                r = run_case(stage, rounds, policy, args.data, args.seed, trace=not args.no_trace,
+                             repeat=args.repeat)
+                results.append(r)
+                peak = f"{r['peak_traced_mb']:.1f}" if r["peak_traced_mb"] is not None else "-"
+                print(f"   {stage:<13}{policy:<9}{rounds:>10}{r['wall_s']:>12.3f}{r['rounds_per_s']:>14,.0f}"
+                      f"{peak:>12}{r['max_rss_mb']:>10.0f}")
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, ensure_ascii=False)
+    print(f"✅ {len(results)} 项结果已保存到 {args.out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"📊 与 {args.compare} 对比（容差 {args.tolerance:.0%}）:")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} 项性能退化")
+            sys.exit(1)
+        print("✅ 没有性能退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import argparse
+import os
+
+import numpy as np
+
+import chordgen  # noqa: F401
+from harmony import encode_pair
+from log_parser import load_log
+from simulate import SimConfig
+
+# 和弦对紧凑编码（improvisation_test.ino 的 CHORD_WIRE_COMPACT，编码见 ChordGeneration/harmony.py）
+# 前后的 Chord Sync time 对比。
+#
+#   python chord_wire.py                                                  # 只看 database 里的旧日志
+#   python chord_wire.py --before database/Sender.txt --after capture/Sender.txt --plot
+#   python simulate.py --rounds 500 --set chord_wire=ascii ir_byte_ms=0.5 --out result/wire_ascii
+#   python simulate.py --rounds 500 --set ir_byte_ms=0.5 --out result/wire_compact
+#   python chord_wire.py --before result/wire_ascii/Sender.txt --after result/wire_compact/Sender.txt
+#
+# 每组和弦对在 IR 上的字节数：新日志有 "Chord wire bytes" 行，旧日志没有，就是和弦对文本的长度。
+# 旧日志里的每组和弦对也按紧凑格式重新编码，估算能省多少字节和 I2C 写入时间（与 simulate.py 同一个模型）。
+# 注意 Chord Sync time 从开始连续发送算起，而 Sender 固定连续发 50 ms，这一段不随编码变短；
+# 编码缩短的是每次写入 / 发送一条消息的时间（50 ms 里能多发几遍，丢一遍影响更小）和之后等 READY 的部分。
+
+
+def wire_rows(paths, group):
+    rows = []
+    for path in paths:
+        for s in load_log(path).sync:
+            if s.sync_ms is None:
+                continue
+            compact = encode_pair(s.chord_pair)
+            rows.append({
+                "group": group,
+                "log": path,
+                "round": s.round,
+                "basic": s.basic,
+                "chord_pair": s.chord_pair,
+                "wire_bytes": s.wire_bytes if s.wire_bytes is not None else len(s.chord_pair),
+                "compact_bytes": len(compact) if compact else len(s.chord_pair),
+                "sync_ms": s.sync_ms,
+            })
+    return rows
+
+
+def write_ms(n_bytes, cfg):
+    # 一次 Wire 写（地址 + 内容）的耗时
+    return (n_bytes + 1) * 9 / cfg.i2c_khz
+
+
+def burst_writes(n_bytes, cfg):
+    # 50 ms 的连续发送里写了几遍
+    return int(np.ceil(cfg.burst_ms / (write_ms(n_bytes, cfg) + cfg.burst_gap)))
+
+
+def summarize(rows, cfg):
+    sync = np.array([r["sync_ms"] for r in rows], dtype=float)
+    wire = np.array([r["wire_bytes"] for r in rows], dtype=float)
+    return {
+        "rounds": len(rows),
+        "wire_bytes": wire.mean(),
+        "write_ms": write_ms(wire.mean(), cfg),
+        "burst_writes": burst_writes(wire.mean(), cfg),
+        "sync_median": np.median(sync),
+        "sync_mean": sync.mean(),
+        "sync_p90": np.percentile(sync, 90),
+        "sync_max": sync.max(),
+        "after_burst_median": np.median(sync - cfg.burst_ms),
+    }
+
+
+def median_diff_ci(before, after, n_boot=2000, seed=0):
+    # after - before 的中位数差，bootstrap 95% 区间
+    rng = np.random.default_rng(seed)
+    before = np.asarray(before, dtype=float)
+    after = np.asarray(after, dtype=float)
+    b = np.median(rng.choice(before, (n_boot, len(before))), axis=1)
+    a = np.median(rng.choice(after, (n_boot, len(after))), axis=1)
+    diff = a - b
+    return np.median(after) - np.median(before), np.percentile(diff, 2.5), np.percentile(diff, 97.5)
+
+
+def print_summary(label, s):
+    print(f"📡 {label}: {s['rounds']} 轮，平均 {s['wire_bytes']:.1f} 字节/条，"
+          f"每次写 {s['write_ms']:.2f} ms（50 ms 内约 {s['burst_writes']} 遍）")
+    print(f"   Chord Sync time 中位数 {s['sync_median']:.0f} ms，平均 {s['sync_mean']:.1f} ms，"
+          f"90% 分位 {s['sync_p90']:.0f} ms，最大 {s['sync_max']:.0f} ms；"
+          f"连续发送之后 {s['after_burst_median']:.0f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="对比和弦对紧凑编码前后的 Chord Sync time")
+    parser.add_argument("--before", nargs="+", default=["database/Sender.txt", "database/Sender_Markov.txt"],
+                        help="原来文本编码的 Sender 日志")
+    parser.add_argument("--after", nargs="+", default=[], help="CHORD_WIRE_COMPACT 的 Sender 日志")
+    parser.add_argument("--out", default="result/chord_wire.csv", help="每组和弦对一行")
+    parser.add_argument("--plot", action="store_true", help="同时保存两组 Chord Sync time 的累积分布图")
+    args = parser.parse_args(argv)
+
+    cfg = SimConfig()
+    before = wire_rows(args.before, "before")
+    after = wire_rows(args.after, "after")
+    if not before:
+        parser.error("--before 的日志里没有 Chord Sync time")
+    if args.after and not after:
+        parser.error("--after 的日志里没有 Chord Sync time")
+
+    s_before = summarize(before, cfg)
+    print_summary("编码前", s_before)
+    compact = np.mean([r["compact_bytes"] for r in before])
+    print(f"🗜️  同样的和弦对换成紧凑格式：{s_before['wire_bytes']:.1f} -> {compact:.1f} 字节/条，"
+          f"每次写 {s_before['write_ms']:.2f} -> {write_ms(compact, cfg):.2f} ms，"
+          f"50 ms 内 {s_before['burst_writes']} -> {burst_writes(compact, cfg)} 遍")
+
+    if after:
+        s_after = summarize(after, cfg)
+        print_summary("编码后", s_after)
+        diff, lo, hi = median_diff_ci([r["sync_ms"] for r in before], [r["sync_ms"] for r in after])
+        print(f"📏 中位数变化 {diff:+.1f} ms（95% 区间 {lo:+.1f} ~ {hi:+.1f} ms）")
+
+    import pandas as pd
+
+    df = pd.DataFrame(before + after)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    df.to_csv(args.out, index=False)
+    print(f"✅ 每轮数据已保存到 {args.out}")
+
+    if args.plot:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=(8, 5))
+        for group, label in (("before", "text"), ("after", "compact")):
+            sync = np.sort(df.loc[df["group"] == group, "sync_ms"].to_numpy())
+            if len(sync):
+                ax.step(sync, np.arange(1, len(sync) + 1) / len(sync), where="post",
+                        label=f"{label} ({len(sync)} rounds)")
+        ax.axvline(cfg.burst_ms, color="grey", linestyle="--", linewidth=1, label="50 ms burst")
+        ax.set_xlabel("Chord Sync Time (ms)")
+        ax.set_ylabel("Fraction of rounds")
+        ax.set_title("Chord Sync Time: text vs compact chord pairs")
+        ax.legend()
+        ax.grid(True)
+        fig.tight_layout()
+        png = os.path.splitext(args.out)[0] + "_sync.png"
+        fig.savefig(png, dpi=300)
+        print(f"图片保存完成：{png}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+import sys
+
+# 分析脚本和 ChordGeneration 共用的模块：harmony（和弦表、和弦对编码）和 profiling（分阶段计时）只有
+# ChordGeneration 里的一份。两个目录都是按脚本直接运行的，没有打包安装，所以由这里统一把
+# ChordGeneration 加进 sys.path，各个脚本不再自己拼路径：
+#
+#   import chordgen  # noqa: F401
+#   from harmony import encode_pair
+#   from profiling import stage
+
+CHORD_GENERATION = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ChordGeneration"))
+
+if CHORD_GENERATION not in sys.path:
+    sys.path.insert(0, CHORD_GENERATION)
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import chordgen  # noqa: F401
+from log_parser import load_log
+from profiling import stage
+
+# 分析脚本之间传递的中间表：存成 numpy npz（按列存储），不再用 xlsx 来回读写。
+# 每个表都记录生成它的源日志 (路径, mtime, 大小)；日志没变就直接复用，变了自动重新生成。
+# Excel 只在最后导出，并且只在命令行带 --excel 时才写：
+#   python process_receiver.py --excel
+
+CACHE_DIR = "result/.cache"
+FORMAT_VERSION = 1    # 中间表的列或计算方式变化时加 1，旧缓存全部失效
+
+MISSING = "__missing__"   # 字符串列里 None 的位置单独存一个布尔列
+
+
+def source_key(sources):
+    h = hashlib.sha1(f"v{FORMAT_VERSION}".encode())
+    for path in sources:
+        st = os.stat(path)
+        h.update(f"|{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}".encode())
+    return h.hexdigest()
+
+
+def _cache_path(name):
+    return os.path.join(CACHE_DIR, f"{name}.npz")
+
+
+def save_frame(df, name, sources):
+    # 数值/布尔列原样保存，其他列转成定长 unicode 数组，None 的位置另存
+    arrays = {"__key__": np.array(source_key(sources)), "__columns__": np.array(list(df.columns), dtype=str)}
+    for i, column in enumerate(df.columns):
+        values = df[column]
+        if values.dtype.kind in "biuf":
+            arrays[f"c{i}"] = values.to_numpy()
+        else:
+            missing = values.isna().to_numpy()
+            arrays[f"c{i}"] = np.array(["" if m else str(v) for v, m in zip(values, missing)], dtype=str)
+            arrays[f"c{i}{MISSING}"] = missing
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = _cache_path(name) + ".tmp.npz"
+    np.savez(tmp_path, **arrays)
+    os.replace(tmp_path, _cache_path(name))
+
+
+def load_frame(name, sources):
+    # 缓存不存在或源日志已改动时返回 None
+    try:
+        with np.load(_cache_path(name)) as data:
+            if str(data["__key__"]) != source_key(sources):
+                return None
+            columns = {}
+            for i, column in enumerate(data["__columns__"]):
+                values = data[f"c{i}"]
+                if f"c{i}{MISSING}" in data:
+                    values = np.where(data[f"c{i}{MISSING}"], None, values.astype(object))
+                columns[str(column)] = values
+    except (OSError, KeyError, ValueError):
+        return None
+    return pd.DataFrame(columns)
+
+
+def cached_frame(name, sources, build):
+    with stage("load cache", table=name):
+        df = load_frame(name, sources)
+    if df is None:
+        with stage("build table", table=name) as s:
+            df = build()
+            save_frame(df, name, sources)
+            s.items = len(df)
+    return df
+
+
+def want_excel(argv=None):
+    return "--excel" in (sys.argv[1:] if argv is None else argv)
+
+
+def export_excel(df, path, **kwargs):
+    if want_excel():
+        with stage("excel export", path=path) as s:
+            df.to_excel(path, **kwargs)
+            s.items = len(df)
+        print(f"📄 已导出 {path}")
+
+
+# ---------------- 流水线里的中间表 ----------------
+
+RECEIVER_LOG = "database/receiver_drift.txt"
+
+
+def iqr_bounds(values):
+    with stage("quantiles") as s:
+        q1 = values.quantile(0.25)
+        q3 = values.quantile(0.75)
+        s.items = len(values)
+    iqr = q3 - q1
+    return q1, q3, q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def receiver_drift_frame(log_path=RECEIVER_LOG):
+    # 每轮一行：round, drift_ms, vote, chord_pair, sent_time
+    def build():
+        return load_log(log_path).rounds.to_frame()[["round", "drift_ms", "vote", "chord_pair", "sent_time"]]
+    return cached_frame("receiver_drift_analysis", [log_path], build)
+
+
+def receiver_outlier_frame(log_path=RECEIVER_LOG):
+    # receiver_drift_frame 再加一列 is_outlier（1.5×IQR 规则）
+    def build():
+        df = receiver_drift_frame(log_path).copy()
+        _, _, lower_bound, upper_bound = iqr_bounds(df["drift_ms"])
+        df["is_outlier"] = (df["drift_ms"] < lower_bound) | (df["drift_ms"] > upper_bound)
+        return df
+    return cached_frame("receiver_drift_with_outliers", [log_path], build)
@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import math
+import os
+import sys
+import termios
+import time
+import tty
+
+from log_parser import LogParser, ReceiverRound, SenderSync, SenderVote, SystemSync
+from streaming_iqr import DriftOutlierDetector
+
+# 演出过程中实时读取 Sender 和各个 Receiver 的串口输出（115200 波特率，asyncio 并发），
+# 每一行打上主机接收时间和板子编号，逐行喂给 log_parser.LogParser，
+# 每隔几秒打印一次 drift / pass rate 汇总，不用等演出结束再复制串口监视器的内容。
+#
+#   python live.py --serial sender=/dev/ttyACM0 --serial r1=/dev/ttyACM1 --serial r2=/dev/ttyACM2
+#   python live.py --follow sender=database/Sender.txt            # 跟踪不断增长的日志文件 (tail -f)
+#   python live.py --replay sender=database/Sender_Markov.txt --replay r1=database/Receiver_Markov.txt --speed 20
+#
+# --replay 用 pty 虚拟串口回放已有日志，整条链路（串口设置、非阻塞读取、解析、汇总）与真实串口相同。
+# --capture DIR 把每块板子的原始输出存成 DIR/<板子>.txt（可直接用其他分析脚本处理），
+# 并把带时间戳的所有行存成 DIR/tagged.tsv（主机时间\t板子\t内容）。
+
+BAUD = 115200
+CHORD_SECONDS = 8.0    # CHORD_DURATION：Sender 每 8 秒发一组和弦，Receiver 每 8 秒打印一次 Drift
+
+
+# ---------------- 行来源 ----------------
+
+def open_serial(path, baud=BAUD):
+    # 原始模式、8N1、非阻塞；pty 和 USB 串口都适用
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    tty.setraw(fd, termios.TCSANOW)    # 不丢弃已经收到的数据
+    attrs = termios.tcgetattr(fd)
+    speed = getattr(termios, f"B{baud}")
+    attrs[2] |= termios.CLOCAL | termios.CREAD
+    attrs[4] = attrs[5] = speed
+    termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    return fd
+
+
+def _split(buf, chunk):
+    # 把新数据接到缓冲区末尾，返回 (完整的行, 剩下的半行)
+    *lines, rest = (buf + chunk).split(b"\n")
+    return [line.rstrip(b"\r").decode("utf-8", "replace") for line in lines], rest
+
+
+async def serial_lines(path, baud=BAUD):
+    fd = open_serial(path, baud)
+    loop = asyncio.get_running_loop()
+    readable = asyncio.Event()
+    loop.add_reader(fd, readable.set)
+    buf = b""
+    try:
+        while True:
+            await readable.wait()
+            readable.clear()
+            try:
+                chunk = os.read(fd, 4096)
+            except BlockingIOError:
+                continue
+            except OSError:
+                break    # 设备拔出 / pty 另一端关闭 (EIO)
+            if not chunk:
+                break
+            lines, buf = _split(buf, chunk)
+            for line in lines:
+                yield line
+    finally:
+        loop.remove_reader(fd)
+        os.close(fd)
+    if buf:
+        yield buf.decode("utf-8", "replace")
+
+
+async def follow_lines(path, poll=0.2, from_start=True):
+    # tail -f：读到文件末尾后定期检查新内容；文件被截断（重新开始记录）时从头读
+    with open(path, "rb") as f:
+        if not from_start:
+            f.seek(0, os.SEEK_END)
+        buf = b""
+        while True:
+            chunk = f.read(65536)
+            if chunk:
+                lines, buf = _split(buf, chunk)
+                for line in lines:
+                    yield line
+                continue
+            if os.stat(path).st_size < f.tell():
+                f.seek(0)
+                buf = b""
+            await asyncio.sleep(poll)
+
+
+async def _write_all(fd, data):
+    while data:
+        try:
+            data = data[os.write(fd, data):]
+        except BlockingIOError:
+            await asyncio.sleep(0.01)
+
+
+async def replay_to_pty(log_path, speed=1.0):
+    # 打开一对 pty，返回 (从端路径, 回放任务)。回放按固件节奏：每个 "Sent chord pair" / "[Drift]"
+    # 前等 CHORD_SECONDS / speed 秒，其余行紧接着发出；回放完关闭主端，读取方收到 EIO 结束。
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    os.set_blocking(master, False)
+    slave_path = os.ttyname(slave)
+
+    async def run():
+        try:
+            with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    line = line.rstrip("\r\n")
+                    if line.startswith(("Sent chord pair:", "[Drift]")):
+                        await asyncio.sleep(CHORD_SECONDS / speed)
+                    await _write_all(master, (line + "\r\n").encode("utf-8"))
+            await asyncio.sleep(0.2)    # 等读取方读完最后一块
+        finally:
+            os.close(master)
+            os.close(slave)
+
+    return slave_path, asyncio.create_task(run())
+
+
+# ---------------- 实时汇总 ----------------
+
+class RunningStats:
+    # Welford 在线均值 / 方差
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.last = None
+
+    def add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+        self.last = x
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+
+class LiveSummary:
+
+    def __init__(self, iqr_window=None):
+        self.drift = {}       # 板子 -> RunningStats
+        self.outliers = {}    # 板子 -> DriftOutlierDetector（在线 IQR，见 streaming_iqr.py）
+        self.iqr_window = iqr_window
+        self.votes = {}       # 板子 -> {"VOTE_YES2": n, "VOTE_NO2": n, "failed": n}
+        self.sync = RunningStats()
+        self.results = {"reharm": 0, "basic": 0, "failed": 0}
+        self.pass_rate = None
+        self.system_sync_ms = None
+        self.last_seen = {}   # 板子 -> 最近一行的主机时间
+
+    def add(self, board, record):
+        if isinstance(record, ReceiverRound):
+            self.drift.setdefault(board, RunningStats()).add(record.drift_ms)
+            detector = self.outliers.setdefault(board, DriftOutlierDetector(window=self.iqr_window))
+            if detector.update(record.drift_ms):
+                print(f"⚠️  {board}: Round {record.round} drift = {record.drift_ms} ms 超出 IQR 范围", flush=True)
+            votes = self.votes.setdefault(board, {"VOTE_YES2": 0, "VOTE_NO2": 0, "failed": 0})
+            if record.vote in votes:
+                votes[record.vote] += 1
+            if record.failed:
+                votes["failed"] += 1
+        elif isinstance(record, SenderVote):
+            self.pass_rate = record.pass_rate
+            self.results[record.result or "basic"] += 1
+        elif isinstance(record, SenderSync) and record.sync_ms is not None:
+            self.sync.add(record.sync_ms)
+        elif isinstance(record, SystemSync):
+            self.system_sync_ms = record.sync_ms
+
+    def lines(self, now=None):
+        now = time.time() if now is None else now
+        out = [f"—— {time.strftime('%H:%M:%S', time.localtime(now))} ——"]
+        if self.pass_rate is not None or self.sync.n:
+            total = sum(self.results.values())
+            out.append(f"🥁 sender: pass rate {self.pass_rate if self.pass_rate is not None else '-'}"
+                       f"（reharm {self.results['reharm']} / basic {self.results['basic']} / "
+                       f"failed {self.results['failed']}，共 {total} 次投票），"
+                       f"Chord Sync time 平均 {self.sync.mean:.1f} ms")
+        for board in sorted(self.drift):
+            s = self.drift[board]
+            v = self.votes[board]
+            d = self.outliers[board]
+            q1, q3, lower, upper = d.bounds()
+            idle = now - self.last_seen.get(board, now)
+            out.append(f"🎵 {board}: {s.n} 轮，drift 最近 {s.last} ms，平均 {s.mean:.1f} ± {s.std:.1f} ms"
+                       f"（{s.min}~{s.max}），YES {v['VOTE_YES2']} / NO {v['VOTE_NO2']} / failed {v['failed']}"
+                       + (f"，{idle:.0f}s 无数据" if idle > 2 * CHORD_SECONDS else ""))
+            out.append(f"   Q1 {q1:g} / Q3 {q3:g}，正常范围 {lower:g}~{upper:g} ms，异常 {d.outliers} 轮"
+                       + ("，⚠️ 最近异常值密集" if d.alert else ""))
+        return out
+
+
+# ---------------- 主流程 ----------------
+
+class Capture:
+    # 原始行按板子分别存成 .txt，带时间戳的所有行存成 tagged.tsv
+    # 默认每次运行重新写；append=True 时接在上一次的记录后面（同一场实验中断后继续）
+
+    def __init__(self, directory, append=False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.mode = "a" if append else "w"
+        self.files = {}
+        self.tagged = open(os.path.join(directory, "tagged.tsv"), self.mode, encoding="utf-8")
+
+    def write(self, host_time, board, line):
+        if board not in self.files:
+            self.files[board] = open(os.path.join(self.directory, f"{board}.txt"), self.mode, encoding="utf-8")
+        self.files[board].write(line + "\n")
+        self.tagged.write(f"{host_time:.3f}\t{board}\t{line}\n")
+
+    def close(self):
+        for f in [*self.files.values(), self.tagged]:
+            f.close()
+
+
+async def _pump(board, lines, queue):
+    try:
+        async for line in lines:
+            await queue.put((time.time(), board, line))
+    finally:
+        await queue.put((time.time(), board, None))    # 这个来源结束
+
+
+async def ingest(sources, summary=None, capture=None, interval=5.0, duration=None, on_record=None):
+    # sources: {板子: 行的异步迭代器}。所有来源结束（或 duration 秒到）后返回 summary
+    summary = summary or LiveSummary()
+    queue = asyncio.Queue()
+    parsers = {board: LogParser() for board in sources}
+    pumps = [asyncio.create_task(_pump(board, lines, queue)) for board, lines in sources.items()]
+
+    def handle(board, records):
+        for record in records:
+            summary.add(board, record)
+            if on_record is not None:
+                on_record(board, record)
+
+    async def report():
+        while True:
+            await asyncio.sleep(interval)
+            print("\n".join(summary.lines()), flush=True)
+
+    reporter = asyncio.create_task(report()) if interval else None
+    deadline = None if duration is None else time.monotonic() + duration
+    active = len(sources)
+    try:
+        while active:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                host_time, board, line = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if line is None:
+                active -= 1
+                handle(board, parsers[board].close())
+                continue
+            summary.last_seen[board] = host_time
+            if capture is not None:
+                capture.write(host_time, board, line)
+            handle(board, parsers[board].feed(line))
+    finally:
+        for task in pumps + ([reporter] if reporter else []):
+            task.cancel()
+        await asyncio.gather(*pumps, *([reporter] if reporter else []), return_exceptions=True)
+        for board, parser in parsers.items():
+            handle(board, parser.close())
+    return summary
+
+
+def _board_paths(values, parser):
+    pairs = {}
+    for value in values or []:
+        board, sep, path = value.partition("=")
+        if not sep or not board or not path:
+            parser.error(f"格式应为 板子=路径: {value}")
+        if board in pairs:
+            parser.error(f"板子重复: {board}")
+        pairs[board] = path
+    return pairs
+
+
+async def _main(args, parser):
+    serial = _board_paths(args.serial, parser)
+    follow = _board_paths(args.follow, parser)
+    replay = _board_paths(args.replay, parser)
+    boards = [*serial, *follow, *replay]
+    if len(boards) != len(set(boards)):
+        parser.error("同一块板子只能有一个来源")
+    if not boards:
+        parser.error("至少需要一个 --serial / --follow / --replay")
+    if args.capture and os.path.isdir(args.capture) and os.listdir(args.capture) and not args.append:
+        parser.error(f"{args.capture} 不是空目录，换一个目录，或者加 --append 接着上次的记录写")
+
+    sources = {}
+    replays = []
+    for board, log_path in replay.items():
+        slave_path, task = await replay_to_pty(log_path, args.speed)
+        replays.append(task)
+        serial[board] = slave_path
+        print(f"🔁 {board}: 回放 {log_path} -> {slave_path}")
+    for board, path in serial.items():
+        sources[board] = serial_lines(path, args.baud)
+    for board, path in follow.items():
+        sources[board] = follow_lines(path, from_start=not args.from_end)
+
+    capture = Capture(args.capture, args.append) if args.capture else None
+    try:
+        summary = await ingest(sources, summary=LiveSummary(args.iqr_window), capture=capture,
+                               interval=args.interval, duration=args.duration)
+    finally:
+        if capture is not None:
+            capture.close()
+        for task in replays:
+            task.cancel()
+        await asyncio.gather(*replays, return_exceptions=True)
+    print("\n".join(summary.lines()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="实时读取多块板子的串口输出并汇总 drift / pass rate")
+    parser.add_argument("--serial", action="append", metavar="板子=设备", help="串口，例如 r1=/dev/ttyACM1")
+    parser.add_argument("--follow", action="append", metavar="板子=文件", help="跟踪不断增长的日志文件")
+    parser.add_argument("--replay", action="append", metavar="板子=日志", help="用 pty 虚拟串口回放已有日志")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放速度倍数")
+    parser.add_argument("--baud", type=int, default=BAUD)
+    parser.add_argument("--from-end", action="store_true", help="--follow 时只读之后新增的内容")
+    parser.add_argument("--interval", type=float, default=5.0, help="汇总打印间隔（秒），0 表示只在结束时打印")
+    parser.add_argument("--duration", type=float, default=None, help="运行多少秒后停止")
+    parser.add_argument("--capture", metavar="DIR", help="保存原始输出和带时间戳的行")
+    parser.add_argument("--append", action="store_true", help="--capture 目录里已有记录时接着写，而不是拒绝运行")
+    parser.add_argument("--iqr-window", type=int, default=None, metavar="N",
+                        help="异常值判定只用最近 N 轮的四分位数（默认全部）")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_main(args, parser))
+    except KeyboardInterrupt:
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
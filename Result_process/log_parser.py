@@ -0,0 +1,292 @@
+import os
+import re
+from dataclasses import dataclass, fields
+from functools import lru_cache
+
+# Sender / Receiver 日志的统一解析器：逐行读取（不 readlines），一遍扫完，产出按轮次的记录。
+# 两种日志的行格式互不重叠，所以同一个状态机就能处理 Sender.txt、receiver_drift.txt、
+# Receiver_Markov.txt（默认 / Markov 投票行都认）。
+#
+#   for record in iter_records("database/Sender.txt"): ...      # 流式，内存占用恒定
+#   records = LogParser().feed(line)                             # 实时：一次喂一行（见 live.py）
+#   log = load_log("database/receiver_drift.txt")                # 收集成按列存储的表
+#   df = log.rounds.to_frame()                                    # 需要时才导入 pandas
+#
+# 接收器用 TELEMETRY_BINARY 输出的二进制日志也可以直接传给 iter_records / load_log（见 telemetry.py）。
+
+
+# ---------------- 记录类型 ----------------
+
+@dataclass
+class SystemSync:
+    # "System Sync time: N"：开场同步耗时
+    sync_ms: int
+
+
+@dataclass
+class SenderSync:
+    # 一次 "Sent chord pair"（和 "Chord Sync time"）
+    round: int                    # 从 1 开始，按发送顺序
+    chord_pair: str               # 原样，例如 "4_7_11_2,7_11_2_5T"
+    basic: bool                   # 以 T 结尾的是基本和弦对，否则是 reharm
+    degree1: int = None           # 发送前打印的 "3, 5"（reharm 对没有）
+    degree2: int = None
+    sync_ms: int = None           # Chord Sync time
+    reharm_start_ms: int = None   # "Start reharm at"
+    wire_bytes: int = None        # "Chord wire bytes"：IR 上实际发的字节数（旧日志没有这行，即 chord_pair 的长度）
+
+
+@dataclass
+class SenderVote:
+    # 一次投票结束（"pass rate" 行）
+    round: int                    # 从 1 开始
+    result: str                   # "reharm" / "basic" / "failed"
+    pass_rate: float
+    sync_ms: int = None           # 被投票的那组和弦的 Chord Sync time
+
+
+@dataclass
+class ReceiverRound:
+    # 从 "[Drift] Round N" 到 "🎵 Sent to M5"（或下一个 Drift 行）之间的一轮
+    round: int
+    drift_ms: int
+    vote: str = None              # "VOTE_YES2" / "VOTE_NO2"，这一轮没投票则为 None
+    policy: str = None            # "default" / "markov"
+    history: str = None           # Markov: 最近两次投票结果，例如 "yn"
+    yes_probability: float = None # Markov: 这次投 YES 的概率 (0-1)
+    failed: bool = False          # "vote failed"
+    next: str = None              # "basic" / "reharm"
+    chord_pair: str = None        # 例如 "4_7_11_2 & 7_11_2_5"
+    sent_time: int = None         # "🎵 Sent to M5 at"（这一轮记录之后打印的，即下一轮开始演奏的时间）
+    play_ms: int = None           # 这一轮开始演奏的时间：固件先打印 Sent to M5，再打印 Drift 行
+
+
+RECORD_TYPES = (SystemSync, SenderSync, SenderVote, ReceiverRound)
+
+
+# ---------------- 行格式 ----------------
+
+DRIFT_RE = re.compile(r"\[Drift\] Round (\d+): Drift = (-?\d+) ms")
+VOTE_RE = re.compile(r"\[Receiver\] Sent vote(?: \((Markov)\))?:\s*(VOTE_[A-Z]+\d*)"
+                     r"(?:\s*\|\s*History:\s*(\w+))?(?:\s*\|\s*YES probability:\s*(\d+)%)?")
+NEXT_RE = re.compile(r"\[Receiver\] (?:Next basic chord pair|Playing (reharm) next): (.+)")
+SENT_RE = re.compile(r"🎵 Sent to M5 at: (\d+)")
+DEGREES_RE = re.compile(r"(\d+), (\d+)$")
+NUMBER_RE = re.compile(r"(-?[0-9.]+)")
+
+
+def unwrap_drift(value):
+    # 固件里 drift 是 unsigned long，负数会打印成接近 2^32 的值
+    return value - 2 ** 32 if value >= 2 ** 31 else value
+
+
+def _number(line, cast=int):
+    m = NUMBER_RE.search(line, line.index(":") + 1)
+    return cast(m.group(1)) if m else None
+
+
+class LogParser:
+    # 增量解析：feed(行) 返回这一行让其完成的记录（list），close() 返回最后没结束的记录。
+    # 每个串口 / 日志文件用各自的 LogParser（状态按板子区分）。
+
+    def __init__(self):
+        self.sync = None          # 还没结束的 SenderSync
+        self.vote = None          # 已读到 pass rate、还在等 "vote failed" 的 SenderVote
+        self.vote_result = None   # 最近一次 "vote result: ..."
+        self.degrees = (None, None)
+        self.last_sync_ms = None
+        self.n_sync = self.n_vote = 0
+        self.round = None         # 还没结束的 ReceiverRound
+        self.last_sent = None     # 刚读到、还没有对应 Drift 行的 "Sent to M5" 时间
+
+    def feed(self, line):
+        return list(self._feed(line))
+
+    def close(self):
+        records = [r for r in (self.vote, self.sync, self.round) if r is not None]
+        self.vote = self.sync = self.round = None
+        return records
+
+    def _feed(self, line):
+        line = line.strip()
+        if not line:
+            return
+
+        # Sender 的 "vote failed, send basic chord" 在 pass rate 之后，读到下一行才能确定投票结果
+        if self.vote is not None:
+            vote, self.vote = self.vote, None
+            if line.startswith("vote failed"):
+                vote.result = "failed"
+                yield vote
+                return
+            yield vote
+
+        # ---------- Receiver ----------
+        if line.startswith("[Drift]"):
+            m = DRIFT_RE.match(line)
+            if m:
+                if self.round is not None:
+                    yield self.round
+                self.round = ReceiverRound(round=int(m.group(1)), drift_ms=unwrap_drift(int(m.group(2))),
+                                           play_ms=self.last_sent)
+                self.last_sent = None
+            return
+        rnd = self.round
+        if line.startswith("[Receiver]"):
+            if rnd is None:
+                return
+            m = VOTE_RE.match(line)
+            if m:
+                rnd.vote = m.group(2)
+                rnd.policy = "markov" if m.group(1) else "default"
+                rnd.history = m.group(3)
+                rnd.yes_probability = int(m.group(4)) / 100 if m.group(4) else None
+                return
+            m = NEXT_RE.match(line)
+            if m:
+                rnd.next = "reharm" if m.group(1) else "basic"
+                rnd.chord_pair = m.group(2)
+            return
+        if line.startswith("🎵"):
+            # sendToM5 打印完这一行紧接着就是下一轮的 Drift 行，这一轮到此结束
+            m = SENT_RE.match(line)
+            if m:
+                self.last_sent = int(m.group(1))
+                if rnd is not None:
+                    rnd.sent_time = self.last_sent
+                    yield rnd
+                    self.round = None
+            return
+        if line == "vote failed":
+            if rnd is not None:
+                rnd.failed = True
+            return
+
+        # ---------- Sender ----------
+        if line.startswith("Sent chord pair:"):
+            if self.sync is not None:
+                yield self.sync
+            self.n_sync += 1
+            pair = line.split(":", 1)[1].strip()
+            self.sync = SenderSync(round=self.n_sync, chord_pair=pair, basic=pair.endswith("T"),
+                                   degree1=self.degrees[0], degree2=self.degrees[1])
+            self.degrees = (None, None)
+        elif line.startswith("Chord wire bytes:"):
+            if self.sync is not None:
+                self.sync.wire_bytes = _number(line)
+        elif line.startswith("Chord Sync time:"):
+            self.last_sync_ms = _number(line)
+            if self.sync is not None:
+                self.sync.sync_ms = self.last_sync_ms
+        elif line.startswith("Start reharm at:"):
+            if self.sync is not None:
+                self.sync.reharm_start_ms = _number(line)
+        elif line.startswith("vote result:"):
+            self.vote_result = line.split(":", 1)[1].strip()
+        elif line.startswith("pass rate:"):
+            self.n_vote += 1
+            self.vote = SenderVote(round=self.n_vote, result=self.vote_result,
+                                   pass_rate=_number(line, float), sync_ms=self.last_sync_ms)
+            self.vote_result = None
+        elif line.startswith("System Sync time:"):
+            yield SystemSync(sync_ms=_number(line))
+        else:
+            m = DEGREES_RE.match(line)
+            if m:
+                self.degrees = (int(m.group(1)), int(m.group(2)))
+
+
+def iter_records(source):
+    # source: 文件路径或任意按行迭代的对象；按出现顺序产出上面几种记录
+    if isinstance(source, (str, os.PathLike)):
+        from telemetry import is_telemetry, iter_telemetry_records
+        if is_telemetry(source):
+            # 接收器的二进制遥测帧（TELEMETRY_BINARY），解码成同样的 ReceiverRound
+            yield from iter_telemetry_records(source)
+            return
+        with open(source, "r", encoding="utf-8", errors="replace") as f:
+            yield from iter_records(f)
+        return
+    parser = LogParser()
+    for line in source:
+        yield from parser.feed(line)
+    yield from parser.close()
+
+
+# ---------------- 按列存储的表 ----------------
+
+class Table:
+    # 一种记录类型的所有记录，按列保存（每列一个 list）
+
+    def __init__(self, record_type):
+        self.record_type = record_type
+        self.columns = {f.name: [] for f in fields(record_type)}
+
+    def append(self, record):
+        for name, column in self.columns.items():
+            column.append(getattr(record, name))
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), []))
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __iter__(self):
+        # 逐行还原成记录对象
+        names = list(self.columns)
+        for values in zip(*self.columns.values()):
+            yield self.record_type(**dict(zip(names, values)))
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.columns)
+
+
+class ParsedLog:
+    # 一个日志文件解析后的全部表：system_sync / sync / votes（Sender），rounds（Receiver）
+
+    def __init__(self, path=None):
+        self.path = path
+        self.system_sync = Table(SystemSync)
+        self.sync = Table(SenderSync)
+        self.votes = Table(SenderVote)
+        self.rounds = Table(ReceiverRound)
+        self._tables = {SystemSync: self.system_sync, SenderSync: self.sync,
+                        SenderVote: self.votes, ReceiverRound: self.rounds}
+
+    def append(self, record):
+        self._tables[type(record)].append(record)
+
+    @property
+    def kind(self):
+        # "sender" / "receiver" / None（空日志）
+        if len(self.rounds):
+            return "receiver"
+        if len(self.sync) or len(self.votes):
+            return "sender"
+        return None
+
+    @property
+    def policy(self):
+        # Receiver 日志的投票方式："markov" / "default"
+        policies = {p for p in self.rounds["policy"] if p}
+        return "markov" if "markov" in policies else ("default" if policies else None)
+
+
+def parse_log(source):
+    log = ParsedLog(source if isinstance(source, (str, os.PathLike)) else None)
+    for record in iter_records(source):
+        log.append(record)
+    return log
+
+
+@lru_cache(maxsize=None)
+def _load_log(path, mtime, size):
+    return parse_log(path)
+
+
+def load_log(path):
+    # 同一个进程里同一个文件只解析一次（文件改动后自动重新解析）
+    st = os.stat(path)
+    return _load_log(os.fspath(path), st.st_mtime_ns, st.st_size)
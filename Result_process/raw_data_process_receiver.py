@@ -1,18 +1,12 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 
-# 读取文件
-df = pd.read_excel("result/receiver_drift_analysis.xlsx")
+from intermediate import iqr_bounds, receiver_outlier_frame
+
+# 读取带 is_outlier 标记的中间表（见 intermediate.py）
+df = receiver_outlier_frame()
 
 # 计算 IQR
-Q1 = df['drift_ms'].quantile(0.25)
-Q3 = df['drift_ms'].quantile(0.75)
-IQR = Q3 - Q1
-lower_bound = Q1 - 1.5 * IQR
-upper_bound = Q3 + 1.5 * IQR
-
-# 标记异常值
-df['is_outlier'] = (df['drift_ms'] < lower_bound) | (df['drift_ms'] > upper_bound)
+Q1, Q3, lower_bound, upper_bound = iqr_bounds(df['drift_ms'])
 
 # 去除异常值
 df_filtered = df[~df['is_outlier']].copy()
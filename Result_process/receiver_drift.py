@@ -1,8 +1,9 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 
-# 读取 Excel 文件
-df = pd.read_excel("result/receiver_drift_with_outliers.xlsx")
+from intermediate import receiver_outlier_frame
+
+# 读取带 is_outlier 标记的中间表（见 intermediate.py）
+df = receiver_outlier_frame()
 
 # 只保留非异常值的数据
 df_clean = df[df['is_outlier'] == False]
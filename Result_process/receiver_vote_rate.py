@@ -1,23 +1,21 @@
-import re
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from intermediate import export_excel
+from log_parser import load_log
+
 # 读取 Receiver 日志文件
-with open("database/receiver_drift.txt", "r", encoding="utf-8") as f:
-    lines = f.readlines()
+rounds = load_log("database/receiver_drift.txt").rounds
 
 # 初始化
 vote_results = []
 current_vote = None
 
-for line in lines:
-    line = line.strip()
-    if "Sent vote:" in line:
-        if "VOTE_YES2" in line:
-            current_vote = "VOTE_YES2"
-        elif "VOTE_NO2" in line:
-            current_vote = "VOTE_NO2"
-    elif "[Receiver] Next basic chord pair" in line:
+# 每个 "Next basic chord pair" 轮次记一次最近的投票，没有则记为 Blank
+for vote, nxt in zip(rounds["vote"], rounds["next"]):
+    if vote:
+        current_vote = vote
+    if nxt == "basic":
         vote_results.append(current_vote if current_vote else "Blank")
         current_vote = None  # 重置
 
@@ -26,9 +24,9 @@ vote_counts = pd.Series(vote_results).value_counts()
 print("投票统计：")
 print(vote_counts)
 
-# 保存为 Excel
+# 保存为 Excel（加 --excel 时）
 df = vote_counts.rename_axis("Vote Result").reset_index(name="Count")
-df.to_excel("result/vote_result_piechart.xlsx", index=False)
+export_excel(df, "result/vote_result_piechart.xlsx", index=False)
 
 # 绘制饼状图
 plt.figure(figsize=(6, 6))
@@ -36,4 +34,4 @@ plt.pie(df["Count"], labels=df["Vote Result"], autopct='%1.1f%%', startangle=90)
 plt.title("Vote Result Distribution")
 plt.tight_layout()
 plt.savefig("result/vote_piechart.png")
-plt.show()
\ No newline at end of file
+plt.show()
@@ -0,0 +1,350 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import chordgen  # noqa: F401
+from analyze import vote_counts
+from log_parser import load_log
+from profiling import add_event, add_profile_options, enable_from_args, stage
+from streaming_iqr import DriftOutlierDetector
+from vote_theory import FIRMWARE_POLICIES, stationary
+
+# 一条命令生成全部图表和一份 Markdown 汇总，不弹窗（Agg 后端），各张图在子进程里并行渲染。
+#
+#   python report.py                      # database/ 下的四个日志 -> result/*.png + result/report.md
+#   python report.py --batch runs         # 另外加上多次实验的按条件汇总（见 batch_analysis.py）
+#   python report.py --profile result/profile.json   # 分阶段计时：解析、分位数、每张图（含 savefig）、Markdown
+#
+# 图的内容、文件名与各个单独脚本一致：
+#   receiver_vote_rate.py / Receiver_Markov_process.py    投票饼图
+#   Outliers_process_receiver(_Markov).py                 drift + IQR 线
+#   raw_data_process_receiver.py                          去掉异常值后的 drift
+#   Process_sender_pass_rate.py / Process_sender_sync_time.py
+
+LOGS = {
+    "default_sender": "database/Sender.txt",
+    "markov_sender": "database/Sender_Markov.txt",
+    "default_receiver": "database/receiver_drift.txt",
+    "markov_receiver": "database/Receiver_Markov.txt",
+}
+
+# 理论通过率（固件投票规则的马尔可夫链平稳解，与 Process_sender_pass_rate.py 相同）
+THEORY = {"Default": stationary(FIRMWARE_POLICIES["default"])[1],
+          "Markov": stationary(FIRMWARE_POLICIES["markov"])[1]}
+
+
+# ---------------- 绘图（在子进程里运行） ----------------
+
+_savefig_seconds = 0.0   # 当前这张图花在 savefig 上的时间（--profile 时单独记一项）
+
+
+def _savefig(plt, path, dpi=None):
+    global _savefig_seconds
+    start = time.perf_counter()
+    plt.savefig(path, dpi=dpi) if dpi else plt.savefig(path)
+    _savefig_seconds += time.perf_counter() - start
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def plot_pie(path, labels, sizes, title, figsize=None):
+    plt = _pyplot()
+    plt.figure(figsize=figsize)
+    plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
+    plt.title(title)
+    plt.axis("equal")
+    plt.tight_layout()
+    _savefig(plt, path)
+    plt.close()
+
+
+def plot_drift_iqr(path, x, drift, bounds, title, dpi=300):
+    plt = _pyplot()
+    q1, q3, lower_bound, upper_bound = bounds
+    plt.figure(figsize=(10, 6))
+    plt.plot(x, drift, label='Drift (ms)', marker='o', linestyle='-')
+    plt.axhline(q1, color='green', linestyle='--', label='Q1 (25th percentile)')
+    plt.axhline(q3, color='blue', linestyle='--', label='Q3 (75th percentile)')
+    plt.axhline(lower_bound, color='red', linestyle=':', label='Lower Bound (Q1 - 1.5×IQR)')
+    plt.axhline(upper_bound, color='red', linestyle=':', label='Upper Bound (Q3 + 1.5×IQR)')
+    plt.xlabel('Round')
+    plt.ylabel('Drift (ms)')
+    plt.title(title)
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    _savefig(plt, path, dpi)
+    plt.close()
+
+
+def plot_lines(path, series, title, xlabel, ylabel, hlines=(), ylim=None, markers=False, dpi=300):
+    # series: [(标签, x, y)]，hlines: [(y, 颜色, 标签)]
+    plt = _pyplot()
+    plt.figure(figsize=(10, 6))
+    for i, (label, x, y) in enumerate(series):
+        plt.plot(x, y, label=label, linewidth=1, marker=("o", "s", "^", "d")[i % 4] if markers else None)
+    for y, color, label in hlines:
+        plt.axhline(y=y, color=color, linestyle="--", linewidth=1, label=label)
+    plt.xlabel(xlabel)
+    plt.ylabel(ylabel)
+    if ylim:
+        plt.ylim(*ylim)
+    plt.title(title)
+    plt.legend()
+    plt.grid(True)
+    plt.tight_layout()
+    _savefig(plt, path, dpi)
+    plt.close()
+
+
+def plot_bars(path, labels, values, errors, title, ylabel, dpi=150):
+    plt = _pyplot()
+    plt.figure(figsize=(8, 5))
+    plt.bar(labels, values, yerr=[0 if e != e else e for e in errors], capsize=6)
+    plt.ylabel(ylabel)
+    plt.title(title)
+    plt.grid(True, axis="y")
+    plt.tight_layout()
+    _savefig(plt, path, dpi)
+    plt.close()
+
+
+def _render(job):
+    # 返回 (路径, 开始时刻, 总耗时, 其中 savefig 的耗时, 子进程 pid)；perf_counter 是系统单调时钟，主进程可以直接用
+    global _savefig_seconds
+    func, path, kwargs = job
+    _savefig_seconds = 0.0
+    start = time.perf_counter()
+    func(path, **kwargs)
+    return path, start, time.perf_counter() - start, _savefig_seconds, os.getpid()
+
+
+# ---------------- 数据准备（主进程，只用解析好的表） ----------------
+
+def _bounds(drifts):
+    with stage("quantiles") as s:
+        detector = DriftOutlierDetector()
+        for d in drifts:
+            detector.add(d)
+        s.items = len(drifts)
+        return detector.bounds()
+
+
+def _parse(path):
+    with stage("parse", log=path) as s:
+        log = load_log(path)
+        s.items = len(log.rounds) + len(log.sync) + len(log.votes)
+    return log
+
+
+def _vote_pie_default(rounds):
+    counts = vote_counts(rounds)
+    return list(counts), list(counts.values())
+
+
+def _pass_rate_table(default_votes, markov_votes):
+    # 与 Process_sender_pass_rate.py 相同：按 Round 对齐，补齐到最长的轮数，向前填充，开头缺失填 0
+    n = max(len(default_votes), len(markov_votes))
+    table = {}
+    for label, votes in (("Default", default_votes), ("Markov", markov_votes)):
+        rates = list(votes["pass_rate"])
+        filled = []
+        last = 0.0
+        for i in range(n):
+            last = rates[i] if i < len(rates) else last
+            filled.append(last)
+        table[label] = filled
+    return list(range(1, n + 1)), table
+
+
+def build_jobs(logs, out_dir):
+    jobs = []
+    facts = {}
+
+    def out(name):
+        return os.path.join(out_dir, name)
+
+    for label, key in (("Default", "default_receiver"), ("Markov", "markov_receiver")):
+        rounds = _parse(logs[key]).rounds
+        drift = rounds["drift_ms"]
+        q1, q3, lower, upper = bounds = _bounds(drift)
+        keep = [i for i, d in enumerate(drift) if lower <= d <= upper]
+        votes = [v for v in rounds["vote"] if v]
+        facts[label] = {
+            "rounds": len(drift), "q1": q1, "q3": q3, "lower": lower, "upper": upper,
+            "outliers": len(drift) - len(keep),
+            "yes": sum(v.startswith("VOTE_YES") for v in votes),
+            "no": sum(v.startswith("VOTE_NO") for v in votes),
+            "failed": sum(rounds["failed"]),
+        }
+        if label == "Default":
+            labels, sizes = _vote_pie_default(rounds)
+            jobs.append((plot_pie, out("vote_piechart.png"),
+                         dict(labels=labels, sizes=sizes, title="Vote Result Distribution", figsize=(6, 6))))
+            jobs.append((plot_drift_iqr, out("drift_with_IQR_lines.png"),
+                         dict(x=list(range(len(drift))), drift=drift, bounds=bounds,
+                              title="Chord Synchronisation Drift with IQR Bounds")))
+            jobs.append((plot_drift_iqr, out("drift_no_outliers_with_IQR.png"),
+                         dict(x=keep, drift=[drift[i] for i in keep], bounds=bounds,
+                              title="Chord Sync Drift Without Outliers (With IQR Bounds)")))
+        else:
+            f = facts[label]
+            jobs.append((plot_pie, out("vote_pie_chart_Markov.png"),
+                         dict(labels=["VOTEYES", "VOTENO", "failed"], sizes=[f["yes"], f["no"], f["failed"]],
+                              title="Vote Outcomes (Markov)")))
+            jobs.append((plot_drift_iqr, out("drift_with_IQR_lines_Markov.png"),
+                         dict(x=list(range(len(drift))), drift=drift, bounds=bounds,
+                              title="Chord Synchronisation Drift with IQR Bounds")))
+            jobs.append((plot_drift_iqr, out("drift_no_outliers_Markov.png"),
+                         dict(x=[rounds["round"][i] for i in keep], drift=[drift[i] for i in keep], bounds=bounds,
+                              title="Chord Synchronisation Drift with IQR Bounds(Markov process)")))
+            jobs.append((plot_lines, out("drift_line_chart_Markov.png"),
+                         dict(series=[("Drift", rounds["round"], drift)], title="Drift Over Rounds",
+                              xlabel="Round", ylabel="Drift (ms)", dpi=100)))
+
+    default_log = _parse(logs["default_sender"])
+    markov_log = _parse(logs["markov_sender"])
+    x, rates = _pass_rate_table(default_log.votes, markov_log.votes)
+    jobs.append((plot_lines, out("sender_passrate_compare.png"),
+                 dict(series=[(label, x, y) for label, y in rates.items()],
+                      title="Pass Rate Comparison (Default vs Markov)", xlabel="Round", ylabel="Pass Rate",
+                      hlines=[(THEORY["Default"], "blue", f"Default Theoretical ({THEORY['Default']:.1%})"),
+                              (THEORY["Markov"], "orange", f"Markov Theoretical ({THEORY['Markov']:.1%})")],
+                      markers=True)))
+    sync_series = []
+    for label, log in (("Default", default_log), ("Markov", markov_log)):
+        sync = [ms for ms in log.sync["sync_ms"] if ms is not None]
+        sync_series.append((f"{label} Sync Time", list(range(1, len(sync) + 1)), sync))
+        mean = sum(sync) / len(sync) if sync else float("nan")
+        var = sum((s - mean) ** 2 for s in sync) / (len(sync) - 1) if len(sync) > 1 else float("nan")
+        facts[label].update({
+            "votes": len(log.votes),
+            "pass_rate": log.votes["pass_rate"][-1] if len(log.votes) else float("nan"),
+            "sync_mean": mean, "sync_var": var,
+        })
+    jobs.append((plot_lines, out("sender_sync_time_comparison.png"),
+                 dict(series=sync_series, title="Chord Sync Time Comparison", xlabel="Round",
+                      ylabel="Chord Sync Time (ms)", ylim=(45, 60))))
+    return jobs, facts
+
+
+def build_batch_jobs(summary, out_dir):
+    jobs = []
+    conditions = list(summary["condition"])
+    charts = [
+        ("batch_pass_rate.png", "pass_rate_mean", "pass_rate_std", "Pass Rate by Condition", "Pass Rate"),
+        ("batch_sync_time.png", "sync_mean_ms", "sync_run_std_ms", "Chord Sync Time by Condition", "ms"),
+        ("batch_drift.png", "drift_mean_inlier_ms", None, "Drift (outliers removed) by Condition", "ms"),
+        ("batch_outlier_rate.png", "drift_outlier_rate", None, "Drift Outlier Rate by Condition", "rate"),
+    ]
+    for name, column, error, title, ylabel in charts:
+        if column not in summary:
+            continue
+        errors = list(summary[error]) if error and error in summary else [0] * len(conditions)
+        jobs.append((plot_bars, os.path.join(out_dir, name),
+                     dict(labels=conditions, values=list(summary[column].fillna(0)), errors=errors,
+                          title=title, ylabel=ylabel)))
+    return jobs
+
+
+# ---------------- Markdown ----------------
+
+def write_markdown(path, facts, images, batch_summary=None, elapsed=None):
+    lines = ["# Experiment report", ""]
+    lines += ["| | Default | Markov |", "|---|---|---|"]
+    rows = [
+        ("Votes (sender)", "votes", "{:d}"),
+        ("Final pass rate", "pass_rate", "{:.2f}"),
+        ("Chord Sync time mean (ms)", "sync_mean", "{:.2f}"),
+        ("Chord Sync time variance", "sync_var", "{:.4f}"),
+        ("Drift rounds (receiver)", "rounds", "{:d}"),
+        ("Drift Q1 / Q3 (ms)", None, None),
+        ("Drift outliers (1.5×IQR)", "outliers", "{:d}"),
+        ("YES / NO / failed votes", None, None),
+    ]
+    for title, key, fmt in rows:
+        cells = []
+        for label in ("Default", "Markov"):
+            f = facts[label]
+            if title.startswith("Drift Q1"):
+                cells.append(f"{f['q1']:g} / {f['q3']:g}")
+            elif title.startswith("YES"):
+                cells.append(f"{f['yes']} / {f['no']} / {f['failed']}")
+            else:
+                cells.append(fmt.format(f[key]))
+        lines.append(f"| {title} | {cells[0]} | {cells[1]} |")
+    lines += ["", f"Theoretical pass rate: Default {THEORY['Default']:.3f}, Markov {THEORY['Markov']:.3f}.", ""]
+    if batch_summary is not None:
+        lines += ["## Batch summary", "", batch_summary.to_markdown(index=False)
+                  if _has_tabulate() else "```\n" + batch_summary.to_string(index=False) + "\n```", ""]
+    lines += ["## Charts", ""]
+    for image in images:
+        name = os.path.basename(image)
+        lines += [f"### {os.path.splitext(name)[0]}", "", f"![{name}]({name})", ""]
+    if elapsed is not None:
+        lines.append(f"_Generated in {elapsed:.1f} s._")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _has_tabulate():
+    try:
+        import tabulate  # noqa: F401  pandas.to_markdown 需要
+        return True
+    except ImportError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="无界面并行生成全部图表和 report.md")
+    for key, path in LOGS.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", default=path, help=f"默认 {path}")
+    parser.add_argument("--batch", metavar="ROOT", help="同时汇总多次实验（目录结构见 batch_analysis.py）")
+    parser.add_argument("--out", default="result", help="输出目录")
+    parser.add_argument("--jobs", type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    add_profile_options(parser)
+    args = parser.parse_args(argv)
+    enable_from_args(args)
+
+    start = time.perf_counter()
+    os.makedirs(args.out, exist_ok=True)
+    logs = {key: getattr(args, key) for key in LOGS}
+    with stage("prepare charts"):
+        jobs, facts = build_jobs(logs, args.out)
+
+    batch_summary = None
+    if args.batch:
+        from batch_analysis import analyze, summarize_conditions
+        with stage("batch", root=args.batch) as s:
+            runs = analyze(args.batch, args.jobs)
+            runs = runs[runs["kind"].notna()]
+            batch_summary = summarize_conditions(runs)
+            batch_summary.to_csv(os.path.join(args.out, "batch_summary.csv"), index=False)
+            jobs += build_batch_jobs(batch_summary, args.out)
+            s.items = len(runs)
+
+    images = []
+    with stage("render charts") as s, ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        s.items = len(jobs)
+        for path, chart_start, seconds, savefig, pid in pool.map(_render, jobs):
+            images.append(path)
+            name = os.path.basename(path)
+            add_event("chart", chart_start, seconds, tid=pid, chart=name)
+            add_event("savefig", chart_start + seconds - savefig, savefig, tid=pid, chart=name)
+            print(f"🖼️  {path}（{seconds:.1f}s）")
+
+    report_path = os.path.join(args.out, "report.md")
+    elapsed = time.perf_counter() - start
+    with stage("markdown"):
+        write_markdown(report_path, facts, images, batch_summary, elapsed)
+    print(f"✅ {len(images)} 张图和 {report_path}，用时 {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,834 @@
+import argparse
+import heapq
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+
+import chordgen  # noqa: F401
+# 和弦规则（getChordFromDegree / getReharmProgression / tritone）与板子上的表同一份，见 ChordGeneration/harmony.py
+from harmony import chord_from_degree, encode_pair, reharm_progression, tritone, wire_to_text
+from streaming_iqr import DriftOutlierDetector
+
+# Sender / Receiver 同步协议的离散事件模拟：按 improvisation_test.ino 和 receivers_test.ino /
+# receivers_Markov.ino 的状态机逐条实现，不用真机、不用等 8 秒一轮，几秒钟就能跑完上千轮。
+#
+#   python simulate.py                                    # 默认参数跑 100 轮，日志写到 result/simulated/
+#   python simulate.py --rounds 1000 --set policy=markov ir_loss=0.02
+#   python simulate.py --sweep check_interval=20,50,100 --sweep ir_loss=0,0.02 --seeds 20
+#
+# 输出的日志与 database/*.txt 格式相同（Sender.txt、Receiver1.txt ...），其他脚本可以直接读。
+#
+# 模型（时间单位 ms）：
+#   - 每块板有自己的 millis()（可选晶振误差 clock_ppm），只在它的 loop 真正会执行到的时刻被唤醒：
+#     接收器按 CHECK_INTERVAL 轮询，周期 = CHECK_INTERVAL + 1 + loop 耗时；Sender 的 loop 约 1 ms
+#   - 红外：每次发送对每个接收方独立丢包，延迟在 [ir_latency_ms, ir_latency_ms + ir_jitter_ms] 内；
+#     IR 板每一路只保留最新一条消息，读出后清空（不在监听状态时消息会留着，也可能被后来的覆盖）
+#   - Sender 发和弦对时 50 ms 内连续写（每次写 I2C 后 delay(3)），"start" 连续发 100 ms
+#   - 开场握手单独用 sync_loss：固件里 READY 丢了 Sender 会一直等，默认不丢
+
+
+DEGREE_SEQUENCE = [2, 6, 3, 5, 4, 1]
+
+# 状态名与固件一致
+WAITING_FOR_START_SYNC = "WAITING_FOR_START_SYNC"
+WAITING_FOR_ACKS = "WAITING_FOR_ACKS"
+SENDING_SYNC_DATA = "SENDING_SYNC_DATA"
+WAITING_FOR_READY = "WAITING_FOR_READY"
+BROADCAST_START = "BROADCAST_START"
+PROMOTE_VOTE = "PROMOTE_VOTE"
+VOTE = "VOTE"
+WAIT_FOR_REHARM = "WAIT_FOR_REHARM"
+
+WAIT_PREPARE_SYNC = "WAIT_PREPARE_SYNC"
+WAIT_CHORD_SIGNAL = "WAIT_CHORD_SIGNAL"
+WAIT_PLAY_CHORD = "WAIT_PLAY_CHORD"
+VOTING_WINDOW = "VOTING_WINDOW"
+
+LISTENING = (WAIT_PREPARE_SYNC, WAIT_CHORD_SIGNAL, VOTING_WINDOW)   # 接收器会读 IR 的状态
+
+
+@dataclass
+class SimConfig:
+    rounds: int = 100                 # Sender 播放多少组和弦后结束
+    seed: int = 0
+    policy: str = "default"           # 接收器投票方式："default"（receivers_test）/ "markov"
+    chord_wire: str = "compact"       # IR 上的和弦对：CHORD_WIRE_COMPACT 的 "compact"（3 字节）/ 原来的 "ascii"
+    members: int = 4                  # NUM_MEMBERS
+    # 固件里的时间常数
+    chord_duration: int = 8000        # CHORD_DURATION
+    check_interval: int = 50          # 接收器 CHECK_INTERVAL
+    post_ack_delay: int = 700         # POST_ACK_DELAY
+    vote_window: int = 5000           # 投票窗口（两边都是 5 秒）
+    vote_toggle: int = 50             # Sender 投票阶段 "发 start_vote / 收票" 交替的间隔
+    start_delay: int = 5000           # 收到 start 后多久开始演奏（BROADCAST_START 也等这么久）
+    prepare_delay: int = 8000         # 开机后多久发 prepare_sync
+    sync_retry: int = 30000           # 等 ACK 超时重发 prepare_sync
+    burst_ms: int = 50                # 和弦对持续发送时长
+    burst_gap: int = 3                # 每次写之后的 delay
+    start_burst_ms: int = 100         # "start" 持续发送时长
+    start_burst_gap: int = 5
+    # 硬件
+    i2c_khz: float = 100.0            # 写一个字节约 9 bit
+    sender_loop_ms: float = 1.0       # Sender 一次 loop 的耗时
+    receiver_loop_ms: float = 0.2     # 接收器 loop 耗时，决定轮询周期里 CHECK_INTERVAL + 1 之外的部分
+    receiver_loop_spread: float = 0.1 # 各接收器的 loop 耗时在 ±spread 内随机
+    clock_ppm: float = 0.0            # 各板晶振误差的标准差
+    # 红外信道
+    ir_loss: float = 0.0              # 演奏阶段每次发送、对每个接收方的丢包概率
+    sync_loss: float = 0.0            # 开场握手阶段的丢包概率
+    ir_latency_ms: float = 5.0
+    ir_jitter_ms: float = 5.0
+    ir_byte_ms: float = 0.0           # 每字节的红外发送时间，消息越长到得越晚（默认不计）
+    crosstalk: float = 0.0            # 接收器之间的消息落进"Sender 那一路"的概率（会覆盖没读的和弦对）
+    # 投票
+    yes_percent: int = 35             # receivers_test：random(100) < 35
+    markov_after_reharm: int = 35     # receivers_Markov：history 第一个字符是 'y' 时
+    markov_after_basic: int = 50
+
+
+# ---------------- 红外信道 ----------------
+
+class Mailbox:
+    # IR 板上的一路接收缓存：只保留最新一条，读出后清空。pending 里是还没被读走的 (到达时间, 消息)
+
+    def __init__(self):
+        self.pending = []
+
+    def put(self, t, msg):
+        pending = self.pending
+        if not pending or pending[-1][0] <= t:
+            pending.append((t, msg))
+        else:
+            i = len(pending)
+            while i and pending[i - 1][0] > t:
+                i -= 1
+            pending.insert(i, (t, msg))
+
+    def first(self):
+        return self.pending[0][0] if self.pending else math.inf
+
+    def read(self, t):
+        pending = self.pending
+        n = 0
+        while n < len(pending) and pending[n][0] <= t:
+            n += 1
+        if not n:
+            return None
+        msg = pending[n - 1][1]
+        del pending[:n]
+        return msg
+
+
+def _write_ms(msg, cfg):
+    # 一次 Wire 写（地址 + 内容）的耗时
+    return (len(msg) + 1) * 9 / cfg.i2c_khz
+
+
+def _unsigned(value):
+    # Serial.print(unsigned long)
+    return value % 2 ** 32
+
+
+# ---------------- 板子 ----------------
+
+class Board:
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.rng = sim.rng
+        ppm = self.rng.gauss(0, sim.cfg.clock_ppm) if sim.cfg.clock_ppm else 0.0
+        self.rate = 1 + ppm * 1e-6    # millis() = 真实时间 × rate
+        self.version = 0
+        self.wake_at = math.inf
+        self.lines = []
+
+    def wake(self, t):
+        # 在真实时间 t 唤醒（只会提前，不会推迟）
+        if t < self.wake_at:
+            self.wake_at = t
+            self.version += 1
+            self.sim.push(t, self)
+
+    def transmit(self, msg, local, loss):
+        self.sim.transmit(self, msg, local / self.rate, loss)
+
+
+class Sender(Board):
+
+    def __init__(self, sim):
+        super().__init__(sim)
+        cfg = sim.cfg
+        n = cfg.members
+        self.mailboxes = [Mailbox() for _ in range(n)]   # RX i 只收 MEMBER_ID = i + 1 的消息
+        self.ack = [False] * n
+        self.ready = [False] * n
+        self.vote_received = [False] * n
+        self.vote_yes = [False] * n
+        self.vote_result = False
+        self.sync = False
+        self.state = WAITING_FOR_START_SYNC
+        self.current_index = 0
+        self.vote_round = 0
+        self.total_pass = 0
+        self.is_reharm = False
+        self.chord_pair = ""
+        self.sync_start = 2000        # setup() 里 delay(2000) 之后
+        self.state_enter = 0
+        self.chord_start = 0
+        self.chord_send = 0
+        self.vote_start = 0
+        self.vote_loop_timer = 0
+        self.toggle_send = True
+        self.busy_until = 0.0         # 连续发送期间 loop 被阻塞（真实时间）
+        self.plays = []               # 每次 sendToM5 的真实时间
+        self.chord_sync = []
+        self.results = []             # "reharm" / "basic" / "failed"
+        self.system_sync = None
+        self.lines.append("Finished Initialisation")
+        self.wake(2050 / self.rate)
+
+    def _loop(self, local):
+        # 下一次 loop 的真实时间
+        return (local + self.rng.uniform(0.5, 1.5) * self.sim.cfg.sender_loop_ms) / self.rate
+
+    def _at(self, local_ms):
+        # 第一个 millis() >= local_ms 的 loop
+        return (local_ms + self.rng.random() * self.sim.cfg.sender_loop_ms) / self.rate
+
+    def _loss(self):
+        cfg = self.sim.cfg
+        return cfg.ir_loss if self.sync else cfg.sync_loss
+
+    def deliver(self, t, member, msg):
+        self.mailboxes[member - 1].put(t, msg)
+        if self.state in (WAITING_FOR_ACKS, WAITING_FOR_READY):
+            self.wake(max(t, self.busy_until) + self.rng.random() * self.sim.cfg.sender_loop_ms / self.rate)
+
+    def _wake_on_mail(self):
+        first = min(box.first() for box in self.mailboxes)
+        if first < math.inf:
+            self.wake(max(first, self.busy_until) + self.rng.random() * self.sim.cfg.sender_loop_ms / self.rate)
+
+    def _burst(self, msg, local, duration, gap):
+        # while (millis() - start < duration) { 写; delay(gap); }，返回结束时的本地时间
+        cfg = self.sim.cfg
+        write = _write_ms(msg, cfg)
+        start = int(local)
+        t = local
+        while int(t) - start < duration:
+            self.transmit(msg, t + write, self._loss())
+            t += write + gap
+        self.busy_until = t / self.rate
+        return t
+
+    def _play(self, t):
+        self.plays.append(t)
+
+    def step(self, t):
+        cfg = self.sim.cfg
+        local = t * self.rate
+        now = int(local)
+        state = self.state
+
+        if state == WAITING_FOR_START_SYNC:
+            if now - self.sync_start >= cfg.prepare_delay:
+                self.lines += ["", "--- New sync cycle ---"]
+                self.ack = [False] * cfg.members
+                self.ready = [False] * cfg.members
+                self.transmit("prepare_sync", local + _write_ms("prepare_sync", cfg), self._loss())
+                self.lines.append("SENDER: Sent prepare_sync.")
+                self.state = WAITING_FOR_ACKS
+                self.state_enter = now
+                self.wake(self._loop(local))
+            else:
+                self.wake(self._at(self.sync_start + cfg.prepare_delay))
+
+        elif state == WAITING_FOR_ACKS:
+            for i, box in enumerate(self.mailboxes):
+                msg = box.read(t)
+                for j in range(cfg.members):
+                    if msg == f"ACK{j + 1}":
+                        self.ack[j] = True
+                        self.lines.append(f"SENDER: Marked ACK from receiver {j + 1}")
+            if all(self.ack) and now - self.state_enter >= cfg.post_ack_delay:
+                self.sync_start = now
+                self.state = SENDING_SYNC_DATA
+                self.wake(self._loop(local))
+            elif now - self.sync_start >= cfg.sync_retry:
+                # 固件重发 prepare_sync 时没有刷新 sync_start_time，之后每个 loop 都会立刻超时重发，
+                # 不可能再等满 POST_ACK_DELAY，这里直接判定同步失败
+                self.sim.stall("开场同步失败：等 ACK 超时（固件不会恢复）")
+            else:
+                if all(self.ack):
+                    self.wake(self._at(self.state_enter + cfg.post_ack_delay))
+                self.wake(self._at(self.sync_start + cfg.sync_retry))
+                self._wake_on_mail()
+
+        elif state == SENDING_SYNC_DATA:
+            if self.is_reharm:
+                self.chord_pair = reharm_progression(
+                    0, DEGREE_SEQUENCE[(self.current_index + 2) % len(DEGREE_SEQUENCE)])
+            else:
+                d1 = DEGREE_SEQUENCE[self.current_index]
+                d2 = DEGREE_SEQUENCE[(self.current_index + 1) % len(DEGREE_SEQUENCE)]
+                self.lines.append(f"{d1}, {d2}")
+                self.chord_pair = chord_from_degree(0, d1) + "," + chord_from_degree(0, d2) + "T"
+            self.chord_send = now
+            wire = (encode_pair(self.chord_pair) if cfg.chord_wire == "compact" else None) or self.chord_pair
+            end = self._burst(wire, local, cfg.burst_ms, cfg.burst_gap)
+            self.lines.append(f"Sent chord pair: {self.chord_pair}")
+            self.lines.append(f"Chord wire bytes: {len(wire)}")
+            self.state = WAITING_FOR_READY
+            self.wake(self._loop(end))
+
+        elif state == WAITING_FOR_READY:
+            for box in self.mailboxes:
+                msg = box.read(t)
+                for j in range(cfg.members):
+                    if msg == f"READY{j + 1}" and not self.ready[j]:
+                        self.ready[j] = True
+                        self.lines.append(f"SENDER: Marked READY from receiver {j + 1}")
+            # 开场之后 ready_received 不再清零，所以演奏阶段这里总是立刻通过
+            if all(self.ready):
+                self.chord_sync.append(now - self.chord_send)
+                self.lines.append(f"Chord Sync time: {now - self.chord_send}")
+                if not self.sync:
+                    self.lines.append("SENDER: All READY received, broadcasting start.")
+                    end = self._burst("start", local, cfg.start_burst_ms, cfg.start_burst_gap)
+                    self.lines.append("SENDER: Sent 'start' signal to all receivers.")
+                    self.sync = True
+                    self.state_enter = now
+                    self.system_sync = int(end) - self.sync_start
+                    self.lines.append(f"System Sync time: {self.system_sync}")
+                    self.state = BROADCAST_START
+                    self.wake(self._at(self.state_enter + cfg.start_delay))
+                else:
+                    self.state = WAIT_FOR_REHARM if self.is_reharm else PROMOTE_VOTE
+                    self.wake(self._at(self.chord_start + cfg.chord_duration))
+            else:
+                self._wake_on_mail()
+
+        elif state == BROADCAST_START:
+            if now - self.state_enter >= cfg.start_delay:
+                self.lines.append(">> SENDER: Initial start broadcast complete")
+                self.chord_start = now
+                self._play(t)
+                self.vote_start = now
+                self.vote_round += 1
+                self.state = VOTE
+                self.wake(self._loop(local))
+            else:
+                self.wake(self._at(self.state_enter + cfg.start_delay))
+
+        elif state in (PROMOTE_VOTE, WAIT_FOR_REHARM):
+            if now - self.chord_start < cfg.chord_duration:
+                self.wake(self._at(self.chord_start + cfg.chord_duration))
+                return
+            if len(self.plays) >= cfg.rounds:
+                self.sim.finish()
+                return
+            self.chord_start = now
+            self._play(t)
+            if state == PROMOTE_VOTE:
+                self.vote_start = now
+                self.vote_round += 1
+                self.state = VOTE
+            else:
+                self.lines.append(f"Start reharm at: {now}")
+                self.is_reharm = False
+                self.state = SENDING_SYNC_DATA
+            self.wake(self._loop(local))
+
+        elif state == VOTE:
+            if now - self.vote_start <= cfg.vote_window:
+                if now - self.vote_loop_timer >= cfg.vote_toggle:
+                    self.vote_loop_timer = now
+                    if self.toggle_send:
+                        self.transmit("start_vote", local + _write_ms("start_vote", cfg), self._loss())
+                    else:
+                        self._collect_votes(t)
+                    self.toggle_send = not self.toggle_send
+                if all(self.vote_received):
+                    if self.vote_result:
+                        self.total_pass += 1
+                        self.is_reharm = True
+                        self.lines.append("vote result: reharm")
+                        self.results.append("reharm")
+                    else:
+                        self.is_reharm = False
+                        self.lines.append("vote result: basic")
+                        self.results.append("basic")
+                    self._end_vote()
+                    self.wake(self._loop(local))
+                else:
+                    self.wake(self._at(min(self.vote_loop_timer + cfg.vote_toggle,
+                                           self.vote_start + cfg.vote_window + 1)))
+            else:
+                self.lines.append(f"pass rate: {self.total_pass / self.vote_round:.2f}")
+                self.is_reharm = False
+                self.current_index = (self.current_index + 2) % len(DEGREE_SEQUENCE)
+                self.lines.append("vote failed, send basic chord")
+                self.results.append("failed")
+                self.vote_received = [False] * cfg.members
+                self.vote_yes = [False] * cfg.members
+                self.state = SENDING_SYNC_DATA
+                self.wake(self._loop(local))
+
+    def _end_vote(self):
+        n = self.sim.cfg.members
+        self.current_index = (self.current_index + 2) % len(DEGREE_SEQUENCE)
+        self.vote_received = [False] * n
+        self.vote_yes = [False] * n
+        self.lines.append(f"pass rate: {self.total_pass / self.vote_round:.2f}")
+        self.state = SENDING_SYNC_DATA
+
+    def _collect_votes(self, t):
+        # collectVoteMessages：每个成员只记第一票，加上鼓手自己的 YES，过半数通过
+        n = self.sim.cfg.members
+        for box in self.mailboxes:
+            msg = box.read(t)
+            if msg and msg.startswith(("VOTE_YES", "VOTE_NO")) and len(msg) >= 8:
+                member = int(msg[-1]) if msg[-1].isdigit() else 0
+                if 1 <= member <= n and not self.vote_received[member - 1]:
+                    self.vote_received[member - 1] = True
+                    self.vote_yes[member - 1] = msg.startswith("VOTE_YES")
+        yes = sum(r and y for r, y in zip(self.vote_received, self.vote_yes)) + 1
+        self.vote_result = yes >= (n + 1) // 2 + 1
+
+
+class Receiver(Board):
+
+    def __init__(self, sim, member):
+        super().__init__(sim)
+        cfg = sim.cfg
+        self.member = member
+        loop = cfg.receiver_loop_ms + self.rng.uniform(-cfg.receiver_loop_spread, cfg.receiver_loop_spread)
+        self.period = cfg.check_interval + 1 + max(loop, 0.0)   # now - check_message_ts > CHECK_INTERVAL
+        self.phase = 2050 + self.rng.random()                   # setup() 里 delay(2000) + delay(50)
+        self.tick = -1                                          # 上一次轮询的序号
+        self.mailbox = Mailbox()                                # Sender 那一路
+        self.state = WAIT_PREPARE_SYNC
+        self.current = self.next = ""
+        self.target_start = self.play_start = self.vote_start = 0
+        self.expected = self.former_drift = 0
+        self.chord_round = 0
+        self.history = "nn"
+        self.has_voted = self.has_sync = False
+        self.drifts = []
+        self.play_times = []          # 每次 sendToM5 的真实时间
+        self.vote_failed = 0
+        self.lines.append("=== RECEIVER START ===")
+        self._wake_tick(0)
+
+    def _tick_at(self, local_ms):
+        # 第一个本地时间 >= local_ms 的轮询（至少是下一次）
+        k = max(self.tick + 1, math.ceil((local_ms - self.phase) / self.period))
+        if self.phase + k * self.period < local_ms:
+            k += 1
+        return k
+
+    def _wake_tick(self, k):
+        self.wake((self.phase + k * self.period) / self.rate)
+
+    def _wants(self, msg):
+        # 演奏阶段 WAIT_CHORD_SIGNAL 只认和弦对；其他消息早读晚读结果一样（读的时候只取最新一条），
+        # 不必为它们唤醒。VOTING_WINDOW 里读到什么都会清掉，所以都要唤醒
+        return not (self.has_sync and self.state == WAIT_CHORD_SIGNAL and "," not in msg)
+
+    def deliver(self, t, msg):
+        # listenForChordPair 先把紧凑和弦对换回文本（harmonyWireToText）；换回来的结果只取决于消息本身，
+        # 这里收到时就换，其余逻辑都按文本处理
+        msg = wire_to_text(msg)
+        self.mailbox.put(t, msg)
+        if self.state in LISTENING and self._wants(msg):
+            self._wake_tick(self._tick_at(t * self.rate))
+
+    def _loss(self):
+        cfg = self.sim.cfg
+        return cfg.ir_loss if self.has_sync else cfg.sync_loss
+
+    def step(self, t):
+        cfg = self.sim.cfg
+        self.tick = round((t * self.rate - self.phase) / self.period)
+        local = self.phase + self.tick * self.period
+        now = int(local)
+        state = self.state
+
+        if state == WAIT_PREPARE_SYNC:
+            msg = self.mailbox.read(t)
+            if msg == "prepare_sync":
+                self.lines.append("[Receiver] Got prepare_sync. Sending ACK.")
+                self.transmit(f"ACK{self.member}", local, self._loss())
+                self.state = WAIT_CHORD_SIGNAL
+        elif state == WAIT_CHORD_SIGNAL:
+            msg = self.mailbox.read(t)
+            if msg:
+                self._on_chord_signal(msg, local, now)
+        elif state == WAIT_PLAY_CHORD:
+            if ((not self.has_sync and now >= self.target_start)
+                    or (self.has_sync and now - self.play_start >= cfg.chord_duration)):
+                self._play(t, now)
+                self.has_sync = True
+                self.state = VOTING_WINDOW
+                self.vote_start = now
+        elif state == VOTING_WINDOW:
+            if now - self.vote_start <= cfg.vote_window:
+                # 读出来的不是 start_vote 也会被丢掉（例如提前到达的下一组和弦对）
+                msg = self.mailbox.read(t)
+                if msg == "start_vote" and not self.has_voted:
+                    self._vote(local)
+                    self.has_voted = True
+                    self.state = WAIT_CHORD_SIGNAL
+            else:
+                self.lines += ["vote failed", f"{self.current} & {self.next}"]
+                self.vote_failed += 1
+                self.state = WAIT_CHORD_SIGNAL
+        elif state == WAIT_FOR_REHARM:
+            if now - self.play_start >= cfg.chord_duration:
+                self._play(t, now)
+                self.state = WAIT_CHORD_SIGNAL
+
+        self._plan()
+
+    def _plan(self):
+        cfg = self.sim.cfg
+        state = self.state
+        if state in LISTENING:
+            first = next((t for t, msg in self.mailbox.pending if self._wants(msg)), None)
+            if first is not None:
+                self._wake_tick(self._tick_at(first * self.rate))
+        if state == VOTING_WINDOW:
+            self._wake_tick(self._tick_at(self.vote_start + cfg.vote_window + 1))
+        elif state == WAIT_PLAY_CHORD:
+            target = self.play_start + cfg.chord_duration if self.has_sync else self.target_start
+            self._wake_tick(self._tick_at(target))
+        elif state == WAIT_FOR_REHARM:
+            self._wake_tick(self._tick_at(self.play_start + cfg.chord_duration))
+
+    def _play(self, t, now):
+        # sendToM5 先打印发送时间，然后才是这一轮的 Drift
+        cfg = self.sim.cfg
+        self.lines += [f"🎵 Sent to M5 at: {now}", ""]
+        current = now - self.expected
+        drift = current - self.former_drift
+        self.former_drift = current
+        self.expected += cfg.chord_duration
+        self.lines.append(f"[Drift] Round {self.chord_round}: Drift = {_unsigned(drift)} ms")
+        self.drifts.append(drift)
+        self.play_times.append(t)
+        self.chord_round += 1
+        self.play_start = now
+        self.has_voted = False
+
+    def _vote(self, local):
+        cfg = self.sim.cfg
+        if cfg.policy == "markov":
+            prob = cfg.markov_after_reharm if self.history[0] == "y" else cfg.markov_after_basic
+        else:
+            prob = cfg.yes_percent
+        vote = f"{'VOTE_YES' if self.rng.randrange(100) < prob else 'VOTE_NO'}{self.member}"
+        self.transmit(vote, local, self._loss())
+        if cfg.policy == "markov":
+            self.lines.append(f"[Receiver] Sent vote (Markov): {vote} | History: {self.history}"
+                              f" | YES probability: {prob}%")
+        else:
+            self.lines.append(f"[Receiver] Sent vote: {vote}")
+
+    def _on_chord_signal(self, msg, local, now):
+        # listenForChordPair
+        cfg = self.sim.cfg
+        if not self.has_sync:
+            if msg == "start":
+                self.target_start = now + cfg.start_delay
+                self.expected = self.target_start
+                self.lines.append("[Receiver] Got start. Playing in 5s.")
+                self.state = WAIT_PLAY_CHORD
+            elif "," in msg:
+                chord1, chord2 = msg.split(",", 1)
+                self.current, self.next = chord1, chord2.strip()[:-1]
+                self.transmit(f"READY{self.member}", local, self._loss())
+                self.lines.append(f"[Receiver] Got first chord pair: {self.current} & {self.next}")
+            return
+        if msg.startswith(("ACK", "READY")) or msg in ("start", "prepare_sync"):
+            return
+        pair = f"{self.current},{self.next}"
+        if "," not in msg or msg == pair or msg == pair + "T":
+            return
+        chord1, chord2 = msg.split(",", 1)
+        chord2 = chord2.strip()
+        if chord2.endswith("T"):
+            self.history = (self.history + "n")[-2:]
+            self.current, self.next = chord1, chord2[:-1]
+            self.transmit(f"READY{self.member}", local, self._loss())
+            self.lines.append(f"[Receiver] Next basic chord pair: {self.current} & {self.next}")
+            self.state = WAIT_PLAY_CHORD
+        else:
+            self.history = (self.history + "y")[-2:]
+            self.current = chord1
+            if self.member in (1, 4):   # 钢琴和萨克斯做三全音替代
+                self.next = tritone(chord2)
+                if cfg.policy != "markov":
+                    self.lines.append("perform tritone substitution")
+            else:
+                self.next = chord2
+            self.transmit(f"READY{self.member}", local, self._loss())
+            self.lines.append(f"[Receiver] Playing reharm next: {self.current} & {self.next}")
+            self.state = WAIT_FOR_REHARM
+
+
+# ---------------- 事件循环 ----------------
+
+class Simulation:
+
+    def __init__(self, config):
+        self.cfg = config
+        self.rng = random.Random(config.seed)
+        self.heap = []
+        self.seq = itertools.count()
+        self.done = False
+        self.stalled = None
+        self.now = 0.0
+        self.sender = Sender(self)
+        self.receivers = [Receiver(self, i + 1) for i in range(config.members)]
+
+    def push(self, t, board):
+        heapq.heappush(self.heap, (t, next(self.seq), board.version, board))
+
+    def transmit(self, src, msg, t, loss):
+        # t 为真实时间；Sender 广播给所有接收器，接收器只发给 Sender（外加串扰）
+        cfg = self.cfg
+        rng = self.rng
+        t += len(msg) * cfg.ir_byte_ms
+        if src is self.sender:
+            for r in self.receivers:
+                if rng.random() >= loss:
+                    r.deliver(t + cfg.ir_latency_ms + rng.random() * cfg.ir_jitter_ms, msg)
+            return
+        if rng.random() >= loss:
+            self.sender.deliver(t + cfg.ir_latency_ms + rng.random() * cfg.ir_jitter_ms, src.member, msg)
+        if cfg.crosstalk:
+            for r in self.receivers:
+                if r is not src and rng.random() < cfg.crosstalk and rng.random() >= loss:
+                    r.deliver(t + cfg.ir_latency_ms + rng.random() * cfg.ir_jitter_ms, msg)
+
+    def finish(self):
+        self.done = True
+
+    def stall(self, reason):
+        self.stalled = reason
+        self.done = True
+
+    def run(self):
+        cfg = self.cfg
+        # 正常情况下每轮不超过 CHORD_DURATION + 投票窗口，超过这个时间就认为卡住了
+        limit = 60000 + cfg.rounds * (cfg.chord_duration + cfg.vote_window) * 2
+        heap = self.heap
+        while heap and not self.done:
+            t, _, version, board = heapq.heappop(heap)
+            if version != board.version:
+                continue
+            if t > limit:
+                break
+            board.wake_at = math.inf
+            self.now = t
+            board.step(t)
+        if not self.done:
+            self.stalled = f"卡在 Sender 的 {self.sender.state}"
+        return self
+
+
+def simulate(config=None, **overrides):
+    config = replace(config or SimConfig(), **overrides)
+    return Simulation(config).run()
+
+
+# ---------------- 结果 ----------------
+
+def summarize(sim):
+    cfg = sim.cfg
+    s = sim.sender
+    results = s.results
+    drifts = [d for r in sim.receivers for d in r.drifts]
+    outliers = 0
+    for r in sim.receivers:
+        detector = DriftOutlierDetector()
+        for d in r.drifts:
+            detector.add(d)
+        if r.drifts:
+            _, _, lower, upper = detector.bounds()
+            outliers += sum(not lower <= d <= upper for d in r.drifts)
+    # 接收器第 n 次演奏比 Sender 第 n 次演奏晚多少（真实时间，取最后一次）；
+    # 轮询周期带来的每轮几十 ms 会一直累积，超过一组和弦时接收器就整组落后了
+    lags = [r.play_times[-1] - s.plays[len(r.play_times) - 1]
+            for r in sim.receivers if 0 < len(r.play_times) <= len(s.plays)]
+    ordered = sorted(drifts)
+    return {
+        "completed": sim.stalled is None,
+        "stalled": sim.stalled,
+        "sim_seconds": sim.now / 1000,
+        "system_sync_ms": s.system_sync,
+        "plays": len(s.plays),
+        "votes": len(results),
+        "reharm": results.count("reharm"),
+        "basic": results.count("basic"),
+        "failed_votes": results.count("failed"),
+        "pass_rate": s.total_pass / s.vote_round if s.vote_round else None,
+        "failed_vote_rate": results.count("failed") / len(results) if results else None,
+        "chord_sync_mean_ms": sum(s.chord_sync[1:]) / len(s.chord_sync[1:]) if len(s.chord_sync) > 1 else None,
+        "receiver_rounds": len(drifts),
+        "drift_mean_ms": sum(drifts) / len(drifts) if drifts else None,
+        "drift_median_ms": ordered[len(ordered) // 2] if ordered else None,
+        "drift_max_ms": ordered[-1] if ordered else None,
+        "drift_outliers": outliers,
+        "missed_rounds": sum(d >= cfg.chord_duration / 2 for d in drifts),
+        "receiver_vote_failed": sum(r.vote_failed for r in sim.receivers),
+        "lag_final_ms": sum(lags) / len(lags) if lags else None,
+    }
+
+
+def write_logs(sim, out_dir):
+    # 与串口抓下来的日志一样用 CRLF
+    os.makedirs(out_dir, exist_ok=True)
+    boards = [("Sender.txt", sim.sender)] + [(f"Receiver{r.member}.txt", r) for r in sim.receivers]
+    paths = []
+    for name, board in boards:
+        path = os.path.join(out_dir, name)
+        with open(path, "w", encoding="utf-8", newline="\r\n") as f:
+            f.write("\n".join(board.lines) + "\n")
+        paths.append(path)
+    return paths
+
+
+def run_case(config):
+    # 在子进程里运行：只返回汇总数值
+    start = time.perf_counter()
+    sim = Simulation(config).run()
+    row = summarize(sim)
+    row["wall_seconds"] = time.perf_counter() - start
+    return row
+
+
+# ---------------- 命令行 ----------------
+
+FIELD_TYPES = {f.name: f.type for f in fields(SimConfig)}
+
+
+def parse_value(key, text):
+    if key not in FIELD_TYPES:
+        raise ValueError(f"未知参数: {key}（可选: {', '.join(FIELD_TYPES)}）")
+    return FIELD_TYPES[key](text)
+
+
+def parse_assignments(items):
+    # ["ir_loss=0.02", "policy=markov"] -> {"ir_loss": 0.02, "policy": "markov"}
+    values = {}
+    for item in items:
+        key, sep, text = item.partition("=")
+        if not sep:
+            raise ValueError(f"参数格式应为 KEY=VALUE: {item}")
+        values[key.strip()] = parse_value(key.strip(), text.strip())
+    return values
+
+
+def parse_sweep(items):
+    # ["check_interval=20,50", "ir_loss=0,0.02"] -> {"check_interval": [20, 50], "ir_loss": [0.0, 0.02]}
+    grid = {}
+    for item in items:
+        key, sep, text = item.partition("=")
+        if not sep:
+            raise ValueError(f"扫描参数格式应为 KEY=V1,V2,...: {item}")
+        grid[key.strip()] = [parse_value(key.strip(), v.strip()) for v in text.split(",") if v.strip()]
+    return grid
+
+
+def sweep(base, grid, seeds=1, workers=None):
+    # 参数网格 × 随机种子，在进程池里并行；返回 (每次运行, 按参数组合平均) 两张表
+    import pandas as pd
+
+    keys = list(grid)
+    configs = []
+    for combo in itertools.product(*(grid[k] for k in keys)):
+        for seed in range(base.seed, base.seed + seeds):
+            configs.append(replace(base, seed=seed, **dict(zip(keys, combo))))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        rows = list(pool.map(run_case, configs, chunksize=max(1, len(configs) // 64)))
+    for config, row in zip(configs, rows):
+        row.update({k: getattr(config, k) for k in keys})
+        row["seed"] = config.seed
+    runs = pd.DataFrame(rows)
+    metrics = [c for c in runs.columns if c not in keys and c not in ("seed", "stalled")]
+    runs["completed"] = runs["completed"].astype(float)
+    summary = runs.groupby(keys, sort=False)[metrics].mean().reset_index() if keys else runs[metrics].mean().to_frame().T
+    summary.insert(len(keys), "runs", seeds)
+    return runs[keys + ["seed"] + [c for c in runs.columns if c not in keys and c != "seed"]], summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sender / Receiver 同步协议的离散事件模拟")
+    parser.add_argument("--rounds", type=int, help="Sender 播放的和弦组数（默认 100）")
+    parser.add_argument("--seed", type=int, help="随机种子")
+    parser.add_argument("--policy", choices=["default", "markov"], help="接收器投票方式")
+    parser.add_argument("--set", nargs="+", default=[], metavar="KEY=VALUE",
+                        help="修改模型参数，例如 ir_loss=0.02 check_interval=30")
+    parser.add_argument("--sweep", action="append", default=[], metavar="KEY=V1,V2,...",
+                        help="参数扫描（可重复，取笛卡尔积），在进程池里并行运行")
+    parser.add_argument("--seeds", type=int, default=1, help="扫描时每组参数跑多少个随机种子")
+    parser.add_argument("--jobs", type=int, default=None, help="并行进程数（默认 CPU 核数）")
+    parser.add_argument("--sort", default="drift_mean_ms", help="扫描结果按哪一列从小到大排序")
+    parser.add_argument("--out", default=None,
+                        help="输出目录（单次运行默认 result/simulated，扫描默认 result）")
+    args = parser.parse_args(argv)
+
+    try:
+        overrides = parse_assignments(args.set)
+        grid = parse_sweep(args.sweep)
+    except ValueError as e:
+        parser.error(str(e))
+    for key in ("rounds", "seed", "policy"):
+        if getattr(args, key) is not None:
+            overrides[key] = getattr(args, key)
+    base = replace(SimConfig(), **overrides)
+
+    if grid:
+        start = time.perf_counter()
+        runs, summary = sweep(base, grid, args.seeds, args.jobs)
+        elapsed = time.perf_counter() - start
+        if args.sort not in summary.columns:
+            parser.error(f"没有这一列: {args.sort}")
+        summary = summary.sort_values(args.sort)
+        out = args.out or "result"
+        os.makedirs(out, exist_ok=True)
+        runs.to_csv(os.path.join(out, "simulate_sweep_runs.csv"), index=False)
+        summary.to_csv(os.path.join(out, "simulate_sweep.csv"), index=False)
+        shown = list(grid) + ["completed", "pass_rate", "failed_vote_rate", "drift_mean_ms",
+                              "missed_rounds", "lag_final_ms", "system_sync_ms"]
+        import pandas as pd
+        with pd.option_context("display.max_columns", None, "display.width", 200):
+            print(summary[[c for c in shown if c in summary.columns]].head(10).to_string(index=False))
+        total = int(runs["plays"].sum())
+        print(f"✅ {len(runs)} 次模拟（{summary.shape[0]} 组参数），共 {total} 轮，用时 {elapsed:.1f} s"
+              f"（{total / elapsed:.0f} 轮/秒），结果保存到 {out}/simulate_sweep.csv")
+        return
+
+    start = time.perf_counter()
+    sim = Simulation(base).run()
+    elapsed = time.perf_counter() - start
+    row = summarize(sim)
+    paths = write_logs(sim, args.out or os.path.join("result", "simulated"))
+    for key, value in row.items():
+        print(f"{key:>22}: {value:.3f}" if isinstance(value, float) else f"{key:>22}: {value}")
+    print(f"⏱️  模拟 {row['plays']} 轮（{row['sim_seconds'] / 60:.1f} 分钟演奏）用时 {elapsed:.2f} s"
+          f"（{row['plays'] / elapsed:.0f} 轮/秒）")
+    print(f"✅ 日志已保存: {', '.join(paths)}")
+    if sim.stalled:
+        print(f"⚠️  {sim.stalled}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
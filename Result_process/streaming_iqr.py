@@ -0,0 +1,222 @@
+import math
+from bisect import bisect_left, insort
+from collections import deque
+
+# 在线 IQR 异常值检测：每来一轮 [Drift] 就更新 Q1/Q3 并判断这一轮是否异常，不需要保存整个数据集。
+#
+#   detector = DriftOutlierDetector()            # 或 DriftOutlierDetector(window=50) 只看最近 50 轮
+#   for drift in drifts:
+#       is_outlier = detector.update(drift)
+#   detector.bounds()                            # (Q1, Q3, 下界, 上界)
+#
+# 两种分位数估计：
+#   "exact"  drift 是整数毫秒，按取值计数（直方图）即可得到精确分位数，
+#            与 pandas quantile（线性插值）的结果完全一致；±RANGE_MS 以内的计数放在固定大小的 Fenwick 树里，
+#            每轮 O(log 范围)，支持滑动窗口
+#   "p2"     P² 算法 (Jain & Chlamtac 1985)，每个分位数 5 个标记点，内存固定，结果是近似值，不支持窗口
+
+# 直方图覆盖的 drift 范围（毫秒）：一组和弦的长度 (CHORD_DURATION) 以内
+RANGE_MS = 8000
+
+
+class HistogramQuantiles:
+    # 按整数毫秒计数的 Fenwick 树（树状数组），覆盖 [lo, hi]；第 k 小的值 O(log 范围) 找到，
+    # 加入 / 移除也是 O(log 范围)，内存固定。范围外的值（大的 drift 离群值等）放在两头的有序列表里，
+    # 结果仍然精确；这两个列表只在离群值本身很多时才会变长，滑动窗口下不超过窗口大小
+
+    def __init__(self, lo=-RANGE_MS, hi=RANGE_MS):
+        self.lo = lo
+        self.size = hi - lo + 1
+        self.tree = [0] * (self.size + 1)
+        self.top = 1 << (self.size.bit_length() - 1)
+        self.inside = 0
+        self.below = []
+        self.above = []
+        self.n = 0
+
+    def _slot(self, x):
+        # 树里的位置（从 1 开始），范围外返回 None
+        i = int(x) - self.lo
+        if i != x - self.lo:
+            raise ValueError(f"精确方法只接受整数毫秒: {x}")
+        return i + 1 if 0 <= i < self.size else None
+
+    def _bump(self, i, delta):
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def add(self, x):
+        i = self._slot(x)
+        if i is None:
+            insort(self.below if x < self.lo else self.above, x)
+        else:
+            self._bump(i, 1)
+            self.inside += 1
+        self.n += 1
+
+    def remove(self, x):
+        i = self._slot(x)
+        if i is None:
+            side = self.below if x < self.lo else self.above
+            del side[bisect_left(side, x)]
+        else:
+            self._bump(i, -1)
+            self.inside -= 1
+        self.n -= 1
+
+    def _kth(self, k):
+        # 第 k 小的值（从 0 开始）
+        if k < len(self.below):
+            return self.below[k]
+        k -= len(self.below)
+        if k >= self.inside:
+            return self.above[k - self.inside]
+        # 在树上从高位往低位走：找前缀和不超过 k 的最远位置，下一个位置就是答案
+        pos = 0
+        step = self.top
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] <= k:
+                pos = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return pos + self.lo
+
+    def quantile(self, q):
+        # 与 pandas / numpy 默认的 linear 插值一致
+        if not self.n:
+            return math.nan
+        pos = (self.n - 1) * q
+        lo = math.floor(pos)
+        low = self._kth(lo)
+        if pos == lo:
+            return float(low)
+        high = self._kth(lo + 1)
+        return low + (high - low) * (pos - lo)
+
+
+class P2Quantile:
+    # 单个分位数的 P² 估计
+
+    def __init__(self, q):
+        self.q = q
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * q, 1 + 4 * q, 3 + 2 * q, 5]
+        self.increments = [0, q / 2, q, (1 + q) / 2, 1]
+        self.n = 0
+
+    def add(self, x):
+        self.n += 1
+        h = self.heights
+        if len(h) < 5:
+            insort(h, x)
+            return
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = next(i for i in range(4) if h[i] <= x < h[i + 1])
+        for i in range(k + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        n = self.positions
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                # 抛物线插值，越界时退回线性插值
+                candidate = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+                if not h[i - 1] < candidate < h[i + 1]:
+                    candidate = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = candidate
+                n[i] += d
+
+    def value(self):
+        if not self.heights:
+            return math.nan
+        if self.n <= 5:
+            # 前 5 个点直接按精确的线性插值
+            h = self.heights
+            pos = (len(h) - 1) * self.q
+            lo = math.floor(pos)
+            return h[lo] if pos == lo else h[lo] + (h[lo + 1] - h[lo]) * (pos - lo)
+        return self.heights[2]
+
+
+class DriftOutlierDetector:
+
+    def __init__(self, window=None, method="exact", k=1.5, warmup=4, alert_window=8, alert_rate=0.5):
+        # window: 只用最近 window 轮计算四分位数（None 为全部）
+        # warmup: 少于这么多轮时不判定异常
+        # alert_window / alert_rate: 最近 alert_window 轮里异常比例超过 alert_rate 时 alert 为 True
+        if method not in ("exact", "p2"):
+            raise ValueError(f"未知的方法: {method}")
+        if method == "p2" and window is not None:
+            raise ValueError("P² 不支持滑动窗口，请用 method='exact'")
+        self.method = method
+        self.k = k
+        self.warmup = warmup
+        self.window = deque(maxlen=window) if window else None
+        if method == "exact":
+            self.hist = HistogramQuantiles()
+        else:
+            self.q1 = P2Quantile(0.25)
+            self.q3 = P2Quantile(0.75)
+        self.recent = deque(maxlen=alert_window)
+        self.alert_rate = alert_rate
+        self.n = 0
+        self.outliers = 0
+        self._bounds = None
+
+    def add(self, x):
+        # 只更新分位数，不做判定
+        self.n += 1
+        self._bounds = None
+        if self.method == "p2":
+            self.q1.add(x)
+            self.q3.add(x)
+            return
+        if self.window is not None and len(self.window) == self.window.maxlen:
+            self.hist.remove(self.window[0])
+        if self.window is not None:
+            self.window.append(x)
+        self.hist.add(x)
+
+    def bounds(self):
+        # (Q1, Q3, Q1 - k×IQR, Q3 + k×IQR)
+        if self._bounds is None:
+            if self.method == "p2":
+                q1, q3 = self.q1.value(), self.q3.value()
+            else:
+                q1, q3 = self.hist.quantile(0.25), self.hist.quantile(0.75)
+            iqr = q3 - q1
+            self._bounds = (q1, q3, q1 - self.k * iqr, q3 + self.k * iqr)
+        return self._bounds
+
+    def classify(self, x):
+        if self.n < self.warmup:
+            return False
+        _, _, lower, upper = self.bounds()
+        return x < lower or x > upper
+
+    def update(self, x):
+        # 先把这一轮加进统计（与整批计算时一样，判定用的分位数包含这一轮本身），再判定
+        self.add(x)
+        is_outlier = self.classify(x)
+        self.outliers += is_outlier
+        self.recent.append(is_outlier)
+        return is_outlier
+
+    @property
+    def alert(self):
+        # 最近一段时间异常值密集
+        return len(self.recent) == self.recent.maxlen and sum(self.recent) / len(self.recent) > self.alert_rate
@@ -0,0 +1,470 @@
+import argparse
+import json
+import os
+import re
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+from log_parser import LogParser, ReceiverRound, iter_records
+
+# 接收器二进制遥测（band_members/receivers_*/telemetry.h，TELEMETRY_BINARY 1）的解码器。
+# 每个事件是一个 20 字节的定长帧，解码后产出和 log_parser 解析文本日志完全相同的 ReceiverRound，
+# 所以 load_log / parse_log 遇到二进制日志会自动转到这里，其他分析脚本不用改。
+#
+#   python telemetry.py capture.bin                          # 解码，打印每一轮（--csv 导出）
+#   python telemetry.py --encode database/receiver_drift.txt --out result/receiver_drift.bin
+#   python telemetry.py --bench                              # 文本 / 二进制日志的串口耗时和解码速度对比
+#   python telemetry.py --bench --capture text.txt --capture binary.bin   # 加上板子上 TELEMETRY_BENCH 的实测
+#
+# 帧格式（小端）：magic 0xA5, type, round(u16), ms(u32), value(i32), chord1(u16), chord2(u16),
+# flags, member, reserved, check（前 19 字节的异或）。和弦的 4 个音各占 4 位，例如 7_11_2_5 -> 0x7B25。
+# 串口上不是帧的字节（开机的 "=== RECEIVER START ==="、噪声）按 magic + 校验重新同步后跳过。
+
+FRAME = struct.Struct("<BBHIiHHBBBB")
+MAGIC = 0xA5
+
+PLAY, VOTE, NEXT, VOTE_FAILED, PREPARE, FIRST_PAIR, START, TRITONE, BENCH = range(1, 10)
+TYPE_NAMES = {PLAY: "play", VOTE: "vote", NEXT: "next", VOTE_FAILED: "vote_failed", PREPARE: "prepare",
+              FIRST_PAIR: "first_pair", START: "start", TRITONE: "tritone", BENCH: "bench"}
+
+# VOTE
+F_YES, F_MARKOV, F_HISTORY, F_HIST0_Y, F_HIST1_Y, F_PROB = 0x01, 0x02, 0x04, 0x08, 0x10, 0x20
+# NEXT
+F_REHARM = 0x01
+# PLAY：只有从文本日志转换时才会出现（固件总是同时打印两者）
+F_NO_TIME = 0x40       # Drift 行之前没有 Sent to M5（日志从中途开始录）
+F_SENT_ONLY = 0x80     # 只有 Sent to M5（日志在下一个 Drift 行之前结束）
+
+NO_CHORD = 0xFFFF
+VOTE_MSG_RE = re.compile(r"VOTE_(YES|NO)(\d+)$")
+
+
+@dataclass
+class Frame:
+    type: int
+    round: int = 0
+    ms: int = 0
+    value: int = 0
+    chord1: int = NO_CHORD
+    chord2: int = NO_CHORD
+    flags: int = 0
+    member: int = 0
+
+
+# ---------------- 编码 ----------------
+
+def pack_chord(chord):
+    # "7_11_2_5" -> 0x7B25；不是 4 个 0-11 的音时返回 None
+    notes = chord.split("_") if chord else []
+    if len(notes) != 4 or not all(n.isdigit() and int(n) < 12 for n in notes):
+        return None
+    packed = 0
+    for n in notes:
+        packed = packed << 4 | int(n)
+    return packed
+
+
+@lru_cache(maxsize=None)
+def unpack_chord(packed):
+    if packed == NO_CHORD:
+        return None
+    return "_".join(str(packed >> shift & 0xF) for shift in (12, 8, 4, 0))
+
+
+def encode_frame(frame):
+    data = bytearray(FRAME.pack(MAGIC, frame.type, frame.round & 0xFFFF, frame.ms & 0xFFFFFFFF, frame.value,
+                                frame.chord1, frame.chord2, frame.flags, frame.member, 0, 0))
+    data[-1] = _xor(data, 0, len(data))
+    return bytes(data)
+
+
+def round_frames(rnd, last=False):
+    # 一条 ReceiverRound -> 固件在这一轮会发出的帧；返回 (帧列表, 无法表示的字段)
+    lost = []
+    frames = [Frame(PLAY, rnd.round, rnd.play_ms or 0, rnd.drift_ms,
+                    flags=F_NO_TIME if rnd.play_ms is None else 0)]
+    if rnd.vote:
+        m = VOTE_MSG_RE.match(rnd.vote)
+        if m and int(m.group(2)) < 256:
+            flags = F_YES if m.group(1) == "YES" else 0
+            value = 0
+            if rnd.policy == "markov":
+                flags |= F_MARKOV
+            if rnd.history is not None:
+                if len(rnd.history) == 2 and set(rnd.history) <= {"y", "n"}:
+                    flags |= F_HISTORY
+                    flags |= F_HIST0_Y if rnd.history[0] == "y" else 0
+                    flags |= F_HIST1_Y if rnd.history[1] == "y" else 0
+                else:
+                    lost.append("history")
+            if rnd.yes_probability is not None:
+                flags |= F_PROB
+                value = round(rnd.yes_probability * 100)
+            frames.append(Frame(VOTE, rnd.round, value=value, flags=flags, member=int(m.group(2))))
+        else:
+            lost.append("vote")
+    if rnd.failed:
+        frames.append(Frame(VOTE_FAILED, rnd.round))
+    if rnd.next:
+        chords = rnd.chord_pair.split(" & ") if rnd.chord_pair else []
+        packed = [pack_chord(c) for c in chords]
+        if len(packed) != 2 or None in packed:
+            lost.append("chord_pair")
+            packed = [NO_CHORD, NO_CHORD]
+        frames.append(Frame(NEXT, rnd.round, chord1=packed[0], chord2=packed[1],
+                            flags=F_REHARM if rnd.next == "reharm" else 0))
+    if last and rnd.sent_time is not None:
+        frames.append(Frame(PLAY, rnd.round + 1, rnd.sent_time, flags=F_SENT_ONLY))
+    return frames, lost
+
+
+def encode_records(records):
+    # 文本日志解析出的记录 -> 二进制流；返回 (bytes, [(轮次, 无法表示的字段)])
+    rounds = [r for r in records if isinstance(r, ReceiverRound)]
+    out = bytearray()
+    lossy = []
+    for i, rnd in enumerate(rounds):
+        frames, lost = round_frames(rnd, last=i == len(rounds) - 1)
+        out += b"".join(encode_frame(f) for f in frames)
+        if lost:
+            lossy.append((rnd.round, lost))
+    return bytes(out), lossy
+
+
+# ---------------- 解码 ----------------
+
+def _xor(buf, start, size):
+    # 所有字节的异或：把整帧当成一个大整数对半折叠，比逐字节循环快得多
+    x = int.from_bytes(buf[start:start + size], "little")
+    for shift in (128, 64, 32, 16, 8):
+        x ^= x >> shift
+    return x & 0xFF
+
+
+class FrameReader:
+    # 增量读取：feed(字节) 返回其中完整、校验正确的帧；不成帧的字节记在 skipped 里
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.skipped = 0
+        self.frames = 0
+
+    def feed(self, data):
+        buf = self.buf
+        buf += data
+        frames = []
+        start = 0
+        size = FRAME.size
+        while True:
+            i = buf.find(MAGIC, start)
+            if i < 0:
+                self.skipped += len(buf) - start
+                start = len(buf)
+                break
+            self.skipped += i - start
+            if len(buf) - i < size:
+                start = i
+                break
+            fields = FRAME.unpack_from(buf, i)
+            if _xor(buf, i, size) or fields[1] not in TYPE_NAMES:
+                # 不是帧头：跳过这个字节继续找
+                self.skipped += 1
+                start = i + 1
+                continue
+            frames.append(Frame(*fields[1:9]))
+            start = i + size
+        del buf[:start]
+        self.frames += len(frames)
+        return frames
+
+
+class TelemetryDecoder:
+    # 和 log_parser.LogParser 一样的接口和语义：feed(字节) 返回这批数据让其完成的记录，close() 返回最后一条
+
+    def __init__(self):
+        self.reader = FrameReader()
+        self.round = None
+        self.last_sent = None
+        self.bench = []            # TELEMETRY_BENCH 的 (轮次, 总耗时 us, 调用次数, 单次最大 us)
+
+    def feed(self, data):
+        records = []
+        for frame in self.reader.feed(data):
+            records.extend(self._frame(frame))
+        return records
+
+    def close(self):
+        records = [self.round] if self.round is not None else []
+        self.round = None
+        return records
+
+    def _frame(self, f):
+        rnd = self.round
+        if f.type == PLAY:
+            # 对应文本里的 "🎵 Sent to M5 at" + 紧接着的 "[Drift] Round" 两行
+            if not f.flags & F_NO_TIME:
+                self.last_sent = f.ms
+                if rnd is not None:
+                    rnd.sent_time = f.ms
+                    yield rnd
+                    self.round = None
+            if f.flags & F_SENT_ONLY:
+                return
+            if self.round is not None:
+                yield self.round
+            self.round = ReceiverRound(round=f.round, drift_ms=f.value, play_ms=self.last_sent)
+            self.last_sent = None
+        elif f.type == BENCH:
+            self.bench.append((f.round, f.value, f.chord1, f.ms))
+        elif rnd is None:
+            return
+        elif f.type == VOTE:
+            rnd.vote = ("VOTE_YES" if f.flags & F_YES else "VOTE_NO") + str(f.member)
+            rnd.policy = "markov" if f.flags & F_MARKOV else "default"
+            if f.flags & F_HISTORY:
+                rnd.history = ("y" if f.flags & F_HIST0_Y else "n") + ("y" if f.flags & F_HIST1_Y else "n")
+            if f.flags & F_PROB:
+                rnd.yes_probability = f.value / 100
+        elif f.type == NEXT:
+            rnd.next = "reharm" if f.flags & F_REHARM else "basic"
+            chords = [unpack_chord(f.chord1), unpack_chord(f.chord2)]
+            rnd.chord_pair = None if None in chords else " & ".join(chords)
+        elif f.type == VOTE_FAILED:
+            rnd.failed = True
+
+
+def _read_chunks(path, size=1 << 16):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_telemetry_records(source):
+    # source: 文件路径或任意产出 bytes 的可迭代对象（例如串口读到的数据块）
+    chunks = _read_chunks(source) if isinstance(source, (str, os.PathLike)) else source
+    decoder = TelemetryDecoder()
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    yield from decoder.close()
+
+
+def is_telemetry(path, sniff=4096):
+    # 开头一段里能解出至少两个帧（或整个短文件都是帧）就当作二进制日志
+    with open(path, "rb") as f:
+        head = f.read(sniff)
+    if MAGIC not in head:
+        return False
+    reader = FrameReader()
+    reader.feed(head)
+    return reader.frames >= 2 or (reader.frames == 1 and len(head) < sniff)
+
+
+# ---------------- 对比：文本日志 vs 二进制帧 ----------------
+
+def text_bursts(rnd, tritone=False):
+    # 固件在一轮里连续打印的几段文本（每段在同一次 loop 里写完）：(段名, 字节数)
+    # play 段就在 WAIT_PLAY_CHORD / WAIT_FOR_REHARM 分支里，是测量 drift 的那段代码
+    crlf = "\r\n"
+    bursts = [("play", f"🎵 Sent to M5 at: {rnd.play_ms or 0}{crlf}{crlf}"
+                       f"[Drift] Round {rnd.round}: Drift = {rnd.drift_ms % 2 ** 32} ms{crlf}")]
+    if rnd.vote:
+        if rnd.policy == "markov":
+            line = (f"[Receiver] Sent vote (Markov): {rnd.vote} | History: {rnd.history} | "
+                    f"YES probability: {round((rnd.yes_probability or 0) * 100)}%")
+        else:
+            line = f"[Receiver] Sent vote: {rnd.vote}"
+        bursts.append(("vote", line + crlf))
+    if rnd.failed:
+        bursts.append(("vote_failed", f"vote failed{crlf}{rnd.chord_pair or ''}{crlf}"))
+    if rnd.next:
+        text = ""
+        if rnd.next == "reharm" and tritone:
+            text += "perform tritone substitution" + crlf
+        head = "Playing reharm next" if rnd.next == "reharm" else "Next basic chord pair"
+        bursts.append(("next", text + f"[Receiver] {head}: {rnd.chord_pair}{crlf}"))
+    return [(name, len(text.encode("utf-8"))) for name, text in bursts]
+
+
+def binary_bursts(rnd, tritone=False):
+    frames, _ = round_frames(rnd)
+    names = {PLAY: "play", VOTE: "vote", VOTE_FAILED: "vote_failed", NEXT: "next"}
+    bursts = [(names[f.type], FRAME.size) for f in frames]
+    if rnd.next == "reharm" and tritone:
+        bursts = [(name, size + FRAME.size if name == "next" else size) for name, size in bursts]
+    return bursts
+
+
+def wire_cost(bursts, baud, tx_buffer):
+    # 每段：线上时间，以及超出 TX 缓冲区、print 必须等串口发送的时间（两段之间隔了几十 ms 以上，缓冲区已清空）
+    byte_ms = 10 / baud * 1000          # 8N1：每字节 10 位
+    out = {}
+    for name, size in bursts:
+        entry = out.setdefault(name, {"bytes": 0, "wire_ms": 0.0, "blocked_ms": 0.0, "count": 0})
+        entry["bytes"] += size
+        entry["wire_ms"] += size * byte_ms
+        entry["blocked_ms"] += max(0, size - tx_buffer) * byte_ms
+        entry["count"] += 1
+    return out
+
+
+def _time(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_log(path, baud=115200, tx_buffer=64, copies=200, repeat=3):
+    rounds = [r for r in iter_records(path) if isinstance(r, ReceiverRound)]
+    with open(path, "rb") as f:
+        text = f.read().decode("utf-8", errors="replace")
+    tritone = "perform tritone substitution" in text
+    result = {"log": path, "rounds": len(rounds), "baud": baud, "tx_buffer": tx_buffer}
+    for fmt, bursts_of in (("text", text_bursts), ("binary", binary_bursts)):
+        bursts = [b for r in rounds for b in bursts_of(r, tritone)]
+        cost = wire_cost(bursts, baud, tx_buffer)
+        result[fmt] = {
+            "bytes_per_round": sum(c["bytes"] for c in cost.values()) / len(rounds),
+            "wire_ms_per_round": sum(c["wire_ms"] for c in cost.values()) / len(rounds),
+            "play_bytes": cost["play"]["bytes"] / cost["play"]["count"],
+            "play_wire_ms": cost["play"]["wire_ms"] / cost["play"]["count"],
+            "play_blocked_ms": cost["play"]["blocked_ms"] / cost["play"]["count"],
+            "blocked_ms_per_round": sum(c["blocked_ms"] for c in cost.values()) / len(rounds),
+        }
+
+    # 主机端解码速度：同一批记录的文本和二进制各复制 copies 份
+    binary, _ = encode_records(rounds)
+    text_lines = text.splitlines() * copies
+    binary_blob = binary * copies
+
+    def parse_text():
+        parser = LogParser()
+        for line in text_lines:
+            parser.feed(line)
+
+    def parse_binary():
+        decoder = TelemetryDecoder()
+        for i in range(0, len(binary_blob), 1 << 16):
+            decoder.feed(binary_blob[i:i + (1 << 16)])
+
+    n = len(rounds) * copies
+    for fmt, func in (("text", parse_text), ("binary", parse_binary)):
+        seconds = _time(func, repeat)
+        result[fmt]["decode_rounds_per_s"] = n / seconds
+    return result
+
+
+BENCH_LINE_RE = re.compile(r"\[Bench\] log path: (\d+) us in (\d+) calls, max (\d+) us")
+
+
+def measured_bench(path):
+    # 板子上 TELEMETRY_BENCH 的实测：文本日志里的 "[Bench]" 行或二进制的 BENCH 帧
+    if is_telemetry(path):
+        decoder = TelemetryDecoder()
+        for chunk in _read_chunks(path):
+            decoder.feed(chunk)
+        reports = [(us, calls, max_us) for _, us, calls, max_us in decoder.bench]
+        fmt = "binary"
+    else:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            reports = [tuple(map(int, m.groups())) for m in map(BENCH_LINE_RE.search, f) if m]
+        fmt = "text"
+    if not reports:
+        return None
+    us = sum(r[0] for r in reports)
+    calls = sum(r[1] for r in reports)
+    return {"capture": path, "format": fmt, "reports": len(reports),
+            "us_per_call": us / calls if calls else None, "max_us": max(r[2] for r in reports)}
+
+
+# ---------------- 命令行 ----------------
+
+def _print_bench(result):
+    t, b = result["text"], result["binary"]
+    print(f"📄 {result['log']}（{result['rounds']} 轮，{result['baud']} 波特，TX 缓冲 {result['tx_buffer']} 字节）")
+    print(f"   {'':<26}{'文本':>12}{'二进制':>12}")
+    rows = [("每轮字节", "bytes_per_round", "{:.0f}"),
+            ("每轮线上时间 (ms)", "wire_ms_per_round", "{:.2f}"),
+            ("起奏那段字节", "play_bytes", "{:.0f}"),
+            ("起奏那段线上时间 (ms)", "play_wire_ms", "{:.2f}"),
+            ("起奏那段阻塞 (ms)", "play_blocked_ms", "{:.2f}"),
+            ("每轮阻塞合计 (ms)", "blocked_ms_per_round", "{:.2f}"),
+            ("主机解码 (轮/秒)", "decode_rounds_per_s", "{:,.0f}")]
+    for label, key, fmt in rows:
+        print(f"   {label:<24}{fmt.format(t[key]):>12}{fmt.format(b[key]):>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="接收器二进制遥测帧的解码、转换和对比")
+    parser.add_argument("logs", nargs="*", help="要解码的二进制日志")
+    parser.add_argument("--csv", action="store_true", help="解码结果写成和文本日志相同列的 CSV（与输入同名）")
+    parser.add_argument("--encode", metavar="TEXT_LOG", help="把文本日志转换成二进制帧（写到 --out）")
+    parser.add_argument("--out", default=None, help="--encode 的输出文件 / --bench 的 JSON 结果")
+    parser.add_argument("--bench", action="store_true", help="对比文本和二进制日志的串口耗时和解码速度")
+    parser.add_argument("--bench-log", action="append", default=None, metavar="TEXT_LOG",
+                        help="--bench 用的文本日志（默认 database 里的两个接收器日志）")
+    parser.add_argument("--capture", action="append", default=[], metavar="PATH",
+                        help="开了 TELEMETRY_BENCH 的板子的串口记录（文本或二进制）")
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--tx-buffer", type=int, default=64, help="Serial TX 缓冲区字节数（AVR 为 64）")
+    args = parser.parse_args(argv)
+
+    if args.encode:
+        out = args.out or os.path.splitext(args.encode)[0] + ".bin"
+        data, lossy = encode_records(iter_records(args.encode))
+        for rnd, lost in lossy:
+            print(f"⚠️  第 {rnd} 轮无法用帧表示: {', '.join(lost)}")
+        with open(out, "wb") as f:
+            f.write(data)
+        print(f"✅ {len(data) // FRAME.size} 帧（{len(data)} 字节，原文本 {os.path.getsize(args.encode)} 字节）已保存到 {out}")
+
+    for path in args.logs:
+        decoder = TelemetryDecoder()
+        records = []
+        for chunk in _read_chunks(path):
+            records += decoder.feed(chunk)
+        records += decoder.close()
+        print(f"📦 {path}: {decoder.reader.frames} 帧，{len(records)} 轮，跳过 {decoder.reader.skipped} 个非帧字节")
+        if args.csv:
+            from log_parser import Table
+            table = Table(ReceiverRound)
+            for rnd in records:
+                table.append(rnd)
+            out = os.path.splitext(path)[0] + ".csv"
+            table.to_frame().to_csv(out, index=False)
+            print(f"✅ 已保存到 {out}")
+        else:
+            for rnd in records:
+                print(f"   {rnd}")
+
+    if args.bench:
+        results = [bench_log(p, args.baud, args.tx_buffer)
+                   for p in (args.bench_log or ["database/receiver_drift.txt", "database/Receiver_Markov.txt"])]
+        for result in results:
+            _print_bench(result)
+        measured = [m for m in map(measured_bench, args.capture) if m]
+        for m in measured:
+            print(f"⏱️  {m['capture']}（{m['format']}）: 每次日志调用 {m['us_per_call']:.0f} us，最长 {m['max_us']} us")
+        for path in args.capture:
+            if path not in {m["capture"] for m in measured}:
+                print(f"⚠️  {path} 里没有 TELEMETRY_BENCH 的报告")
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump({"logs": results, "measured": measured}, f, indent=2, ensure_ascii=False)
+            print(f"✅ 结果已保存到 {args.out}")
+
+    if not (args.encode or args.logs or args.bench):
+        parser.print_help()
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+import argparse
+import heapq
+import os
+import sys
+import warnings
+
+import numpy as np
+
+from log_parser import SenderSync, SystemSync, iter_records, load_log
+
+# 多块板子的时间线融合：Sender 日志 + N 个接收器日志 -> 同一时钟下、按轮对齐的演奏时刻表，
+# 以及每一轮各成员真正的起奏时间差（onset spread）。
+#
+#   python timeline.py                                              # database/Sender.txt + receiver_drift.txt
+#   python timeline.py --sender database/Sender_Markov.txt --receiver r2=database/Receiver_Markov.txt
+#   python timeline.py --sender result/simulated/Sender.txt --receiver r1=result/simulated/Receiver1.txt \
+#                      --receiver r2=result/simulated/Receiver2.txt ...
+#
+# 每块板只记录自己的 millis()：
+#   - Sender 只打印 reharm 的起奏时间（"Start reharm at"），基本和弦对的起奏时间用各 reharm 时刻
+#     对轮次做 Theil–Sen 回归补齐（Sender 按 CHORD_DURATION 严格计时，残差在 1 ms 左右）
+#   - 接收器每一轮起奏时打印 "🎵 Sent to M5 at"（log_parser 里的 play_ms）
+# 共享事件是 start 消息和之后每一轮的起奏：协议的目标就是所有成员同时开始。接收器的第 i 轮先按和弦内容
+# 对到 Sender 的轮次（漏掉的整组和弦、重复演奏的一组也能对上），时钟偏移由 start 锚定（见 BoardFit），速率差 (ppm) 是
+# 起奏时刻对 Sender 同一轮起奏时刻的 Theil–Sen 斜率。
+# 注意：速率差里既有晶振误差，也有接收器每轮按 CHECK_INTERVAL 轮询带来的系统性滞后（每 8 秒约 38 ms），
+# 日志里没有别的共同时间点，两者无法区分。所以默认只用偏移换算到 Sender 时钟，累积的滞后算作真实的
+# 不同步；--align fit 则按整条回归线换算，只剩逐轮的抖动。
+
+CHORD_DURATION = 8000
+
+# 判断接收器日志与 Sender 日志是不是同一场演出。时钟拟合帮不上忙：速率差和残差里主要是接收器的轮询滞后
+# 和整组的落后、追赶（同一场的 1000 轮模拟就有几秒的残差），而 y - x - lag 按 drift 的定义恒为常数，
+# 不同场次的日志也一样。能说明问题的是对齐本身：
+#   和弦内容一致率：同一场的日志对齐后每一轮都一致（重复演奏见 repeated_plays），不同场次的日志
+#                   动态规划靠跳轮凑，最好也有几个百分点对不上
+#   净跳过轮数（跳过 - 重复演奏）占接收器轮数的比例：不同场次时要靠大量跳轮才能凑上内容
+MIN_CONTENT_MATCH = 0.98
+MAX_SKIP_RATE = 0.25
+
+
+def theil_sen(x, y, max_pairs=2_000_000, seed=0):
+    # 稳健直线拟合：所有点对斜率的中位数，截距为 y - 斜率 × x 的中位数
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n < 2:
+        raise ValueError("至少需要两个点")
+    i, j = np.triu_indices(n, k=1)
+    if len(i) > max_pairs:
+        pick = np.random.default_rng(seed).choice(len(i), max_pairs, replace=False)
+        i, j = i[pick], j[pick]
+    dx = x[j] - x[i]
+    ok = dx != 0
+    slope = float(np.median((y[j] - y[i])[ok] / dx[ok]))
+    intercept = float(np.median(y - slope * x))
+    return intercept, slope
+
+
+# ---------------- 各板的起奏时刻 ----------------
+
+def _has_system_sync(path):
+    return any(isinstance(r, SystemSync) for r in iter_records(path))
+
+
+def sender_onsets(path):
+    # [(轮次, 第一个和弦, 是否 reharm, 起奏时间或 None)]，轮次 0 是 start 之后的第一组和弦
+    # 日志从开场开始录时，第一个 "Sent chord pair" 是开场那一组（第 0 轮），打印在 "System Sync time" 之前；
+    # 记录要等 "Chord Sync time" 才生成，所以这里按原始行的顺序判断。其余情况第一个 "Sent chord pair" 已经是第 1 轮
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if "Sent chord pair" in line or "System Sync time" in line:
+                break
+        else:
+            line = ""
+    first = 0 if "Sent chord pair" in line and _has_system_sync(path) else 1
+    syncs = [r for r in iter_records(path) if isinstance(r, SenderSync)]
+    return [(first + i, s.chord_pair.split(",")[0], not s.basic, s.reharm_start_ms) for i, s in enumerate(syncs)]
+
+
+def sender_schedule(onsets, rounds=0):
+    # Sender 每一轮的起奏时间（Sender 时钟）：reharm 轮用日志里的值，其余按回归补齐
+    known = [(k, t) for k, _, _, t in onsets if t is not None]
+    if len(known) < 2:
+        raise ValueError("Sender 日志里的 \"Start reharm at\" 少于两个，无法推出 Sender 的节拍")
+    k, t = np.array(known, dtype=float).T
+    intercept, slope = theil_sen(k, t)
+    n = max(rounds, onsets[-1][0] + 1)
+    schedule = intercept + slope * np.arange(n)
+    schedule[k.astype(int)] = t
+    residual = t - (intercept + slope * k)
+    return schedule, {"period_ms": slope, "residual_max_ms": float(np.abs(residual).max())}
+
+
+def receiver_onsets(path):
+    # 每一轮：(起奏时间或 NaN, drift, 第一个和弦或 None, 是否 reharm 或 None)
+    # 第 k 轮演奏的和弦对是第 k-1 轮记录里打印的 "Next basic / Playing reharm"（第二个和弦可能做了
+    # 三全音替代，第一个和弦与 Sender 发的一致）
+    rounds = load_log(path).rounds
+    play = np.array([np.nan if p is None else p for p in rounds["play_ms"]], dtype=float)
+    drift = np.array(rounds["drift_ms"], dtype=float)
+    chords = [None] + [pair.split(" & ")[0] if pair else None for pair in rounds["chord_pair"][:-1]]
+    reharm = [None] + [n == "reharm" if n else None for n in rounds["next"][:-1]]
+    return play, drift, chords, reharm
+
+
+def repeated_plays(chords, reharm):
+    # 和弦内容与上一轮完全相同的轮次：Sender 相邻两轮的内容不会相同（reharm 之后一定是 basic，basic 的
+    # 第一个和弦每轮都换），这只能是接收器把同一组和弦又演奏了一遍。做三全音替代的接收器 (1, 4) 会这样：
+    # reharm 那组和弦连续发送 50 ms，后面几次与替代后的 current/next 不相等，又被当成新的一组接收
+    return np.array([i > 0 and chords[i] is not None and reharm[i] is not None
+                     and (chords[i], reharm[i]) == (chords[i - 1], reharm[i - 1]) for i in range(len(chords))])
+
+
+def align_rounds(sender_content, play, chords, reharm, chord_duration=CHORD_DURATION, max_skip=3, band=64):
+    # 把接收器的第 i 轮对到 Sender 的第 j 轮（j 单调不减，一次最多跳过 max_skip 轮；j 不变只允许出现在
+    # repeated_plays 标出的重复演奏上）。
+    # 代价 = 和弦内容（第一个和弦 + basic/reharm）不一致 × 4 + |相邻两轮间隔 - 轮数差 × CHORD_DURATION| / CHORD_DURATION，
+    # 重复演奏按隔了一整组计算间隔；单看 drift 分不清"晚了半组"还是"漏了一组"，和弦内容可以。
+    # 动态规划只在 j - i ∈ [-重复次数, band) 里做
+    n = len(play)
+    m = len(sender_content)
+    repeated = repeated_plays(chords, reharm)
+    low = int(repeated.sum())
+    width = low + band
+    d = np.arange(width) - low
+    inf = np.inf
+
+    def mismatch(i):
+        cost = np.zeros(width)
+        if chords[i] is None and reharm[i] is None:
+            return cost
+        for k in range(width):
+            j = i + d[k]
+            if j < 0:
+                continue
+            if j >= m:
+                break
+            chord, is_reharm = sender_content[j]
+            if chord is None:
+                continue
+            if (chords[i] is not None and chords[i] != chord) or (reharm[i] is not None and reharm[i] != is_reharm):
+                cost[k] = 4.0
+        return cost
+
+    cost = np.where(d == 0, 0.0, inf) + mismatch(0)    # 第 0 轮都是 start 之后的第一组
+    back = np.zeros((n, width), dtype=np.int64)
+    for i in range(1, n):
+        interval = play[i] - play[i - 1]
+        best = np.full(width, inf)
+        arg = np.zeros(width, dtype=np.int64)
+        # skip = -1：与上一轮同一个 j（重复演奏）
+        for skip in range(-1 if repeated[i] else 0, max_skip + 1):
+            prev = np.full(width, inf)
+            if skip >= 0:
+                prev[skip:] = cost[:width - skip]     # 上一轮在 d - skip
+            else:
+                prev[:-1] = cost[1:]
+            rounds = max(skip + 1, 1)
+            step = 0.0 if np.isnan(interval) else abs(interval - rounds * chord_duration) / chord_duration
+            total = prev + step
+            better = total < best
+            best[better] = total[better]
+            arg[better] = np.arange(width)[better] - skip
+        cost = best + mismatch(i)
+        back[i] = arg
+    slots = np.empty(n, dtype=np.int64)
+    k = int(np.argmin(cost))
+    for i in range(n - 1, -1, -1):
+        slots[i] = i + d[k]
+        k = back[i, k]
+    return slots
+
+
+# ---------------- 融合 ----------------
+
+class BoardFit:
+    # x: Sender 时钟下同一轮的起奏时间，y: 接收器自己时钟下的起奏时间，lag: 接收器自己记下的滞后
+    #   offset   两块板时钟的差。start 消息让双方在同一时刻之后 5 秒开始演奏，此后接收器比自己的
+    #            expected_time 晚了多少就是它打印的 drift 的累加（漏掉整组和弦时再减去整组的时长），
+    #            所以每一轮都给出一次 y - x - lag 的估计，取中位数（不计 start 消息本身几十 ms 的传输和轮询延迟）
+    #   rate_ppm 起奏时间对 Sender 的 Theil–Sen 斜率 - 1：接收器演奏速度相对鼓手的漂移
+
+    def __init__(self, name, x, y, lag):
+        self.name = name
+        self.x0 = float(x[0])
+        self.offset = float(np.median(y - x - lag))
+        intercept, slope = theil_sen(x - self.x0, y - self.offset - self.x0)
+        self.intercept = intercept
+        self.slope = slope
+        self.rate_ppm = (slope - 1) * 1e6
+        self.residual = y - self.offset - self.x0 - (intercept + slope * (x - self.x0))
+
+    def to_sender(self, y, align="offset"):
+        if align == "fit":
+            return (y - self.offset - self.x0 - self.intercept) / self.slope + self.x0
+        return y - self.offset
+
+
+def fuse(sender_path, receiver_paths, align="offset", chord_duration=CHORD_DURATION):
+    # 返回 (timeline, fits, 事件流)：
+    #   timeline: {"round", "sender_ms", 各接收器列, "spread_ms", "receiver_spread_ms"}，时间都在 Sender 时钟下
+    #   事件流: 按时间排好序的 (时间, 板子, 轮次)，由各板各自有序的起奏序列归并而来
+    onsets = sender_onsets(sender_path)
+    content = {k: (chord, is_reharm) for k, chord, is_reharm, _ in onsets}
+    boards = {}
+    for name, path in receiver_paths.items():
+        play, drift, chords, reharm = receiver_onsets(path)
+        m = max(onsets[-1][0] + 1, len(play)) + 64
+        slots = align_rounds([content.get(j, (None, None)) for j in range(m)], play, chords, reharm, chord_duration)
+        # 相对自己 expected_time 的累计滞后，减去漏掉的整组和弦
+        lag = np.cumsum(drift) - chord_duration * (slots - np.arange(len(slots)))
+        boards[name] = (slots, play, lag, chords, reharm)
+    n = max([int(b[0].max()) + 1 for b in boards.values() if len(b[0])] + [0])
+    schedule, sender_fit = sender_schedule(onsets, n)
+    n = len(schedule)
+
+    columns = {"sender": schedule}
+    fits = {"sender": sender_fit}
+    for name, (slots, play, lag, chords, reharm) in boards.items():
+        keep = ~np.isnan(play) & (slots < n)
+        if keep.sum() < 2:
+            raise ValueError(f"{name}: 可用的轮次太少")
+        fit = BoardFit(name, schedule[slots[keep]], play[keep], lag[keep])
+        column = np.full(n, np.nan)
+        # 重复演奏的轮次只保留第一次
+        first = keep & np.r_[True, np.diff(slots) > 0]
+        column[slots[first]] = fit.to_sender(play[first], align)
+        columns[name] = column
+        step = np.diff(slots)
+        checked = [(c, r) == content[j] for j, c, r in zip(slots, chords, reharm)
+                   if c is not None and j in content and content[j][0] is not None]
+        fits[name] = {
+            "offset_ms": fit.offset,
+            "rate_ppm": fit.rate_ppm,
+            "residual_mad_ms": float(np.median(np.abs(fit.residual))),
+            "rounds": int(keep.sum()),
+            "skipped_rounds": int(np.maximum(step - 1, 0).sum()),
+            "repeated_rounds": int((step == 0).sum()),
+            # 对齐后接收器演奏的和弦与 Sender 同一轮一致的比例
+            "content_match": sum(checked) / len(checked) if checked else None,
+        }
+
+    matrix = np.vstack(list(columns.values()))        # (板子, 轮次)
+    receivers = matrix[1:]
+    present = (~np.isnan(matrix)).sum(axis=0)
+    with warnings.catch_warnings():
+        # 某一轮全是 NaN 时 nanmax 会警告，这些位置反正会被 where 换成 NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        spread = np.where(present >= 2, np.nanmax(matrix, axis=0) - np.nanmin(matrix, axis=0), np.nan)
+        r_present = (~np.isnan(receivers)).sum(axis=0)
+        r_spread = np.where(r_present >= 2, np.nanmax(receivers, axis=0) - np.nanmin(receivers, axis=0), np.nan)
+    timeline = {"round": np.arange(n), **{f"{k}_ms": v for k, v in columns.items()},
+                "spread_ms": spread, "receiver_spread_ms": r_spread}
+
+    streams = [((t, name, k) for k, t in enumerate(col) if not np.isnan(t)) for name, col in columns.items()]
+    events = heapq.merge(*streams)
+    return timeline, fits, events
+
+
+def implausible(fit):
+    # 返回问题列表，空列表表示这块板的日志与 Sender 像是同一场演出
+    problems = []
+    if fit["content_match"] is not None and fit["content_match"] < MIN_CONTENT_MATCH:
+        problems.append(f"对齐后和弦一致 {fit['content_match']:.1%}，低于 {MIN_CONTENT_MATCH:.0%}")
+    skip_rate = (fit["skipped_rounds"] - fit["repeated_rounds"]) / fit["rounds"]
+    if skip_rate > MAX_SKIP_RATE:
+        problems.append(f"净跳过 {fit['skipped_rounds'] - fit['repeated_rounds']} 轮，"
+                        f"占 {fit['rounds']} 轮的 {skip_rate:.0%}（上限 {MAX_SKIP_RATE:.0%}）")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="融合 Sender 和多个接收器的日志，计算每轮的起奏时间差")
+    parser.add_argument("--sender", default="database/Sender.txt")
+    parser.add_argument("--receiver", action="append", default=[], metavar="NAME=PATH",
+                        help="接收器日志（可重复），默认 r2=database/receiver_drift.txt")
+    parser.add_argument("--align", choices=["offset", "fit"], default="offset",
+                        help="offset：只扣除时钟偏移（默认）；fit：按回归线扣除偏移和速率差")
+    parser.add_argument("--chord-duration", type=int, default=CHORD_DURATION)
+    parser.add_argument("--out", default="result/timeline.csv")
+    parser.add_argument("--plot", action="store_true", help="同时保存每轮起奏时间差的折线图")
+    parser.add_argument("--force", action="store_true", help="接收器日志与 Sender 对不上（多半不是同一场）时仍然保存时间线")
+    args = parser.parse_args(argv)
+
+    receivers = {}
+    for item in args.receiver or ["r2=database/receiver_drift.txt"]:
+        name, sep, path = item.partition("=")
+        if not sep:
+            parser.error(f"接收器参数格式应为 NAME=PATH: {item}")
+        receivers[name] = path
+
+    import pandas as pd
+
+    try:
+        timeline, fits, _ = fuse(args.sender, receivers, args.align, args.chord_duration)
+    except ValueError as e:
+        parser.error(str(e))
+
+    problems = {name: implausible(fits[name]) for name in receivers}
+    for name, found in problems.items():
+        for problem in found:
+            print(f"❌ {name}: {problem}，{receivers[name]} 和 {args.sender} 多半不是同一场演出的日志")
+    if any(problems.values()) and not args.force:
+        print("❌ 日志对不上，没有保存时间线（确认日志无误时加 --force）")
+        sys.exit(1)
+
+    df = pd.DataFrame(timeline)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    df.to_csv(args.out, index=False)
+    fit_path = os.path.splitext(args.out)[0] + "_clocks.csv"
+    pd.DataFrame(fits).T.to_csv(fit_path)
+
+    s = fits["sender"]
+    print(f"🥁 Sender: 节拍 {s['period_ms']:.2f} ms，reharm 起奏时间与回归线最大偏差 {s['residual_max_ms']:.1f} ms")
+    for name in receivers:
+        f = fits[name]
+        match = f"，和弦一致 {f['content_match']:.0%}" if f["content_match"] is not None else ""
+        print(f"⏱️  {name}: 时钟偏移 {f['offset_ms']:.0f} ms，速率差 {f['rate_ppm']:.0f} ppm"
+              f"（每 {args.chord_duration} ms 约 {f['rate_ppm'] * 1e-6 * args.chord_duration:.1f} ms），"
+              f"残差中位数 {f['residual_mad_ms']:.1f} ms，{f['rounds']} 轮，漏掉 {f['skipped_rounds']} 轮，"
+              f"重复演奏 {f['repeated_rounds']} 轮{match}")
+    spread = df["spread_ms"].dropna()
+    if len(spread):
+        print(f"📏 起奏时间差（{args.align}）: 中位数 {spread.median():.0f} ms，"
+              f"90% 分位 {spread.quantile(0.9):.0f} ms，最大 {spread.max():.0f} ms（{len(spread)} 轮）")
+    print(f"✅ 时间线已保存到 {args.out}，时钟参数保存到 {fit_path}")
+
+    if args.plot:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        fig, ax = plt.subplots(figsize=(10, 5))
+        ax.plot(df["round"], df["spread_ms"], marker="o", markersize=3, label="all members")
+        if len(receivers) > 1:
+            ax.plot(df["round"], df["receiver_spread_ms"], marker="s", markersize=3, label="receivers only")
+        ax.set_xlabel("Round")
+        ax.set_ylabel("Onset spread (ms)")
+        ax.set_title("Inter-member Onset Spread per Round")
+        ax.grid(True)
+        ax.legend()
+        fig.tight_layout()
+        png = os.path.splitext(args.out)[0] + "_spread.png"
+        fig.savefig(png, dpi=300)
+        print(f"图片保存完成：{png}")
+
+
+if __name__ == "__main__":
+    main()
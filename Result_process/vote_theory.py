@@ -0,0 +1,335 @@
+import argparse
+import math
+from dataclasses import dataclass
+
+import numpy as np
+
+from log_parser import load_log
+
+# 投票通过率的理论值：精确的马尔可夫链解 + 批量蒙特卡洛，并用置信区间检验实验日志。
+#
+#   python vote_theory.py                          # 两种固件策略的理论值，并检验 database/ 下的日志
+#   python vote_theory.py --yes 0.5,0.35 --history 1 --members 6 --threshold 4
+#   python vote_theory.py --plot                   # 画出各日志的累计通过率和 95% 区间
+#
+# 固件里的规则（improvisation_test.ino / receivers_*.ino）：
+#   - 每个接收器 random(100) < P 时投 YES，鼓手自己算一票 YES，yes_count >= 3 通过
+#   - receivers_test：P = 35%
+#   - receivers_Markov：P 取决于 vote_history 的第一个字符。投票时最后收到的一定是基本和弦对（'n'），
+#     第一个字符是它前面那一组：上一次投票通过时中间插了 reharm（'y'，P = 35%），否则是 'n'（P = 50%）。
+#     所以"History: yn" 就是"上一次投票通过"，整个过程是以上一次投票结果为状态的马尔可夫链。
+#
+# 一般化：history 表示看最近几次投票的结果，状态按 "yn" 这样从旧到新的字符串编号（y = 1），
+# yes[状态] 为该状态下每个接收器投 YES 的概率。fail_rate 为投票因通信失败作废（按未通过处理）的概率。
+
+
+@dataclass(frozen=True)
+class VotePolicy:
+    yes: tuple = (0.35,)      # 每个历史状态下的 YES 概率，长度 2 ** history
+    history: int = 0          # 看最近几次投票结果
+    members: int = 4          # 接收器数量
+    drummer_yes: int = 1      # 鼓手固定投的 YES 票数
+    threshold: int = 3        # 总 YES 票数 >= threshold 时通过
+
+    def __post_init__(self):
+        if len(self.yes) != 2 ** self.history:
+            raise ValueError(f"history = {self.history} 需要 {2 ** self.history} 个 YES 概率，给了 {len(self.yes)} 个")
+
+    @property
+    def states(self):
+        return 2 ** self.history
+
+    @property
+    def need(self):
+        # 接收器里至少要有多少张 YES
+        return max(self.threshold - self.drummer_yes, 0)
+
+    def label(self, state):
+        # 状态编号 -> "yn"（从旧到新）
+        return "".join("y" if state >> (self.history - 1 - i) & 1 else "n" for i in range(self.history))
+
+    def pass_probabilities(self, fail_rate=0.0):
+        # 每个状态下这一次投票通过的概率
+        return np.array([(1 - fail_rate) * pass_probability(p, self.members, self.need) for p in self.yes])
+
+    def next_state(self, state, passed):
+        return ((state << 1) | passed) & (self.states - 1)
+
+
+FIRMWARE_POLICIES = {
+    "default": VotePolicy(yes=(0.35,)),
+    "markov": VotePolicy(yes=(0.50, 0.35), history=1),
+}
+
+
+def pass_probability(p, members, need):
+    # P(Binomial(members, p) >= need)
+    return sum(math.comb(members, k) * p ** k * (1 - p) ** (members - k) for k in range(need, members + 1))
+
+
+# ---------------- 精确解 ----------------
+
+def transition_matrix(policy, fail_rate=0.0):
+    q = policy.pass_probabilities(fail_rate)
+    P = np.zeros((policy.states, policy.states))
+    for s in range(policy.states):
+        P[s, policy.next_state(s, 1)] += q[s]
+        P[s, policy.next_state(s, 0)] += 1 - q[s]
+    return P
+
+
+def stationary(policy, fail_rate=0.0):
+    # (平稳分布, 长期通过率)：解 π P = π, Σπ = 1
+    P = transition_matrix(policy, fail_rate)
+    n = policy.states
+    A = np.vstack([P.T - np.eye(n), np.ones(n)])
+    b = np.zeros(n + 1)
+    b[-1] = 1
+    pi = np.linalg.lstsq(A, b, rcond=None)[0]
+    return pi, float(pi @ policy.pass_probabilities(fail_rate))
+
+
+def pass_count_distributions(policy, rounds, fail_rate=0.0, start=0):
+    # 逐轮给出"前 k 次投票中通过次数"的精确分布：产出 (k, 概率数组[0..k])
+    # 初始状态 start = 0 即固件开场时的 "nn"
+    q = policy.pass_probabilities(fail_rate)
+    dist = np.zeros((policy.states, rounds + 1))
+    dist[start, 0] = 1.0
+    for k in range(1, rounds + 1):
+        new = np.zeros_like(dist)
+        for s in range(policy.states):
+            new[policy.next_state(s, 1), 1:] += dist[s, :-1] * q[s]
+            new[policy.next_state(s, 0)] += dist[s] * (1 - q[s])
+        dist = new
+        yield k, dist.sum(axis=0)[:k + 1]
+
+
+def running_band(policy, rounds, level=0.95, fail_rate=0.0):
+    # 累计通过率（通过次数 / k）的期望和精确分位区间，k = 1..rounds
+    alpha = (1 - level) / 2
+    mean = np.empty(rounds)
+    lo = np.empty(rounds)
+    hi = np.empty(rounds)
+    for k, probs in pass_count_distributions(policy, rounds, fail_rate):
+        cdf = np.cumsum(probs)
+        counts = np.arange(k + 1)
+        mean[k - 1] = probs @ counts / k
+        lo[k - 1] = np.searchsorted(cdf, alpha - 1e-12) / k
+        hi[k - 1] = np.searchsorted(cdf, 1 - alpha - 1e-12) / k
+    return mean, lo, hi
+
+
+def count_p_value(policy, rounds, passes, fail_rate=0.0):
+    # 双侧精确 p 值：出现 passes 次通过（或更极端）的概率
+    for k, probs in pass_count_distributions(policy, rounds, fail_rate):
+        if k == rounds:
+            lower = probs[:passes + 1].sum()
+            upper = probs[passes:].sum()
+            return min(1.0, 2 * min(lower, upper))
+    return 1.0
+
+
+# ---------------- 蒙特卡洛 ----------------
+
+def monte_carlo(policy, rounds, runs, fail_rate=0.0, seed=None):
+    # runs 次独立演出并行推进（每轮一次数组运算），返回 (runs, rounds) 的通过矩阵
+    rng = np.random.default_rng(seed)
+    yes = np.asarray(policy.yes)
+    mask = policy.states - 1
+    state = np.zeros(runs, dtype=np.int64)
+    passed = np.empty((runs, rounds), dtype=bool)
+    for k in range(rounds):
+        votes = rng.binomial(policy.members, yes[state])
+        ok = votes >= policy.need
+        if fail_rate:
+            ok &= rng.random(runs) >= fail_rate
+        passed[:, k] = ok
+        state = ((state << 1) | ok) & mask
+    return passed
+
+
+# ---------------- 检验日志 ----------------
+
+def wilson(successes, n, level=0.95):
+    # 二项比例的 Wilson 区间
+    if not n:
+        return math.nan, math.nan
+    z = _z(level)
+    p = successes / n
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return centre - half, centre + half
+
+
+def _z(level):
+    # 标准正态分位数（二分法求解 erf，避免依赖 scipy）
+    target = (1 + level) / 2
+    lo, hi = 0.0, 10.0
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        if 0.5 * (1 + math.erf(mid / math.sqrt(2))) < target:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def check_sender(path, policy, level=0.95):
+    # Sender 日志的投票结果与理论对比；failed（通信失败）按未通过计入，同时给出按观测失败率修正后的理论值
+    results = load_log(path).votes["result"]
+    n = len(results)
+    passes = results.count("reharm")
+    failed = results.count("failed")
+    fail_rate = failed / n if n else 0.0
+    _, theory = stationary(policy)
+    _, theory_failed = stationary(policy, fail_rate)
+    row = {
+        "log": path,
+        "votes": n,
+        "passes": passes,
+        "failed": failed,
+        "pass_rate": passes / n if n else math.nan,
+        "theory": theory,
+        "theory_with_failures": theory_failed,
+    }
+    if n:
+        _, lo, hi = running_band(policy, n, level, fail_rate)
+        row.update({
+            "band_low": lo[-1],
+            "band_high": hi[-1],
+            "p_value": count_p_value(policy, n, passes, fail_rate),
+        })
+    # 按上一次投票结果分组的条件通过率（不含作废的投票）
+    q = policy.pass_probabilities()
+    if policy.history == 1:
+        for prev, name in ((1, "after_pass"), (0, "after_no_pass")):
+            rounds = [cur for before, cur in zip(["basic"] + results, results)
+                      if (before == "reharm") == bool(prev) and cur != "failed"]
+            k = rounds.count("reharm")
+            low, high = wilson(k, len(rounds), level)
+            row.update({f"{name}_n": len(rounds), f"{name}_rate": k / len(rounds) if rounds else math.nan,
+                        f"{name}_low": low, f"{name}_high": high, f"{name}_theory": q[prev]})
+    return row
+
+
+def check_receiver(path, policy, level=0.95):
+    # 接收器日志：按 History 分组，观测到的 YES 比例与日志里写的概率（没有则用策略的概率）对比
+    rounds = load_log(path).rounds
+    groups = {}
+    for vote, history, prob in zip(rounds["vote"], rounds["history"], rounds["yes_probability"]):
+        if not vote:
+            continue
+        key = (history or "-", prob if prob is not None else policy.yes[0])
+        n, k = groups.get(key, (0, 0))
+        groups[key] = (n + 1, k + vote.startswith("VOTE_YES"))
+    rows = []
+    for (history, prob), (n, k) in sorted(groups.items()):
+        low, high = wilson(k, n, level)
+        rows.append({"log": path, "history": history, "votes": n, "yes": k, "yes_rate": k / n,
+                     "stated_probability": prob, "low": low, "high": high,
+                     "consistent": low <= prob <= high})
+    return rows
+
+
+# ---------------- 命令行 ----------------
+
+LOGS = {
+    "default": ("database/Sender.txt", "database/receiver_drift.txt"),
+    "markov": ("database/Sender_Markov.txt", "database/Receiver_Markov.txt"),
+}
+
+
+def describe(name, policy, rounds, runs, seed):
+    pi, rate = stationary(policy)
+    q = policy.pass_probabilities()
+    print(f"📐 {name}: 长期通过率 {rate:.4f}")
+    for s in range(policy.states):
+        label = policy.label(s) or "-"
+        print(f"    状态 {label:>4}: P(YES) = {policy.yes[s]:.2f}  P(通过) = {q[s]:.4f}  平稳概率 = {pi[s]:.4f}")
+    passed = monte_carlo(policy, rounds, runs, seed=seed)
+    rates = passed.mean(axis=1)
+    mean, lo, hi = running_band(policy, rounds)
+    print(f"    蒙特卡洛 {runs} × {rounds} 轮: 平均 {rates.mean():.4f}，"
+          f"{rounds} 轮后的 95% 区间 [{np.quantile(rates, 0.025):.3f}, {np.quantile(rates, 0.975):.3f}]"
+          f"（精确: [{lo[-1]:.3f}, {hi[-1]:.3f}]，期望 {mean[-1]:.4f}）")
+
+
+def plot_bands(checks, policies, path, level=0.95):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    for (name, sender), color in zip(checks, ("blue", "orange")):
+        results = load_log(sender).votes["result"]
+        if not results:
+            continue
+        n = len(results)
+        observed = np.cumsum([r == "reharm" for r in results]) / np.arange(1, n + 1)
+        fail_rate = results.count("failed") / n
+        mean, lo, hi = running_band(policies[name], n, level, fail_rate)
+        rounds = np.arange(1, n + 1)
+        ax.plot(rounds, observed, color=color, label=f"{name} observed")
+        ax.plot(rounds, mean, color=color, linestyle="--", linewidth=1,
+                label=f"{name} theory (failure rate {fail_rate:.0%})")
+        ax.fill_between(rounds, lo, hi, color=color, alpha=0.15, label=f"{name} {level:.0%} band")
+    ax.set_xlabel("Round")
+    ax.set_ylabel("Pass Rate")
+    ax.set_title("Pass Rate vs Markov-chain Theory")
+    ax.grid(True)
+    ax.legend()
+    fig.tight_layout()
+    fig.savefig(path, dpi=300)
+    plt.close(fig)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="投票通过率：精确马尔可夫链解、蒙特卡洛和日志检验")
+    parser.add_argument("--yes", help="自定义策略：各历史状态的 YES 概率，逗号分隔（例如 0.5,0.35）")
+    parser.add_argument("--history", type=int, default=None, help="自定义策略看最近几次投票结果")
+    parser.add_argument("--members", type=int, default=4)
+    parser.add_argument("--drummer-yes", type=int, default=1)
+    parser.add_argument("--threshold", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=100, help="蒙特卡洛每次演出的投票轮数")
+    parser.add_argument("--runs", type=int, default=10000, help="蒙特卡洛演出次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--level", type=float, default=0.95, help="置信水平")
+    parser.add_argument("--plot", action="store_true", help="保存 result/vote_theory_band.png")
+    args = parser.parse_args(argv)
+
+    common = dict(members=args.members, drummer_yes=args.drummer_yes, threshold=args.threshold)
+    if args.yes:
+        yes = tuple(float(v) for v in args.yes.split(","))
+        history = args.history if args.history is not None else int(math.log2(len(yes)))
+        try:
+            policy = VotePolicy(yes=yes, history=history, **common)
+        except ValueError as e:
+            parser.error(str(e))
+        describe("自定义策略", policy, args.rounds, args.runs, args.seed)
+        return
+
+    policies = {name: VotePolicy(yes=p.yes, history=p.history, **common) for name, p in FIRMWARE_POLICIES.items()}
+    for name, policy in policies.items():
+        describe(name, policy, args.rounds, args.runs, args.seed)
+
+    print()
+    for name, (sender, receiver) in LOGS.items():
+        row = check_sender(sender, policies[name], args.level)
+        print(f"🔍 {sender}: {row['passes']}/{row['votes']} 通过（{row['failed']} 次作废），"
+              f"观测 {row['pass_rate']:.3f}，理论 {row['theory']:.3f}，按作废率修正 {row['theory_with_failures']:.3f}，"
+              f"{args.level:.0%} 区间 [{row['band_low']:.3f}, {row['band_high']:.3f}]，p = {row['p_value']:.3f}")
+        for prefix, text in (("after_pass", "上次通过后"), ("after_no_pass", "上次未通过后")):
+            if f"{prefix}_n" in row and row[f"{prefix}_n"]:
+                print(f"    {text}: {row[f'{prefix}_rate']:.3f}（n = {row[f'{prefix}_n']}，"
+                      f"区间 [{row[f'{prefix}_low']:.3f}, {row[f'{prefix}_high']:.3f}]，理论 {row[f'{prefix}_theory']:.3f}）")
+        for r in check_receiver(receiver, policies[name], args.level):
+            mark = "✅" if r["consistent"] else "⚠️ "
+            print(f"{mark} {receiver} History {r['history']}: YES {r['yes']}/{r['votes']} = {r['yes_rate']:.3f}，"
+                  f"区间 [{r['low']:.3f}, {r['high']:.3f}]，设定 {r['stated_probability']:.2f}")
+
+    if args.plot:
+        path = "result/vote_theory_band.png"
+        plot_bands([(name, sender) for name, (sender, _) in LOGS.items()], policies, path, args.level)
+        print(f"图片保存完成：{path}")
+
+
+if __name__ == "__main__":
+    main()
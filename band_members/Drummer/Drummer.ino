@@ -1,18 +1,29 @@
 #include <M5Unified.h>
 #include <Wire.h>
 #include <SD.h>
+#include "sample_bank.h"
 
 #define M5_I2C_ADDR 0x55
 #define SDCARD_CSPIN GPIO_NUM_4
+#define DRUM_BAR_MS 4000       // 一小节 8 个八分音符（60 BPM），CHORD_DURATION 8000 = 2 小节；改速度后运行 drumbars.py --check
+#define DRUM_FILL_EVERY 4      // 每 4 小节的最后一小节换成加花 fill
 
 String curr_chord = "";
 String next_chord = "";
 volatile bool disp_update = false;
 bool start_drumming = false; // 🥁 控制是否开始打鼓
+bool bank_ready = false;      // SD 上有 bank.pak 时用打包文件播放
+bool bars_ready = false;      // 有整小节的 bar / fill 时每小节只播一个文件，否则逐拍播放单击
 
 static constexpr size_t buf_size = 1024;
 uint8_t wav_buf[buf_size];
 
+// 整小节连续播放用的缓冲区：playRaw 不复制数据，队列里最多排两块，
+// 轮流用 3 块，正在读 SD 的那块一定不在播放或排队
+static constexpr size_t bar_buf_size = 4096;
+static constexpr size_t bar_buf_count = 3;
+uint8_t bar_buf[bar_buf_count][bar_buf_size];
+
 struct __attribute__((packed)) wav_header_t {
   char RIFF[4];
   uint32_t chunk_size;
@@ -31,16 +42,47 @@ struct __attribute__((packed)) sub_chunk_t {
   uint32_t chunk_size;
 };
 
-bool playSdWavForceShort(const char* filepath, int short_samples = 15000) {
-  M5.Speaker.stop();  // 立刻停止之前的声音
+void streamPcm(File& file, int32_t data_len, uint32_t sample_rate, bool is_stereo, int short_samples) {
+  int played_samples = 0;
+
+  while (data_len > 0 && played_samples < short_samples) {
+    size_t len = data_len < buf_size ? data_len : buf_size;
+    len = file.read(wav_buf, len);
+    if (len == 0) break;
+    data_len -= len;
+
+    int samples_this_block = len / 2;
+    if (played_samples + samples_this_block > short_samples) {
+      samples_this_block = short_samples - played_samples;
+    }
 
-  File file = SD.open(filepath);
+    M5.Speaker.playRaw((const int16_t*)wav_buf, samples_this_block, sample_rate, is_stereo, 1, 1);
+    played_samples += samples_this_block;
+  }
+}
+
+// 一整小节：从头到尾连续排队，返回时最后一块刚排进队列，
+// 下一小节紧接着排上去，小节之间没有空隙，节拍由采样数决定而不是 millis()
+void streamBar(File& file, int32_t data_len, uint32_t sample_rate, bool is_stereo) {
+  size_t k = 0;
+  while (data_len > 0) {
+    size_t len = data_len < (int32_t)bar_buf_size ? data_len : bar_buf_size;
+    len = file.read(bar_buf[k], len);
+    if (len == 0) break;
+    data_len -= len;
+    M5.Speaker.playRaw((const int16_t*)bar_buf[k], len / 2, sample_rate, is_stereo, 1, 1);
+    k = (k + 1) % bar_buf_count;
+  }
+}
+
+// 打开 wav 并定位到 data chunk
+bool openWav(const char* filepath, File& file, wav_header_t& header, int32_t& data_len) {
+  file = SD.open(filepath);
   if (!file) {
     Serial.print("Failed to open: "); Serial.println(filepath);
     return false;
   }
 
-  wav_header_t header;
   file.read((uint8_t*)&header, sizeof(header));
   if (memcmp(header.RIFF, "RIFF", 4) ||
       memcmp(header.WAVEfmt, "WAVEfmt ", 8) ||
@@ -58,25 +100,55 @@ bool playSdWavForceShort(const char* filepath, int short_samples = 15000) {
     file.seek(file.position() + chunk.chunk_size);
     file.read((uint8_t*)&chunk, sizeof(chunk));
   }
+  data_len = chunk.chunk_size;
+  return true;
+}
 
-  int32_t data_len = chunk.chunk_size;
-  bool is_stereo = header.channel > 1;
-  int played_samples = 0;
-
-  while (data_len > 0 && played_samples < short_samples) {
-    size_t len = data_len < buf_size ? data_len : buf_size;
-    len = file.read(wav_buf, len);
-    data_len -= len;
+bool playSdWavForceShort(const char* filepath, int short_samples = 15000) {
+  M5.Speaker.stop();  // 立刻停止之前的声音
 
-    int samples_this_block = len / 2;
-    if (played_samples + samples_this_block > short_samples) {
-      samples_this_block = short_samples - played_samples;
-    }
+  File file;
+  wav_header_t header;
+  int32_t data_len;
+  if (!openWav(filepath, file, header, data_len)) return false;
+  streamPcm(file, data_len, header.sample_rate, header.channel > 1, short_samples);
+  file.close();
+  return true;
+}
 
-    M5.Speaker.playRaw((const int16_t*)wav_buf, samples_this_block, header.sample_rate, is_stereo, 1, 1);
-    played_samples += samples_this_block;
+// 从 bank.pak 播放：查表 + 一次 seek，文件保持打开
+bool playBankSampleForceShort(const char* key, int short_samples = 15000) {
+  const sample_bank_entry_t* entry = findSample(key);
+  if (!entry) {
+    Serial.print("Sample not in bank: "); Serial.println(key);
+    return false;
   }
+  M5.Speaker.stop();  // 立刻停止之前的声音
+  if (!seekSample(entry)) return false;
+  streamPcm(sample_bank_file, entry->length, entry->sample_rate, entry->channels > 1, short_samples);
+  return true;
+}
 
+// 按鼓件名播放：有 bank.pak 时用打包文件（key 是 ride/snare/hihat/kick），否则用 /1.wav ~ /4.wav
+bool playDrum(const char* name, const char* filepath, int short_samples) {
+  if (bank_ready) return playBankSampleForceShort(name, short_samples);
+  return playSdWavForceShort(filepath, short_samples);
+}
+
+
+// 播放一整小节（bar / fill）：有 bank.pak 时一次 seek，否则打开 /bar.wav、/fill.wav
+bool playBar(const char* key, const char* filepath) {
+  if (bank_ready) {
+    const sample_bank_entry_t* entry = findSample(key);
+    if (!seekSample(entry)) return false;
+    streamBar(sample_bank_file, entry->length, entry->sample_rate, entry->channels > 1);
+    return true;
+  }
+  File file;
+  wav_header_t header;
+  int32_t data_len;
+  if (!openWav(filepath, file, header, data_len)) return false;
+  streamBar(file, data_len, header.sample_rate, header.channel > 1);
   file.close();
   return true;
 }
@@ -124,16 +196,30 @@ void setup() {
     while (true) delay(1000);
   }
   M5.Display.println("SD mounted.");
+  bank_ready = openSampleBank();
+  M5.Display.println(bank_ready ? "bank.pak loaded." : "No bank.pak, using WAV files.");
+  bars_ready = bank_ready ? (findSample("bar") && findSample("fill"))
+                          : (SD.exists("/bar.wav") && SD.exists("/fill.wav"));
+  M5.Display.println(bars_ready ? "Playing whole bars." : "No bar files, playing single hits.");
 }
 
 void loop() {
   M5.update();
   static uint32_t last_beat_time = 0;
   static int drum_step = 0;
+  static uint32_t bar_count = 0;
   uint32_t now = millis();
 
   // 只有收到和弦后，才开始打鼓
-  if (start_drumming && (now - last_beat_time > 500)) {
+  if (start_drumming && bars_ready) {
+    // 每小节一个文件，播放期间不刷新屏幕，避免排队的音频放完之前接不上下一小节
+    bool fill = bar_count % DRUM_FILL_EVERY == DRUM_FILL_EVERY - 1;
+    Serial.println("Bar:" + String(bar_count) + " Playing: " + (fill ? "fill" : "bar"));
+    if (!playBar(fill ? "fill" : "bar", fill ? "/fill.wav" : "/bar.wav")) {
+      bars_ready = false;  // 读不到小节文件就退回逐拍播放
+    }
+    bar_count++;
+  } else if (start_drumming && (now - last_beat_time > 500)) {
     last_beat_time = now;
     M5.Display.clear(BLACK);
     M5.Display.setCursor(0,0);
@@ -141,27 +227,27 @@ void loop() {
     // ride 每拍
     M5.Display.println("Drum: /1.wav (ride)");
     Serial.println("Step:" + String(drum_step) + "Playing: /1.wav (ride)");
-    playSdWavForceShort("/1.wav", 7000);
+    playDrum("ride", "/1.wav", 7000);
 
     // kick on 0,4
     if (drum_step == 0 || drum_step == 4) {
       M5.Display.println("Drum: /4.wav (kick)");
       Serial.println("Step:" + String(drum_step) + "Playing: /4.wav (kick)");
-      playSdWavForceShort("/4.wav", 14000);
+      playDrum("kick", "/4.wav", 14000);
     }
 
     // snare on 2,6
     if (drum_step == 2 || drum_step == 6) {
       M5.Display.println("Drum: /2.wav (snare)");
       Serial.println("Step:" + String(drum_step) + "Playing: /2.wav (snare)");
-      playSdWavForceShort("/2.wav", 14000);
+      playDrum("snare", "/2.wav", 14000);
     }
 
     // hihat on every odd
     if (drum_step % 2 == 1) {
       M5.Display.println("Drum: /3.wav (hihat)");
       Serial.println("Step:" + String(drum_step) + "Playing: /3.wav (hihat)");
-      playSdWavForceShort("/3.wav", 14000);
+      playDrum("hihat", "/3.wav", 14000);
     }
 
     drum_step = (drum_step + 1) % 8;
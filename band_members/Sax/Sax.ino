@@ -1,6 +1,7 @@
 #include <M5Unified.h>
 #include <Wire.h>
 #include <SD.h>
+#include "sample_bank.h"
 
 #define M5_I2C_ADDR 0x55
 #define SDCARD_CSPIN GPIO_NUM_4
@@ -9,6 +10,7 @@ String current_chord_str = "";
 String next_chord_str = "";
 char i2c_raw_buffer[33] = {0};
 volatile bool has_new_raw_i2c_data = false;
+bool bank_ready = false;  // SD 上有 bank.pak 时用打包文件播放
 
 int current_chord[4] = {0,0,0,0};
 int next_chord[4] = {0,0,0,0};
@@ -66,18 +68,9 @@ void calculateSoloScale(int root, ChordType type, int* out) {
     for(int i=0;i<7;i++) out[i]=(root+pattern[i])%12;
 }
 
-// 强行播放短
-bool playSdWavForceShort(const char* filepath, int short_samples = 5000) {
-    M5.Speaker.stop(); // 强行打断
-    File f=SD.open(filepath); if(!f) return false;
-    struct {char r[4]; uint32_t s; char w[4]; char fm[4]; uint32_t fs; uint16_t af,nc; uint32_t sr,br; uint16_t ba,bps;} h;
-    if(f.read((uint8_t*)&h,sizeof(h))!=sizeof(h)){f.close();return false;}
-    struct {char id[4]; uint32_t size;} dc;
-    while(f.available()){ if(f.read((uint8_t*)&dc,sizeof(dc))!=sizeof(dc)) break;
-      if(!strncmp(dc.id,"data",4)) break; f.seek(f.position()+dc.size);}
-    int32_t data_len=dc.size;
-    uint16_t bytes_per_sample = h.bps/8;
-    uint16_t bytes_per_frame = bytes_per_sample * h.nc;
+void streamPcm(File& f, uint32_t data_len, uint32_t sr, uint16_t nc, uint16_t bps, int short_samples) {
+    uint16_t bytes_per_sample = bps/8;
+    uint16_t bytes_per_frame = bytes_per_sample * nc;
     int played_samples=0;
     while(data_len>0 && played_samples<short_samples){
       size_t bytes_to_read=data_len<buf_size?data_len:buf_size;
@@ -87,13 +80,34 @@ bool playSdWavForceShort(const char* filepath, int short_samples = 5000) {
       if(played_samples + samples_this_block > short_samples){
         samples_this_block = short_samples - played_samples;
       }
-      M5.Speaker.playRaw((const int16_t*)wav_buf, samples_this_block, h.sr, h.nc>1,1,1);
+      M5.Speaker.playRaw((const int16_t*)wav_buf, samples_this_block, sr, nc>1,1,1);
       played_samples += samples_this_block;
       data_len -= bytes_read;
     }
+}
+
+// 强行播放短
+bool playSdWavForceShort(const char* filepath, int short_samples = 5000) {
+    M5.Speaker.stop(); // 强行打断
+    File f=SD.open(filepath); if(!f) return false;
+    struct {char r[4]; uint32_t s; char w[4]; char fm[4]; uint32_t fs; uint16_t af,nc; uint32_t sr,br; uint16_t ba,bps;} h;
+    if(f.read((uint8_t*)&h,sizeof(h))!=sizeof(h)){f.close();return false;}
+    struct {char id[4]; uint32_t size;} dc;
+    while(f.available()){ if(f.read((uint8_t*)&dc,sizeof(dc))!=sizeof(dc)) break;
+      if(!strncmp(dc.id,"data",4)) break; f.seek(f.position()+dc.size);}
+    streamPcm(f, dc.size, h.sr, h.nc, h.bps, short_samples);
     f.close(); return true;
 }
 
+// 从 bank.pak 播放：查表 + 一次 seek
+bool playBankSampleForceShort(const char* key, int short_samples = 5000) {
+    const sample_bank_entry_t* e=findSample(key); if(!e) return false;
+    M5.Speaker.stop(); // 强行打断
+    if(!seekSample(e)) return false;
+    streamPcm(sample_bank_file, e->length, e->sample_rate, e->channels, e->bits, short_samples);
+    return true;
+}
+
 void setup(){
     auto cfg=M5.config(); cfg.internal_spk=true; cfg.external_imu=false; cfg.internal_mic=false;
     M5.begin(cfg); M5.Speaker.setVolume(100);
@@ -105,6 +119,8 @@ void setup(){
       while (true) delay(1000);
     }
     M5.Display.println("SD mounted.");
+    bank_ready=openSampleBank();
+    M5.Display.println(bank_ready?"bank.pak loaded.":"No bank.pak, using WAV files.");
   }
 
 void loop(){
@@ -147,7 +163,8 @@ void loop(){
             M5.Display.setCursor(0,30); M5.Display.printf("Note: %d", note);
             Serial.printf("%s %s Solo: %d.wav\n", key.c_str(), mode.c_str(), note);
 
-            playSdWavForceShort(("/"+String(note)+".wav").c_str(), 8000); // 强行打断
+            if(bank_ready) playBankSampleForceShort(String(note).c_str(), 8000); // 强行打断
+            else playSdWavForceShort(("/"+String(note)+".wav").c_str(), 8000);
         }
     }
 }
@@ -1,6 +1,7 @@
 #include <M5Unified.h>
 #include <Wire.h>
 #include <SD.h>
+#include "sample_bank.h"
 
 #define M5_I2C_ADDR 0x55
 #define SDCARD_CSPIN GPIO_NUM_4
@@ -10,6 +11,7 @@ String next_chord_str = "";
 
 char i2c_raw_buffer[33] = {0};
 volatile bool has_new_raw_i2c_data = false;
+bool bank_ready = false;  // SD 上有 bank.pak 时用打包文件播放
 
 int current_chord[4] = {0,0,0,0};
 int next_chord[4] = {0,0,0,0};
@@ -54,6 +56,28 @@ void parseChord(const String &s, int *out) {
 }
 
 // ------------------------ 播放短 WAV -----------------------
+void streamPcm(File& file, uint32_t data_len, uint32_t sample_rate, uint16_t num_channels,
+               uint16_t bits_per_sample, int short_samples) {
+  int played_samples = 0;
+  uint16_t bytes_per_sample = bits_per_sample / 8;
+  uint16_t bytes_per_frame = bytes_per_sample * num_channels;
+
+  while (data_len > 0 && played_samples < short_samples) {
+    size_t bytes_to_read = data_len < buf_size ? data_len : buf_size;
+    size_t bytes_read = file.read(wav_buf, bytes_to_read);
+    if (!bytes_read) break;
+
+    int samples_this_block = bytes_read / bytes_per_frame;
+    if (played_samples + samples_this_block > short_samples) {
+      samples_this_block = short_samples - played_samples;
+    }
+    M5.Speaker.playRaw((int16_t*)wav_buf, samples_this_block, sample_rate, num_channels>1, 1,1);
+
+    played_samples += samples_this_block;
+    data_len -= bytes_read;
+  }
+}
+
 bool playSdWavForceShort(const char* filepath, int short_samples = 10000) {
   M5.Speaker.stop();  // 立即停止上一个音
   File file = SD.open(filepath);
@@ -78,26 +102,21 @@ bool playSdWavForceShort(const char* filepath, int short_samples = 10000) {
   }
   if(!found){file.close();return false;}
 
-  int played_samples = 0;
-  uint32_t data_len = chunk.data_size;
-  uint16_t bytes_per_sample = header.bits_per_sample / 8;
-  uint16_t bytes_per_frame = bytes_per_sample * header.num_channels;
-
-  while (data_len > 0 && played_samples < short_samples) {
-    size_t bytes_to_read = data_len < buf_size ? data_len : buf_size;
-    size_t bytes_read = file.read(wav_buf, bytes_to_read);
-    if (!bytes_read) break;
-
-    int samples_this_block = bytes_read / bytes_per_frame;
-    if (played_samples + samples_this_block > short_samples) {
-      samples_this_block = short_samples - played_samples;
-    }
-    M5.Speaker.playRaw((int16_t*)wav_buf, samples_this_block, header.sample_rate, header.num_channels>1, 1,1);
+  streamPcm(file, chunk.data_size, header.sample_rate, header.num_channels, header.bits_per_sample, short_samples);
+  file.close();
+  return true;
+}
 
-    played_samples += samples_this_block;
-    data_len -= bytes_read;
+// ------------------------ 从 bank.pak 播放 -----------------------
+bool playBankSampleForceShort(const char* key, int short_samples = 10000) {
+  const sample_bank_entry_t* entry = findSample(key);
+  if (!entry) {
+    Serial.print("Sample not in bank: "); Serial.println(key);
+    return false;
   }
-  file.close();
+  M5.Speaker.stop();  // 立即停止上一个音
+  if (!seekSample(entry)) return false;
+  streamPcm(sample_bank_file, entry->length, entry->sample_rate, entry->channels, entry->bits, short_samples);
   return true;
 }
 
@@ -116,6 +135,8 @@ void setup(){
     M5.Display.println("SD mount failed!"); while(true) delay(1000);
   }
   M5.Display.println("SD mounted.");
+  bank_ready = openSampleBank();
+  M5.Display.println(bank_ready ? "bank.pak loaded." : "No bank.pak, using WAV files.");
 }
 
 // ------------------------ LOOP -----------------------
@@ -164,7 +185,8 @@ void loop(){
     M5.Display.printf("Note: %d", note);
     Serial.printf("Play note %d with short_samples=%d\n", note, short_samples);
 
-    playSdWavForceShort((String("/") + note + ".wav").c_str(), short_samples);
+    if (bank_ready) playBankSampleForceShort(String(note).c_str(), short_samples);
+    else playSdWavForceShort((String("/") + note + ".wav").c_str(), short_samples);
 
     play_index++;
     if(play_index>4){
@@ -1,6 +1,7 @@
 #include <Wire.h>
 #include <stdlib.h>
 #include "ircomm_i2c.h"
+#include "harmony_tables.h"
 
 // 定义 IR 和 M5Stack 通信地址与节拍间隔
 ir_mode_t ircomm_mode;
@@ -10,6 +11,7 @@ ir_msg_status_t msg_status;
 #define CHORD_DURATION 8000       // 每对和弦持续 8 秒
 #define NUM_MEMBERS 4             // 接收器数量
 #define POST_ACK_DELAY 700
+#define CHORD_WIRE_COMPACT 1      // 1: IR 上发 3 字节的紧凑和弦对（见 harmony_tables.h），0: 原来的文本
 
 
 // 状态机定义：用于最初同步一次，之后按绝对时间运行
@@ -35,7 +37,7 @@ bool sync = false;
 
 // 和弦与 reharm 状态
 int key_root = 0;  // 主调 C = 0
-String mode = "major";
+bool minor_mode = false;  // true: 小调
 int degree_sequence[] = {2, 6, 3, 5, 4, 1};
 int sequence_len = 6;
 int current_index = 0;
@@ -61,67 +63,15 @@ bool toggle_send = true;
 String chord1, chord2;
 String chord_pair;
 
-// 根据级数构建实际和弦音（返回字符串如 0_4_7_11）
-String getChordFromDegree(int key_root, int degree, String mode) {
-  int major_scale[] = {0, 2, 4, 5, 7, 9, 11};
-  int minor_scale[] = {0, 2, 3, 5, 7, 8, 10};
-  int chord_intervals[4] = {0};
-  String quality;
-
-  if (mode == "major") {
-    switch (degree) {
-      case 1: case 4: quality = "maj7"; break;
-      case 2: case 3: case 6: quality = "m7"; break;
-      case 5: quality = "7"; break;
-      case 7: quality = "m7b5"; break;
-      default: quality = "m7"; break;
-    }
-  } else {
-    switch (degree) {
-      case 1: quality = "m7"; break;
-      case 2: quality = "m7b5"; break;
-      case 3: quality = "maj7"; break;
-      case 4: quality = "m7"; break;
-      case 5: quality = "7"; break;
-      case 6: quality = "maj7"; break;
-      case 7: quality = "7"; break;
-      default: quality = "m7"; break;
-    }
-  }
-
-  int* scale = (mode == "major") ? major_scale : minor_scale;
-  int scale_degree = degree - 1;
-  if (scale_degree < 0 || scale_degree > 6) return "0_0_0_0";
-  int chord_root = (key_root + scale[scale_degree]) % 12;
-
-  if (quality == "maj7") {
-    chord_intervals[0] = 0; chord_intervals[1] = 4; chord_intervals[2] = 7; chord_intervals[3] = 11;
-  } else if (quality == "m7") {
-    chord_intervals[0] = 0; chord_intervals[1] = 3; chord_intervals[2] = 7; chord_intervals[3] = 10;
-  } else if (quality == "7") {
-    chord_intervals[0] = 0; chord_intervals[1] = 4; chord_intervals[2] = 7; chord_intervals[3] = 10;
-  } else if (quality == "m7b5") {
-    chord_intervals[0] = 0; chord_intervals[1] = 3; chord_intervals[2] = 6; chord_intervals[3] = 10;
-  } else if (quality == "dim7") {
-    chord_intervals[0] = 0; chord_intervals[1] = 3; chord_intervals[2] = 6; chord_intervals[3] = 9;
-  } else {
-    return "0_0_0_0";
-  }
-
-  char buf[32];
-  sprintf(buf, "%d_%d_%d_%d",
-    (chord_root + chord_intervals[0]) % 12,
-    (chord_root + chord_intervals[1]) % 12,
-    (chord_root + chord_intervals[2]) % 12,
-    (chord_root + chord_intervals[3]) % 12);
-  return String(buf);
+// 根据级数查表得到实际和弦音（返回字符串如 0_4_7_11，表由 ChordGeneration/harmony.py 生成）
+String getChordFromDegree(int key_root, int degree, bool minor) {
+  return harmonyName(harmonyDegreeChord(HARMONY_KEY(key_root, minor), degree));
 }
 
 // 构建 reharm 插入和弦对（ii - V）
 String getReharmProgression(int reharm_deg) {
-  int ii_deg = (reharm_deg + 1) % 7; if (ii_deg == 0) ii_deg = 7;
-  int V_deg  = (reharm_deg + 4) % 7; if (V_deg == 0)  V_deg = 7;
-  return getChordFromDegree(key_root, ii_deg, mode) + "," + getChordFromDegree(key_root, V_deg, mode);
+  uint8_t key = HARMONY_KEY(key_root, minor_mode);
+  return harmonyName(harmonyReharm(key, reharm_deg, 0)) + "," + harmonyName(harmonyReharm(key, reharm_deg, 1));
 }
 
 // 收集并统计投票信息
@@ -295,13 +245,20 @@ void loop() {
 
     case SENDING_SYNC_DATA: {
       // 发送两个和弦（当前和下一个）
+      uint8_t key = HARMONY_KEY(key_root, minor_mode);
+      uint8_t id1, id2;
       if(is_currently_reharm == true){
-        String reharm = getReharmProgression(degree_sequence[(current_index + 2) % sequence_len]);
+        int reharm_deg = degree_sequence[(current_index + 2) % sequence_len];
+        String reharm = getReharmProgression(reharm_deg);
         chord_pair = reharm; 
+        id1 = harmonyReharm(key, reharm_deg, 0);
+        id2 = harmonyReharm(key, reharm_deg, 1);
       }
       else{
-        chord1 = getChordFromDegree(key_root, degree_sequence[current_index], mode);
-        chord2 = getChordFromDegree(key_root, degree_sequence[(current_index + 1) % sequence_len], mode);
+        chord1 = getChordFromDegree(key_root, degree_sequence[current_index], minor_mode);
+        chord2 = getChordFromDegree(key_root, degree_sequence[(current_index + 1) % sequence_len], minor_mode);
+        id1 = harmonyDegreeChord(key, degree_sequence[current_index]);
+        id2 = harmonyDegreeChord(key, degree_sequence[(current_index + 1) % sequence_len]);
         Serial.print(degree_sequence[current_index]);
         Serial.print(", ");
         Serial.println(degree_sequence[(current_index + 1) % sequence_len]);
@@ -309,6 +266,9 @@ void loop() {
       }
 
       char msg_for_ir[64];
+#if CHORD_WIRE_COMPACT
+      if (!harmonyEncodePair(id1, id2, !is_currently_reharm, msg_for_ir))
+#endif
       chord_pair.toCharArray(msg_for_ir, sizeof(msg_for_ir));
       //sprintf(msg_for_ir, chord_pair);
       chord_send_time = millis();
@@ -322,7 +282,8 @@ void loop() {
       //Wire.write((uint8_t*)msg_for_ir, strlen(msg_for_ir));
       //Wire.write((uint8_t*)chord_pair.c_str(), chord_pair.length());
       //Wire.endTransmission();
-      Serial.print("Sent chord pair: "); Serial.println(msg_for_ir);
+      Serial.print("Sent chord pair: "); Serial.println(chord_pair);
+      Serial.print("Chord wire bytes: "); Serial.println(strlen(msg_for_ir));
       
       sync_state = WAITING_FOR_READY;
       break;
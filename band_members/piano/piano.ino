@@ -2,6 +2,7 @@
 #include <Wire.h>
 #include <SD.h>
 #include <string.h>
+#include "sample_bank.h"
 
 #define M5_I2C_ADDR 0x55
 #define SDCARD_CSPIN GPIO_NUM_4
@@ -13,6 +14,7 @@ volatile bool has_new_chord = false;
 char i2c_raw_buffer[33] = {0};
 volatile int i2c_raw_len = 0;
 volatile bool has_new_raw_i2c_data = false;
+bool bank_ready = false;  // SD 上有 bank.pak 时用打包文件播放
 
 static constexpr size_t buf_size = 1024;
 uint8_t wav_buf[buf_size];
@@ -50,6 +52,30 @@ void i2c_receive(int len) {
   }
 }
 
+// 从当前位置读取 data_len 字节 PCM 并播放，最多播放 seconds 秒
+void streamPcm(File& file, uint32_t data_len, uint32_t sample_rate, uint16_t num_channels,
+               uint16_t bits_per_sample, float seconds) {
+  int samples_limit = seconds * sample_rate;
+  uint16_t bytes_per_sample = bits_per_sample / 8;
+  uint16_t bytes_per_frame = bytes_per_sample * num_channels;
+  int played_samples = 0;
+
+  while (data_len > 0 && played_samples < samples_limit) {
+    size_t bytes_to_read = data_len < buf_size ? data_len : buf_size;
+    size_t bytes_read = file.read(wav_buf, bytes_to_read);
+    if (bytes_read == 0) break;
+
+    int samples_this_block = bytes_read / bytes_per_frame;
+    if (played_samples + samples_this_block > samples_limit) {
+      samples_this_block = samples_limit - played_samples;
+    }
+
+    M5.Speaker.playRaw((const int16_t*)wav_buf, samples_this_block, sample_rate, num_channels > 1, 1, 1);
+    played_samples += samples_this_block;
+    data_len -= bytes_read;
+  }
+}
+
 bool playSdWav(const char* filepath, float seconds = 2.0) {
   M5.Speaker.stop();
   File file = SD.open(filepath);
@@ -86,28 +112,21 @@ bool playSdWav(const char* filepath, float seconds = 2.0) {
 
   if (!data_found) { file.close(); return false; }
 
-  int samples_limit = seconds * header.sample_rate;
-  int32_t data_len = data_chunk.data_size;
-  uint16_t bytes_per_sample = header.bits_per_sample / 8;
-  uint16_t bytes_per_frame = bytes_per_sample * header.num_channels;
-  int played_samples = 0;
-
-  while (data_len > 0 && played_samples < samples_limit) {
-    size_t bytes_to_read = data_len < buf_size ? data_len : buf_size;
-    size_t bytes_read = file.read(wav_buf, bytes_to_read);
-    if (bytes_read == 0) break;
-
-    int samples_this_block = bytes_read / bytes_per_frame;
-    if (played_samples + samples_this_block > samples_limit) {
-      samples_this_block = samples_limit - played_samples;
-    }
+  streamPcm(file, data_chunk.data_size, header.sample_rate, header.num_channels, header.bits_per_sample, seconds);
+  file.close();
+  return true;
+}
 
-    M5.Speaker.playRaw((const int16_t*)wav_buf, samples_this_block, header.sample_rate, header.num_channels > 1, 1, 1);
-    played_samples += samples_this_block;
-    data_len -= bytes_read;
+// 从 bank.pak 播放：查表 + 一次 seek，文件保持打开
+bool playBankSample(const char* key, float seconds = 2.0) {
+  const sample_bank_entry_t* entry = findSample(key);
+  if (!entry) {
+    Serial.print("Sample not in bank: "); Serial.println(key);
+    return false;
   }
-
-  file.close();
+  M5.Speaker.stop();
+  if (!seekSample(entry)) return false;
+  streamPcm(sample_bank_file, entry->length, entry->sample_rate, entry->channels, entry->bits, seconds);
   return true;
 }
 
@@ -131,6 +150,8 @@ void setup() {
     while (true) delay(1000);
   }
   M5.Display.println("SD mounted.");
+  bank_ready = openSampleBank();
+  M5.Display.println(bank_ready ? "bank.pak loaded." : "No bank.pak, using WAV files.");
 }
 
 void loop() {
@@ -175,7 +196,9 @@ void loop() {
       M5.Display.println(filepath);
 
       Serial.print("Playing: "); Serial.println(filepath);
-      if (!playSdWav(filepath.c_str(), 2.0)) {
+      bool played = bank_ready ? playBankSample(chord_to_play.c_str(), 2.0)
+                               : playSdWav(filepath.c_str(), 2.0);
+      if (!played) {
         M5.Display.println("Play failed");
         Serial.println("Error: Playback failed for " + filepath);
       }
@@ -0,0 +1,97 @@
+/*
+ * Packed sample bank (bank.pak) produced by
+ * ChordGeneration/pack.py.
+ *
+ * All WAVs of one instrument are stored in a single
+ * file: a 32 byte header, a table of 32 byte entries
+ * sorted by key, then the raw PCM of every sample
+ * starting on a 512 byte (SD sector) boundary.
+ *
+ * openSampleBank() is called once in setup(); it keeps
+ * the file open and loads the table into RAM. Playing
+ * a sample is then a binary search plus a single seek,
+ * instead of SD.open() + WAV header parsing + chunk
+ * scanning for every chord change.
+ */
+
+#ifndef SAMPLE_BANK_H
+#define SAMPLE_BANK_H
+
+#include <SD.h>
+#include <string.h>
+
+#define SAMPLE_BANK_PATH        "/bank.pak"
+#define SAMPLE_BANK_VERSION     1
+#define SAMPLE_BANK_KEY_LEN     16
+#define SAMPLE_BANK_MAX_ENTRIES 128
+
+typedef struct __attribute__((packed)) sample_bank_header {
+  char magic[4];              // "SBNK"
+  uint16_t version;
+  uint16_t count;
+  uint32_t table_offset;
+  uint32_t entry_size;
+  uint8_t reserved[16];
+} sample_bank_header_t;
+
+typedef struct __attribute__((packed)) sample_bank_entry {
+  char key[SAMPLE_BANK_KEY_LEN];  // e.g. "7_11_2_5", "12", "ride"
+  uint32_t offset;                // PCM start, 512 byte aligned
+  uint32_t length;                // PCM bytes
+  uint32_t sample_rate;
+  uint8_t channels;
+  uint8_t bits;
+  uint16_t reserved;
+} sample_bank_entry_t;
+
+File sample_bank_file;
+sample_bank_entry_t sample_bank_table[SAMPLE_BANK_MAX_ENTRIES];
+uint16_t sample_bank_count = 0;
+
+// Open the pack and load its table. Returns false (and
+// leaves the bank unused) if the file is missing or invalid,
+// so the sketch can fall back to the per-file WAVs.
+bool openSampleBank(const char* path = SAMPLE_BANK_PATH) {
+  sample_bank_count = 0;
+  sample_bank_file = SD.open(path);
+  if (!sample_bank_file) return false;
+
+  sample_bank_header_t header;
+  if (sample_bank_file.read((uint8_t*)&header, sizeof(header)) != sizeof(header) ||
+      strncmp(header.magic, "SBNK", 4) != 0 ||
+      header.version != SAMPLE_BANK_VERSION ||
+      header.entry_size != sizeof(sample_bank_entry_t) ||
+      header.count > SAMPLE_BANK_MAX_ENTRIES) {
+    sample_bank_file.close();
+    return false;
+  }
+
+  size_t table_bytes = header.count * sizeof(sample_bank_entry_t);
+  sample_bank_file.seek(header.table_offset);
+  if (sample_bank_file.read((uint8_t*)sample_bank_table, table_bytes) != table_bytes) {
+    sample_bank_file.close();
+    return false;
+  }
+  sample_bank_count = header.count;
+  return true;
+}
+
+// Binary search over the key-sorted table.
+const sample_bank_entry_t* findSample(const char* key) {
+  int lo = 0, hi = (int)sample_bank_count - 1;
+  while (lo <= hi) {
+    int mid = (lo + hi) / 2;
+    int cmp = strncmp(key, sample_bank_table[mid].key, SAMPLE_BANK_KEY_LEN);
+    if (cmp == 0) return &sample_bank_table[mid];
+    if (cmp < 0) hi = mid - 1;
+    else lo = mid + 1;
+  }
+  return NULL;
+}
+
+// Position the already-open bank file at the sample's PCM.
+bool seekSample(const sample_bank_entry_t* entry) {
+  return entry != NULL && sample_bank_file.seek(entry->offset);
+}
+
+#endif
@@ -1,5 +1,9 @@
 #include <Wire.h>
 #include "ircomm_i2c.h"
+//#define TELEMETRY_BINARY 1   // 用二进制帧代替文本日志（Result_process/telemetry.py 解码）
+//#define TELEMETRY_BENCH  1   // 每 16 轮报告一次日志输出的耗时
+#include "telemetry.h"
+#include "harmony_tables.h"
 
 //#define IRCOMM_IR_ADDR 0x40  // 修改为你的 IR 板 I2C 地址
 #define M5_I2C_ADDR     0x55
@@ -30,6 +34,7 @@ unsigned long expected_time = 0;
 unsigned long former_playback_drift = 0;
 unsigned long current_playback_drift = 0;
 unsigned long playback_drift_diff = 0;
+unsigned long m5_sent_time = 0;     // 最近一次 sendToM5 的时间
 
 int chord_round = 0;                // 当前第几轮和弦
 
@@ -76,8 +81,7 @@ void loop() {
           former_playback_drift = current_playback_drift;
 
           expected_time += 8000;
-          Serial.print("[Drift] Round "); Serial.print(chord_round);
-          Serial.print(": Drift = "); Serial.print(playback_drift_diff); Serial.println(" ms");
+          tlmPlay(chord_round, m5_sent_time, playback_drift_diff);
           chord_round += 1;
 
           play_start_time = now;
@@ -99,8 +103,7 @@ void loop() {
           });
         }
         else{
-          Serial.println("vote failed");
-          Serial.println(current_chord + " & " + next_chord);
+          tlmVoteFailed(chord_round - 1, current_chord, next_chord);
           state = WAIT_CHORD_SIGNAL; 
         }
         
@@ -115,8 +118,7 @@ void loop() {
           former_playback_drift = current_playback_drift;
 
           expected_time += 8000;
-          Serial.print("[Drift] Round "); Serial.print(chord_round);
-          Serial.print(": Drift = "); Serial.print(playback_drift_diff); Serial.println(" ms");
+          tlmPlay(chord_round, m5_sent_time, playback_drift_diff);
           chord_round += 1;
 
           play_start_time = now;
@@ -137,7 +139,7 @@ void listenForPrepare() {
         return;
     }
     if (msg == "prepare_sync") {
-      Serial.println("[Receiver] Got prepare_sync. Sending ACK.");
+      tlmEvent(TLM_PREPARE, chord_round);
       sendIR("ACK" + String(MEMBER_ID));
       state = WAIT_CHORD_SIGNAL;
     }
@@ -146,11 +148,12 @@ void listenForPrepare() {
 
 void listenForChordPair() {
   checkIRMessage([](String msg) {
+    msg = harmonyWireToText(msg);  // Sender 发的紧凑和弦对换回 "a,bT" 文本
     if (!has_sync) {
       if (msg == "start") {
         target_start_time = millis() + 5000;
         expected_time = target_start_time;
-        Serial.println("[Receiver] Got start. Playing in 5s.");
+        tlmEvent(TLM_START, chord_round);
         state = WAIT_PLAY_CHORD;
       }
       else if (msg.indexOf(',') != -1) {
@@ -162,8 +165,7 @@ void listenForChordPair() {
         current_chord = chord1;
         next_chord = chord2;
         sendIR("READY" + String(MEMBER_ID));
-        Serial.print("[Receiver] Got first chord pair: ");
-        Serial.println(current_chord + " & " + next_chord);
+        tlmFirstPair(current_chord, next_chord);
       }
     } else {
       if (msg.startsWith("ACK") || msg.startsWith("READY") || msg == "start" || msg == "prepare_sync") {
@@ -184,8 +186,7 @@ void listenForChordPair() {
           current_chord = chord1;
           next_chord = chord2;
           sendIR("READY" + String(MEMBER_ID));
-          Serial.print("[Receiver] Next basic chord pair: ");
-          Serial.println(current_chord + " & " + next_chord);
+          tlmNext(chord_round - 1, false, current_chord, next_chord);
           state = WAIT_PLAY_CHORD;
         } 
         else {
@@ -203,8 +204,7 @@ void listenForChordPair() {
             next_chord = chord2;
           }
           sendIR("READY" + String(MEMBER_ID));
-          Serial.print("[Receiver] Playing reharm next: ");
-          Serial.println(current_chord + " & " + next_chord);
+          tlmNext(chord_round - 1, true, current_chord, next_chord);
           state = WAIT_FOR_REHARM;
         }
       }
@@ -212,7 +212,11 @@ void listenForChordPair() {
   });
 }
 String tritone(String chord_str) {
-  // 解析和弦字符串（假设格式为: "7_11_2_5"）
+  // 表里的和弦直接查表（ChordGeneration/harmony.py 生成）
+  uint8_t id = harmonyChordId(chord_str.c_str());
+  if (id != HARMONY_NO_CHORD) return harmonyName(harmonyTritone(id));
+
+  // 表外的和弦：解析和弦字符串（假设格式为: "7_11_2_5"）
   int notes[4];
   int idx = 0;
   int last_pos = 0;
@@ -248,8 +252,7 @@ void sendToM5(String data) {
   Wire.write(data.c_str(), data.length());
   Wire.endTransmission();
   //Serial.print("[M5] Sent chord: "); Serial.println(data);
-  Serial.print("🎵 Sent to M5 at: "); Serial.println(millis());
-  Serial.println();
+  m5_sent_time = millis();   // 和 drift 一起由 tlmPlay 输出
 }
 
 //void sendVote() {
@@ -269,13 +272,7 @@ void sendVote() {
   String vote_msg = String(vote_yes ? "VOTE_YES" : "VOTE_NO") + String(MEMBER_ID);
   sendIR(vote_msg);
 
-  Serial.print("[Receiver] Sent vote (Markov): ");
-  Serial.print(vote_msg);
-  Serial.print(" | History: ");
-  Serial.print(vote_history);
-  Serial.print(" | YES probability: ");
-  Serial.print(vote_prob);
-  Serial.println("%");
+  tlmVote(chord_round - 1, vote_yes, MEMBER_ID, vote_history.c_str(), vote_prob);
 }
 
 
@@ -0,0 +1,218 @@
+/*
+ * Harmony lookup tables, generated by ChordGeneration/harmony.py.
+ * Do not edit: change harmony.py and run it again, it rewrites
+ * this file in every sketch that includes it.
+ *
+ * A chord is an id: root * HARMONY_QUALITIES + quality
+ * (qualities: 0 maj7, 1 m7, 2 7, 3 mM7, 4 dim7, 5 m7b5).
+ * A key is HARMONY_KEY(root, minor): 0-11 major, 12-23 minor.
+ *
+ * The sender looks its chords up instead of building them
+ * with String compares and sprintf, the receivers look the
+ * tritone substitution up instead of parsing the notes.
+ * Names are the "7_11_2_5" strings used on the wire and
+ * as WAV file names, so messages and logs do not change.
+ */
+
+#ifndef HARMONY_TABLES_H
+#define HARMONY_TABLES_H
+
+#include <Arduino.h>
+
+#define HARMONY_KEYS        24
+#define HARMONY_QUALITIES   6
+#define HARMONY_CHORDS      72
+#define HARMONY_NAME_LEN    12
+#define HARMONY_NO_CHORD    0xFF
+#define HARMONY_KEY(root, minor) ((minor) ? 12 + (root) % 12 : (root) % 12)
+
+// [key][degree - 1] -> chord id  (C, C#, D, D#, E, F, F#, G, G#, A, A#, B, Cm, C#m, Dm, D#m, Em, Fm, F#m, Gm, G#m, Am, A#m, Bm)
+static const uint8_t HARMONY_DEGREE_CHORD[HARMONY_KEYS][7] PROGMEM = {
+  {0, 13, 25, 30, 44, 55, 71},
+  {6, 19, 31, 36, 50, 61, 5},
+  {12, 25, 37, 42, 56, 67, 11},
+  {18, 31, 43, 48, 62, 1, 17},
+  {24, 37, 49, 54, 68, 7, 23},
+  {30, 43, 55, 60, 2, 13, 29},
+  {36, 49, 61, 66, 8, 19, 35},
+  {42, 55, 67, 0, 14, 25, 41},
+  {48, 61, 1, 6, 20, 31, 47},
+  {54, 67, 7, 12, 26, 37, 53},
+  {60, 1, 13, 18, 32, 43, 59},
+  {66, 7, 19, 24, 38, 49, 65},
+  {1, 17, 18, 31, 44, 48, 62},
+  {7, 23, 24, 37, 50, 54, 68},
+  {13, 29, 30, 43, 56, 60, 2},
+  {19, 35, 36, 49, 62, 66, 8},
+  {25, 41, 42, 55, 68, 0, 14},
+  {31, 47, 48, 61, 2, 6, 20},
+  {37, 53, 54, 67, 8, 12, 26},
+  {43, 59, 60, 1, 14, 18, 32},
+  {49, 65, 66, 7, 20, 24, 38},
+  {55, 71, 0, 13, 26, 30, 44},
+  {61, 5, 6, 19, 32, 36, 50},
+  {67, 11, 12, 25, 38, 42, 56}
+};
+
+// [key][reharm degree - 1] -> inserted ii - V chord ids
+static const uint8_t HARMONY_REHARM[HARMONY_KEYS][7][2] PROGMEM = {
+  {{13, 44}, {25, 55}, {30, 71}, {44, 0}, {55, 13}, {71, 25}, {0, 30}},
+  {{19, 50}, {31, 61}, {36, 5}, {50, 6}, {61, 19}, {5, 31}, {6, 36}},
+  {{25, 56}, {37, 67}, {42, 11}, {56, 12}, {67, 25}, {11, 37}, {12, 42}},
+  {{31, 62}, {43, 1}, {48, 17}, {62, 18}, {1, 31}, {17, 43}, {18, 48}},
+  {{37, 68}, {49, 7}, {54, 23}, {68, 24}, {7, 37}, {23, 49}, {24, 54}},
+  {{43, 2}, {55, 13}, {60, 29}, {2, 30}, {13, 43}, {29, 55}, {30, 60}},
+  {{49, 8}, {61, 19}, {66, 35}, {8, 36}, {19, 49}, {35, 61}, {36, 66}},
+  {{55, 14}, {67, 25}, {0, 41}, {14, 42}, {25, 55}, {41, 67}, {42, 0}},
+  {{61, 20}, {1, 31}, {6, 47}, {20, 48}, {31, 61}, {47, 1}, {48, 6}},
+  {{67, 26}, {7, 37}, {12, 53}, {26, 54}, {37, 67}, {53, 7}, {54, 12}},
+  {{1, 32}, {13, 43}, {18, 59}, {32, 60}, {43, 1}, {59, 13}, {60, 18}},
+  {{7, 38}, {19, 49}, {24, 65}, {38, 66}, {49, 7}, {65, 19}, {66, 24}},
+  {{17, 44}, {18, 48}, {31, 62}, {44, 1}, {48, 17}, {62, 18}, {1, 31}},
+  {{23, 50}, {24, 54}, {37, 68}, {50, 7}, {54, 23}, {68, 24}, {7, 37}},
+  {{29, 56}, {30, 60}, {43, 2}, {56, 13}, {60, 29}, {2, 30}, {13, 43}},
+  {{35, 62}, {36, 66}, {49, 8}, {62, 19}, {66, 35}, {8, 36}, {19, 49}},
+  {{41, 68}, {42, 0}, {55, 14}, {68, 25}, {0, 41}, {14, 42}, {25, 55}},
+  {{47, 2}, {48, 6}, {61, 20}, {2, 31}, {6, 47}, {20, 48}, {31, 61}},
+  {{53, 8}, {54, 12}, {67, 26}, {8, 37}, {12, 53}, {26, 54}, {37, 67}},
+  {{59, 14}, {60, 18}, {1, 32}, {14, 43}, {18, 59}, {32, 60}, {43, 1}},
+  {{65, 20}, {66, 24}, {7, 38}, {20, 49}, {24, 65}, {38, 66}, {49, 7}},
+  {{71, 26}, {0, 30}, {13, 44}, {26, 55}, {30, 71}, {44, 0}, {55, 13}},
+  {{5, 32}, {6, 36}, {19, 50}, {32, 61}, {36, 5}, {50, 6}, {61, 19}},
+  {{11, 38}, {12, 42}, {25, 56}, {38, 67}, {42, 11}, {56, 12}, {67, 25}}
+};
+
+// chord id -> tritone substitute
+static const uint8_t HARMONY_TRITONE[HARMONY_CHORDS] PROGMEM = {
+  36, 37, 38, 39, 40, 41, 42, 43, 44, 45, 46, 47,
+  48, 49, 50, 51, 52, 53, 54, 55, 56, 57, 58, 59,
+  60, 61, 62, 63, 64, 65, 66, 67, 68, 69, 70, 71,
+  0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11,
+  12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23,
+  24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35
+};
+
+static const char HARMONY_CHORD_NAMES[HARMONY_CHORDS][HARMONY_NAME_LEN] PROGMEM = {
+  "0_4_7_11", "0_3_7_10", "0_4_7_10", "0_3_7_11", "0_3_6_9", "0_3_6_10",
+  "1_5_8_0", "1_4_8_11", "1_5_8_11", "1_4_8_0", "1_4_7_10", "1_4_7_11",
+  "2_6_9_1", "2_5_9_0", "2_6_9_0", "2_5_9_1", "2_5_8_11", "2_5_8_0",
+  "3_7_10_2", "3_6_10_1", "3_7_10_1", "3_6_10_2", "3_6_9_0", "3_6_9_1",
+  "4_8_11_3", "4_7_11_2", "4_8_11_2", "4_7_11_3", "4_7_10_1", "4_7_10_2",
+  "5_9_0_4", "5_8_0_3", "5_9_0_3", "5_8_0_4", "5_8_11_2", "5_8_11_3",
+  "6_10_1_5", "6_9_1_4", "6_10_1_4", "6_9_1_5", "6_9_0_3", "6_9_0_4",
+  "7_11_2_6", "7_10_2_5", "7_11_2_5", "7_10_2_6", "7_10_1_4", "7_10_1_5",
+  "8_0_3_7", "8_11_3_6", "8_0_3_6", "8_11_3_7", "8_11_2_5", "8_11_2_6",
+  "9_1_4_8", "9_0_4_7", "9_1_4_7", "9_0_4_8", "9_0_3_6", "9_0_3_7",
+  "10_2_5_9", "10_1_5_8", "10_2_5_8", "10_1_5_9", "10_1_4_7", "10_1_4_8",
+  "11_3_6_10", "11_2_6_9", "11_3_6_9", "11_2_6_10", "11_2_5_8", "11_2_5_9"
+};
+
+// name -> id: the 4 notes packed into nibbles, sorted
+static const uint16_t HARMONY_LOOKUP_KEY[HARMONY_CHORDS] PROGMEM = {
+  0x0369, 0x036A, 0x037A, 0x037B, 0x047A, 0x047B, 0x147A, 0x147B,
+  0x1480, 0x148B, 0x1580, 0x158B, 0x2580, 0x258B, 0x2590, 0x2591,
+  0x2690, 0x2691, 0x3690, 0x3691, 0x36A1, 0x36A2, 0x37A1, 0x37A2,
+  0x47A1, 0x47A2, 0x47B2, 0x47B3, 0x48B2, 0x48B3, 0x5803, 0x5804,
+  0x58B2, 0x58B3, 0x5903, 0x5904, 0x6903, 0x6904, 0x6914, 0x6915,
+  0x6A14, 0x6A15, 0x7A14, 0x7A15, 0x7A25, 0x7A26, 0x7B25, 0x7B26,
+  0x8036, 0x8037, 0x8B25, 0x8B26, 0x8B36, 0x8B37, 0x9036, 0x9037,
+  0x9047, 0x9048, 0x9147, 0x9148, 0xA147, 0xA148, 0xA158, 0xA159,
+  0xA258, 0xA259, 0xB258, 0xB259, 0xB269, 0xB26A, 0xB369, 0xB36A
+};
+static const uint8_t HARMONY_LOOKUP_ID[HARMONY_CHORDS] PROGMEM = {
+  4, 5, 1, 3, 2, 0, 10, 11, 9, 7, 6, 8,
+  17, 16, 13, 15, 14, 12, 22, 23, 19, 21, 20, 18,
+  28, 29, 25, 27, 26, 24, 31, 33, 34, 35, 32, 30,
+  40, 41, 37, 39, 38, 36, 46, 47, 43, 45, 44, 42,
+  50, 48, 52, 53, 49, 51, 58, 59, 55, 57, 56, 54,
+  64, 65, 61, 63, 62, 60, 70, 71, 67, 69, 68, 66
+};
+
+static inline uint8_t harmonyDegreeChord(uint8_t key, int degree) {
+  if (key >= HARMONY_KEYS || degree < 1 || degree > 7) return HARMONY_NO_CHORD;
+  return pgm_read_byte(&HARMONY_DEGREE_CHORD[key][degree - 1]);
+}
+
+// which: 0 = ii, 1 = V
+static inline uint8_t harmonyReharm(uint8_t key, int degree, int which) {
+  if (key >= HARMONY_KEYS || degree < 1 || degree > 7) return HARMONY_NO_CHORD;
+  return pgm_read_byte(&HARMONY_REHARM[key][degree - 1][which]);
+}
+
+static inline uint8_t harmonyTritone(uint8_t id) {
+  if (id >= HARMONY_CHORDS) return HARMONY_NO_CHORD;
+  return pgm_read_byte(&HARMONY_TRITONE[id]);
+}
+
+// id -> "7_11_2_5", HARMONY_NO_CHORD -> "0_0_0_0"
+static String harmonyName(uint8_t id) {
+  if (id >= HARMONY_CHORDS) return "0_0_0_0";
+  char buf[HARMONY_NAME_LEN];
+  strcpy_P(buf, HARMONY_CHORD_NAMES[id]);
+  return String(buf);
+}
+
+// "7_11_2_5" -> id, HARMONY_NO_CHORD if it is not in the table
+static uint8_t harmonyChordId(const char *name) {
+  uint16_t packed = 0;
+  int notes = 0;
+  int value = -1;
+  for (const char *p = name; ; p++) {
+    char c = *p ? *p : '_';
+    if (c >= '0' && c <= '9') {
+      value = (value < 0 ? 0 : value * 10) + (c - '0');
+    } else if (c == '_') {
+      if (value < 0 || value > 11 || notes == 4) return HARMONY_NO_CHORD;
+      packed = (packed << 4) | value;
+      notes++;
+      value = -1;
+    } else {
+      return HARMONY_NO_CHORD;
+    }
+    if (!*p) break;
+  }
+  if (notes != 4) return HARMONY_NO_CHORD;
+  int lo = 0, hi = HARMONY_CHORDS - 1;
+  while (lo <= hi) {
+    int mid = (lo + hi) / 2;
+    uint16_t k = pgm_read_word(&HARMONY_LOOKUP_KEY[mid]);
+    if (k == packed) return pgm_read_byte(&HARMONY_LOOKUP_ID[mid]);
+    if (k < packed) lo = mid + 1; else hi = mid - 1;
+  }
+  return HARMONY_NO_CHORD;
+}
+
+// Compact chord pair on the wire: a marker and one character per
+// chord id, 3 bytes instead of e.g. "2_5_9_0,7_11_2_5T" (17).
+// All printable, no ',' or spaces, so msg.trim() and the String
+// compares keep working and old receivers simply ignore it.
+#define HARMONY_WIRE_BASIC  '#'   // basic pair (the "T" suffix)
+#define HARMONY_WIRE_REHARM '%'   // reharm ii - V
+#define HARMONY_WIRE_OFFSET '0'
+#define HARMONY_WIRE_LEN    3
+
+// out needs HARMONY_WIRE_LEN + 1 bytes; false if a chord is not in the table
+static bool harmonyEncodePair(uint8_t id1, uint8_t id2, bool basic, char *out) {
+  if (id1 >= HARMONY_CHORDS || id2 >= HARMONY_CHORDS) return false;
+  out[0] = basic ? HARMONY_WIRE_BASIC : HARMONY_WIRE_REHARM;
+  out[1] = HARMONY_WIRE_OFFSET + id1;
+  out[2] = HARMONY_WIRE_OFFSET + id2;
+  out[3] = '\0';
+  return true;
+}
+
+// compact pair -> "a,bT" / "a,b" as the sender used to send it,
+// any other message is returned unchanged
+static String harmonyWireToText(const String &msg) {
+  if (msg.length() != HARMONY_WIRE_LEN) return msg;
+  char marker = msg[0];
+  if (marker != HARMONY_WIRE_BASIC && marker != HARMONY_WIRE_REHARM) return msg;
+  int id1 = msg[1] - HARMONY_WIRE_OFFSET;
+  int id2 = msg[2] - HARMONY_WIRE_OFFSET;
+  if (id1 < 0 || id1 >= HARMONY_CHORDS || id2 < 0 || id2 >= HARMONY_CHORDS) return msg;
+  String text = harmonyName(id1) + "," + harmonyName(id2);
+  if (marker == HARMONY_WIRE_BASIC) text += "T";
+  return text;
+}
+
+#endif
@@ -0,0 +1,247 @@
+/*
+ * Receiver telemetry: the original Serial text log, or
+ * compact fixed-size binary frames.
+ *
+ * At 115200 baud every byte takes ~87 us on the wire and
+ * the TX buffer only holds 64 bytes, so the "Sent to M5"
+ * line plus the "[Drift]" line (~70 bytes, one of them a
+ * 4 byte UTF-8 emoji) block inside WAIT_PLAY_CHORD, the
+ * branch whose timing is the drift we measure. With
+ * TELEMETRY_BINARY set, each event is one 20 byte frame
+ * that fits in the TX buffer and returns immediately.
+ *
+ * Result_process/telemetry.py decodes the frames into the
+ * same records log_parser.py produces from the text log.
+ *
+ * Frame layout (little endian, packed):
+ *   0  magic    0xA5
+ *   1  type     TLM_*
+ *   2  round    chord_round
+ *   4  ms       millis() (PLAY: the "Sent to M5" time)
+ *   8  value    PLAY: drift, VOTE: YES probability %,
+ *               BENCH: logging time in us
+ *  12  chord1   4 notes packed into nibbles, 0xFFFF = none
+ *  14  chord2
+ *  16  flags    TLM_F_*
+ *  17  member   MEMBER_ID
+ *  18  reserved
+ *  19  check    XOR of bytes 0..18
+ *
+ * TELEMETRY_BENCH times every logging call with micros()
+ * and reports the total every TELEMETRY_BENCH_ROUNDS plays
+ * (a "[Bench]" line or a TLM_BENCH frame), so the two
+ * formats can be compared on the board itself.
+ */
+
+#ifndef TELEMETRY_H
+#define TELEMETRY_H
+
+#include <Arduino.h>
+
+#ifndef TELEMETRY_BINARY
+#define TELEMETRY_BINARY        0   // 1: binary frames, 0: text log
+#endif
+#ifndef TELEMETRY_BENCH
+#define TELEMETRY_BENCH         0
+#endif
+#define TELEMETRY_BENCH_ROUNDS  16
+
+#define TLM_MAGIC       0xA5
+#define TLM_PLAY        1   // Sent to M5 + [Drift] Round
+#define TLM_VOTE        2
+#define TLM_NEXT        3   // Next basic chord pair / Playing reharm next
+#define TLM_VOTE_FAILED 4
+#define TLM_PREPARE     5
+#define TLM_FIRST_PAIR  6
+#define TLM_START       7
+#define TLM_TRITONE     8
+#define TLM_BENCH       9
+
+#define TLM_F_YES       0x01  // VOTE
+#define TLM_F_MARKOV    0x02
+#define TLM_F_HISTORY   0x04
+#define TLM_F_HIST0_Y   0x08
+#define TLM_F_HIST1_Y   0x10
+#define TLM_F_PROB      0x20
+#define TLM_F_REHARM    0x01  // NEXT
+
+#define TLM_NO_CHORD    0xFFFF
+
+typedef struct __attribute__((packed)) telemetry_frame {
+  uint8_t magic;
+  uint8_t type;
+  uint16_t round;
+  uint32_t ms;
+  int32_t value;
+  uint16_t chord1;
+  uint16_t chord2;
+  uint8_t flags;
+  uint8_t member;
+  uint8_t reserved;
+  uint8_t check;
+} telemetry_frame_t;
+
+#if TELEMETRY_BENCH
+static unsigned long tlm_bench_us = 0;
+static unsigned long tlm_bench_max_us = 0;
+static uint16_t tlm_bench_calls = 0;
+static uint16_t tlm_bench_plays = 0;
+#define TLM_BEGIN() unsigned long tlm_t0 = micros()
+#define TLM_END() do { \
+    unsigned long tlm_dt = micros() - tlm_t0; \
+    tlm_bench_us += tlm_dt; \
+    if (tlm_dt > tlm_bench_max_us) tlm_bench_max_us = tlm_dt; \
+    tlm_bench_calls++; \
+  } while (0)
+#else
+#define TLM_BEGIN()
+#define TLM_END()
+#endif
+
+// "7_11_2_5" -> 0x7B25
+static uint16_t tlmPackChord(const String &chord) {
+  uint16_t packed = 0;
+  int notes = 0;
+  int value = -1;
+  for (unsigned int i = 0; i <= chord.length(); i++) {
+    char c = i < chord.length() ? chord[i] : '_';
+    if (c >= '0' && c <= '9') {
+      value = (value < 0 ? 0 : value * 10) + (c - '0');
+    } else if (c == '_') {
+      if (value < 0 || value > 11 || notes == 4) return TLM_NO_CHORD;
+      packed = (packed << 4) | value;
+      notes++;
+      value = -1;
+    } else {
+      return TLM_NO_CHORD;
+    }
+  }
+  return notes == 4 ? packed : TLM_NO_CHORD;
+}
+
+static void tlmSend(uint8_t type, int round, unsigned long ms, long value,
+                    uint16_t chord1, uint16_t chord2, uint8_t flags, uint8_t member) {
+  telemetry_frame_t frame;
+  frame.magic = TLM_MAGIC;
+  frame.type = type;
+  frame.round = round;
+  frame.ms = ms;
+  frame.value = value;
+  frame.chord1 = chord1;
+  frame.chord2 = chord2;
+  frame.flags = flags;
+  frame.member = member;
+  frame.reserved = 0;
+  uint8_t check = 0;
+  const uint8_t *bytes = (const uint8_t *)&frame;
+  for (unsigned int i = 0; i < sizeof(frame) - 1; i++) check ^= bytes[i];
+  frame.check = check;
+  Serial.write(bytes, sizeof(frame));
+}
+
+#if TELEMETRY_BENCH
+static void tlmBenchReport(int round) {
+  if (++tlm_bench_plays < TELEMETRY_BENCH_ROUNDS) return;
+#if TELEMETRY_BINARY
+  tlmSend(TLM_BENCH, round, tlm_bench_max_us, tlm_bench_us, tlm_bench_calls, TLM_NO_CHORD, 0, 0);
+#else
+  Serial.print("[Bench] log path: "); Serial.print(tlm_bench_us);
+  Serial.print(" us in "); Serial.print(tlm_bench_calls);
+  Serial.print(" calls, max "); Serial.print(tlm_bench_max_us); Serial.println(" us");
+#endif
+  tlm_bench_us = tlm_bench_max_us = 0;
+  tlm_bench_calls = tlm_bench_plays = 0;
+}
+#endif
+
+// 一轮开始演奏：sendToM5 的时间 + 这一轮的 drift
+static void tlmPlay(int round, unsigned long sent_ms, unsigned long drift) {
+  TLM_BEGIN();
+#if TELEMETRY_BINARY
+  tlmSend(TLM_PLAY, round, sent_ms, (long)drift, TLM_NO_CHORD, TLM_NO_CHORD, 0, 0);
+#else
+  Serial.print("🎵 Sent to M5 at: "); Serial.println(sent_ms);
+  Serial.println();
+  Serial.print("[Drift] Round "); Serial.print(round);
+  Serial.print(": Drift = "); Serial.print(drift); Serial.println(" ms");
+#endif
+  TLM_END();
+#if TELEMETRY_BENCH
+  tlmBenchReport(round);
+#endif
+}
+
+// history == NULL: 默认投票；否则 Markov（history 例如 "yn"）
+static void tlmVote(int round, bool yes, int member, const char *history, int yes_percent) {
+  TLM_BEGIN();
+#if TELEMETRY_BINARY
+  uint8_t flags = yes ? TLM_F_YES : 0;
+  if (history != NULL) {
+    flags |= TLM_F_MARKOV | TLM_F_HISTORY | TLM_F_PROB;
+    if (history[0] == 'y') flags |= TLM_F_HIST0_Y;
+    if (history[0] != '\0' && history[1] == 'y') flags |= TLM_F_HIST1_Y;
+  }
+  tlmSend(TLM_VOTE, round, millis(), yes_percent, TLM_NO_CHORD, TLM_NO_CHORD, flags, member);
+#else
+  if (history == NULL) {
+    Serial.print("[Receiver] Sent vote: ");
+    Serial.print(yes ? "VOTE_YES" : "VOTE_NO"); Serial.println(member);
+  } else {
+    Serial.print("[Receiver] Sent vote (Markov): ");
+    Serial.print(yes ? "VOTE_YES" : "VOTE_NO"); Serial.print(member);
+    Serial.print(" | History: ");
+    Serial.print(history);
+    Serial.print(" | YES probability: ");
+    Serial.print(yes_percent);
+    Serial.println("%");
+  }
+#endif
+  TLM_END();
+}
+
+static void tlmNext(int round, bool reharm, const String &chord1, const String &chord2) {
+  TLM_BEGIN();
+#if TELEMETRY_BINARY
+  tlmSend(TLM_NEXT, round, millis(), 0, tlmPackChord(chord1), tlmPackChord(chord2),
+          reharm ? TLM_F_REHARM : 0, 0);
+#else
+  Serial.print(reharm ? "[Receiver] Playing reharm next: " : "[Receiver] Next basic chord pair: ");
+  Serial.println(chord1 + " & " + chord2);
+#endif
+  TLM_END();
+}
+
+static void tlmVoteFailed(int round, const String &chord1, const String &chord2) {
+  TLM_BEGIN();
+#if TELEMETRY_BINARY
+  tlmSend(TLM_VOTE_FAILED, round, millis(), 0, tlmPackChord(chord1), tlmPackChord(chord2), 0, 0);
+#else
+  Serial.println("vote failed");
+  Serial.println(chord1 + " & " + chord2);
+#endif
+  TLM_END();
+}
+
+static void tlmFirstPair(const String &chord1, const String &chord2) {
+#if TELEMETRY_BINARY
+  tlmSend(TLM_FIRST_PAIR, 0, millis(), 0, tlmPackChord(chord1), tlmPackChord(chord2), 0, 0);
+#else
+  Serial.print("[Receiver] Got first chord pair: ");
+  Serial.println(chord1 + " & " + chord2);
+#endif
+}
+
+// TLM_PREPARE / TLM_START / TLM_TRITONE
+static void tlmEvent(uint8_t type, int round) {
+  TLM_BEGIN();
+#if TELEMETRY_BINARY
+  tlmSend(type, round, millis(), 0, TLM_NO_CHORD, TLM_NO_CHORD, 0, 0);
+#else
+  if (type == TLM_PREPARE) Serial.println("[Receiver] Got prepare_sync. Sending ACK.");
+  else if (type == TLM_START) Serial.println("[Receiver] Got start. Playing in 5s.");
+  else if (type == TLM_TRITONE) Serial.println("perform tritone substitution");
+#endif
+  TLM_END();
+}
+
+#endif